@@ -0,0 +1,166 @@
+"""
+Conexão com o Arduino: pronta assim que o firmware inicia, em taxa mais alta
+- Abrir a porta reinicia o Arduino (DTR); em vez de esperar 2 s fixos, a
+  conexão fica pronta quando chega a mensagem de início do firmware
+- Em seguida a taxa da serial é negociada (frame BAUD, ver serial_protocol.py):
+  o Arduino confirma na taxa antiga e troca; a nova taxa é conferida com um
+  segundo pedido. Firmware antigo não responde e a conexão segue em 9600 baud
+- connect() mantém uma conexão persistente por porta, compartilhada entre
+  requisições e threads: todos os usuários da porta escrevem pelo mesmo
+  SerialCommandWriter (uma thread de escrita e uma de ACKs por porta), e a
+  porta só fecha quando o último usuário a devolve (release())
+"""
+
+import time
+from threading import Lock
+import serial
+
+from serial_protocol import (FrameParser, SerialCommandWriter, encode_baud_request, BOOT_BAUDRATE,
+                             BAUD_RATES)
+
+BANNER = b"Sistema iniciado"
+DEFAULT_BAUDRATE = 115200
+
+
+def wait_for_banner(port, timeout=3.0):
+    """Lê a serial até a mensagem de início do firmware; False se não chegou a tempo"""
+    deadline = time.monotonic() + timeout
+    received = b""
+    while time.monotonic() < deadline:
+        received = received[-len(BANNER):] + port.read(port.in_waiting or 1)
+        if BANNER in received:
+            return True
+    return False
+
+
+def _request_baudrate(port, baudrate, timeout):
+    """Pede a troca de taxa; True se o Arduino confirmou a taxa pedida"""
+    port.write(encode_baud_request(0, baudrate))
+    parser = FrameParser()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for kind, _, code, _, _ in parser.feed(port.read(port.in_waiting or 1)):
+            if kind == 'baud_ack':
+                return code == baudrate // 100
+    return False
+
+
+def negotiate_baudrate(port, baudrate, timeout=0.2):
+    """Troca a taxa do Arduino e da porta; retorna a taxa em uso"""
+    if baudrate == port.baudrate:
+        return baudrate
+    if baudrate not in BAUD_RATES:
+        raise ValueError(f"Taxa não suportada pelo firmware: {baudrate} (use {', '.join(map(str, BAUD_RATES))})")
+    if not _request_baudrate(port, baudrate, timeout):
+        return port.baudrate  # Firmware antigo: continua na taxa atual
+
+    previous, port.baudrate = port.baudrate, baudrate
+    if _request_baudrate(port, baudrate, timeout):
+        return baudrate
+
+    # O Arduino trocou, mas a taxa não funciona neste adaptador: reinicia a placa
+    print(f"⚠ {baudrate} baud não funcionou, voltando para {BOOT_BAUDRATE}")
+    port.baudrate = BOOT_BAUDRATE
+    port.dtr = False
+    time.sleep(0.05)
+    port.dtr = True
+    wait_for_banner(port)
+    return previous
+
+
+def open_arduino(port, baudrate=DEFAULT_BAUDRATE, timeout=0.1, boot_timeout=3.0):
+    """Abre a porta, espera o firmware ficar pronto e negocia a taxa"""
+    connection = serial.Serial(port, BOOT_BAUDRATE, timeout=timeout)
+    try:
+        if not wait_for_banner(connection, boot_timeout):
+            # Placa sem reset automático (já estava rodando): segue assim mesmo
+            print(f"⚠ Arduino em {port} não enviou a mensagem de início")
+        negotiate_baudrate(connection, baudrate)
+        connection.reset_input_buffer()
+    except Exception:
+        connection.close()
+        raise
+    return connection
+
+
+class ArduinoConnection:
+    """Conexão persistente com o Arduino, compartilhada entre threads"""
+
+    def __init__(self, port, baudrate=DEFAULT_BAUDRATE):
+        self.port = port
+        self.serial = open_arduino(port, baudrate)
+        self.baudrate = self.serial.baudrate
+        self.writer = None  # SerialCommandWriter único da porta (command_writer())
+        self.users = 0  # connect() sem release() correspondente
+        self._lock = Lock()
+
+    @property
+    def is_open(self):
+        return self.serial.is_open
+
+    @property
+    def failed(self):
+        """A escrita falhou (ex.: cabo solto): o próximo connect() reabre a porta"""
+        return self.writer is not None and self.writer.failed
+
+    def command_writer(self, protocol='binary', max_rate=None, metrics=None):
+        """Fila de comandos da porta, criada no primeiro uso e compartilhada depois
+
+        Dois escritores na mesma porta intercalariam frames e um leria os ACKs
+        do outro (retransmissões e "link perdido" espúrios).
+        """
+        with self._lock:
+            if self.writer is None or self.writer.failed:
+                self.writer = SerialCommandWriter(self.serial, protocol, max_rate=max_rate, metrics=metrics)
+            elif self.writer.protocol != protocol:
+                raise ValueError(f"{self.port} já está em uso com o protocolo {self.writer.protocol}")
+            return self.writer
+
+    def close(self):
+        """Escreve o comando pendente e fecha a porta"""
+        with self._lock:
+            if self.writer:
+                self.writer.close()
+                self.writer = None
+            self.serial.close()
+
+
+_connections = {}  # porta -> ArduinoConnection
+_connections_lock = Lock()
+_port_locks = {}  # porta -> Lock de abertura (só quem abre a mesma porta espera)
+
+
+def connect(port, baudrate=DEFAULT_BAUDRATE):
+    """Conexão aberta com o Arduino em `port`, reaproveitada se já existir
+
+    Cada chamada conta um usuário; devolva a conexão com release(). Abrir a
+    porta leva até alguns segundos (início do firmware e negociação da taxa):
+    isso acontece fora do lock global, sem atrasar outras portas.
+    """
+    with _connections_lock:
+        port_lock = _port_locks.setdefault(port, Lock())
+    with port_lock:
+        with _connections_lock:
+            connection = _connections.get(port)
+            if connection is not None and connection.is_open and not connection.failed:
+                connection.users += 1
+                return connection
+            _connections.pop(port, None)
+        if connection is not None:
+            connection.close()
+        connection = ArduinoConnection(port, baudrate)
+        with _connections_lock:
+            _connections[port] = connection
+            connection.users += 1
+        return connection
+
+
+def release(connection):
+    """Devolve uma conexão de connect(); o último usuário fecha a porta"""
+    with _connections_lock:
+        connection.users -= 1
+        if connection.users > 0:
+            return
+        if _connections.get(connection.port) is connection:
+            del _connections[connection.port]
+    connection.close()
@@ -1,5 +1,11 @@
 // Controle de Robô com 3 Motores via Serial
-// Recebe comandos no formato: m1,m2,m3
+// Recebe comandos em dois formatos (ver serial_protocol.py):
+// - Binário (11 bytes): 0xAA 0x55, tipo, sequência, m1, m2, m3 (int16
+//   little-endian) e CRC-8 (polinômio 0x07) do tipo até m3. Cada comando ou
+//   heartbeat é respondido com um ACK (mesmo formato, com as velocidades
+//   aplicadas); sem frames por WATCHDOG_MS, os motores param. O frame BAUD
+//   troca a taxa da serial (começa em 9600 baud)
+// - Texto: m1,m2,m3\n (compatível com as interfaces antigas, sem watchdog)
 // Cada valor pode ser de -255 a 255
 
 // Variáveis para os motores
@@ -7,9 +13,40 @@ int m1 = 0;
 int m2 = 0;  
 int m3 = 0;
 
+// Protocolo binário
+const byte FRAME_SYNC1 = 0xAA;
+const byte FRAME_SYNC2 = 0x55;
+const byte FRAME_MOTOR = 0x01;
+const byte FRAME_HEARTBEAT = 0x02;
+const byte FRAME_BAUD = 0x03;
+const byte FRAME_ACK = 0x81;
+const byte FRAME_BAUD_ACK = 0x83;
+const byte FRAME_PAYLOAD_SIZE = 8; // tipo, sequência e 3 x int16
+const byte FRAME_SIZE = FRAME_PAYLOAD_SIZE + 3; // + sincronismo e CRC
+
+enum ParserState { WAIT_SYNC1, WAIT_SYNC2, READ_PAYLOAD, READ_CRC };
+ParserState parserState = WAIT_SYNC1;
+byte payload[FRAME_PAYLOAD_SIZE];
+byte payloadIndex = 0;
+byte lastSequence = 0;
+
+// Watchdog: só é armado por frames binários (quem os envia manda heartbeats)
+const unsigned long WATCHDOG_MS = 500;
+unsigned long lastFrameAt = 0;
+bool watchdogArmed = false;
+
+// Taxa da serial: começa em BOOT_BAUD_RATE e o computador pede uma maior
+const long BOOT_BAUD_RATE = 9600;
+const long BAUD_RATES[] = {115200, 230400, 250000, 500000, 1000000};
+long baudRate = BOOT_BAUD_RATE;
+
+// Linha de texto em recepção (formato antigo)
+char line[32];
+byte lineLength = 0;
+
 void setup() {
   // Inicializa comunicação serial
-  Serial.begin(9600);
+  Serial.begin(BOOT_BAUD_RATE);
   
   // Configura todos os pinos como OUTPUT
   pinMode(12, OUTPUT);
@@ -40,16 +77,142 @@ void setup() {
 }
 
 void loop() {
-  // Verifica se há dados disponíveis na serial
-  if (Serial.available() > 0) {
-    String command = Serial.readStringUntil('\n');
+  // Processa byte a byte o que chegou, sem esperar (readStringUntil bloqueava)
+  while (Serial.available() > 0) {
+    byte b = Serial.read();
+    
+    switch (parserState) {
+      case WAIT_SYNC1:
+        if (b == FRAME_SYNC1) {
+          parserState = WAIT_SYNC2;
+        } else {
+          readTextByte(b); // Bytes ASCII nunca são 0xAA
+        }
+        break;
+        
+      case WAIT_SYNC2:
+        if (b == FRAME_SYNC2) {
+          payloadIndex = 0;
+          parserState = READ_PAYLOAD;
+        } else if (b != FRAME_SYNC1) {
+          parserState = WAIT_SYNC1;
+        }
+        break;
+        
+      case READ_PAYLOAD:
+        payload[payloadIndex++] = b;
+        if (payloadIndex == FRAME_PAYLOAD_SIZE) {
+          parserState = READ_CRC;
+        }
+        break;
+        
+      case READ_CRC:
+        // Frame corrompido é descartado; o próximo comando corrige
+        if (b == crc8(payload, FRAME_PAYLOAD_SIZE)) {
+          handleFrame();
+        }
+        parserState = WAIT_SYNC1;
+        break;
+    }
+  }
+  
+  // Sem comandos nem heartbeats: o computador travou ou o cabo soltou
+  if (watchdogArmed && millis() - lastFrameAt > WATCHDOG_MS) {
+    watchdogArmed = false;
+    m1 = 0;
+    m2 = 0;
+    m3 = 0;
+    stopAllMotors();
+  }
+}
+
+void readTextByte(byte b) {
+  if (b == '\n') {
+    line[lineLength] = '\0';
+    lineLength = 0;
+    String command = String(line);
     command.trim(); // Remove espaços em branco
     
     if (command.length() > 0) {
       parseCommand(command);
       controlMotors();
     }
+  } else if (lineLength < sizeof(line) - 1) {
+    line[lineLength++] = b;
+  }
+}
+
+byte crc8(const byte *data, byte length) {
+  byte crc = 0;
+  for (byte i = 0; i < length; i++) {
+    crc ^= data[i];
+    for (byte bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+int readInt16(byte offset) {
+  return (int16_t)(payload[offset] | (payload[offset + 1] << 8));
+}
+
+void handleFrame() {
+  if (payload[0] == FRAME_BAUD) {
+    changeBaudRate(payload[1], (long)readInt16(2) * 100);
+    return;
+  }
+  if (payload[0] == FRAME_MOTOR) {
+    m1 = constrain(readInt16(2), -255, 255);
+    m2 = constrain(readInt16(4), -255, 255);
+    m3 = constrain(readInt16(6), -255, 255);
+    controlMotors();
+  } else if (payload[0] != FRAME_HEARTBEAT) {
+    return;
+  }
+  lastSequence = payload[1];
+  lastFrameAt = millis();
+  watchdogArmed = true;
+  // ACK binário curto em vez do eco em texto (~40 ms de serial a 9600 baud)
+  sendAck();
+}
+
+void writeInt16(byte *buffer, int value) {
+  buffer[0] = value & 0xFF;
+  buffer[1] = (value >> 8) & 0xFF;
+}
+
+void sendAck() {
+  sendFrame(FRAME_ACK, lastSequence, m1, m2, m3);
+}
+
+void sendFrame(byte type, byte sequence, int v1, int v2, int v3) {
+  byte frame[FRAME_SIZE];
+  frame[0] = FRAME_SYNC1;
+  frame[1] = FRAME_SYNC2;
+  frame[2] = type;
+  frame[3] = sequence;
+  writeInt16(&frame[4], v1);
+  writeInt16(&frame[6], v2);
+  writeInt16(&frame[8], v3);
+  frame[10] = crc8(&frame[2], FRAME_PAYLOAD_SIZE);
+  Serial.write(frame, FRAME_SIZE);
+}
+
+void changeBaudRate(byte sequence, long requested) {
+  for (byte i = 0; i < sizeof(BAUD_RATES) / sizeof(BAUD_RATES[0]); i++) {
+    if (BAUD_RATES[i] == requested) {
+      baudRate = requested;
+    }
   }
+  // Confirma na taxa antiga (taxa recusada: confirma a atual) e só troca
+  // depois que o último byte da confirmação saiu
+  sendFrame(FRAME_BAUD_ACK, sequence, baudRate / 100, 0, 0);
+  Serial.flush();
+  Serial.end();
+  Serial.begin(baudRate);
+  parserState = WAIT_SYNC1;
+  lineLength = 0;
 }
 
 void parseCommand(String command) {
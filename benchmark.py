@@ -0,0 +1,647 @@
+"""
+Benchmarks de desempenho do sistema de navegação autônoma
+- Usa frames sintéticos, não precisa dos sensores conectados
+- Uso: python benchmark.py [nome ...]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import cv2
+
+import sensor_bag
+from arduino_connection import open_arduino
+from fake_arduino import FakeArduino
+from fake_realsense import FakeRealSense
+from serial_protocol import SerialCommandWriter, encode_ascii_command
+from depth_filters import DepthPreprocessor, decimate, spatial_filter, fill_holes, TemporalFilter
+from ground_plane import GroundPlaneEstimator, camera_floor_plane
+from costmap import Costmap
+from local_planner import DynamicWindowPlanner
+from motor_control import VelocityRamp
+from frame_sync import Frame, FramePairer
+from robot_autonomous_control import (
+    RealSenseController, CameraIntrinsics, ObstacleDetector, AnalysisPool, AutonomousNavigator
+)
+
+
+def synthetic_depth(height, width, seed=0):
+    """Gera um frame de profundidade sintético (uint16, milímetros)"""
+    rng = np.random.default_rng(seed)
+    depth = rng.integers(50, 12000, size=(height, width), dtype=np.uint16)
+    depth[rng.random((height, width)) < 0.1] = 0  # Buracos (pixels inválidos)
+    return depth
+
+
+def synthetic_color(height, width, seed=0):
+    """Gera um frame de cor sintético (BGR)"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+
+def time_call(func, repeat=20):
+    """Retorna a mediana do tempo de execução em milissegundos"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def legacy_back_project(depth_image, color_image=None):
+    """Implementação original (laços Python) usada como referência"""
+    depth_meters = depth_image * 0.001
+    height, width = depth_meters.shape
+    fx = fy = 500
+    cx, cy = width / 2, height / 2
+
+    points = []
+    colors = []
+    for v in range(0, height, 4):
+        for u in range(0, width, 4):
+            z = depth_meters[v, u]
+            if z > 0.1 and z < 10:
+                x = (u - cx) * z / fx
+                y = (v - cy) * z / fy
+                points.append([x, y, z])
+
+                if color_image is not None:
+                    b, g, r = color_image[v, u]
+                    colors.append([r/255.0, g/255.0, b/255.0])
+                else:
+                    colors.append([0.5, 0.5, 0.5])
+
+    return np.array(points), np.array(colors)
+
+
+def peak_allocation(func):
+    """Retorna o pico de memória alocada (KiB) durante uma chamada"""
+    func()  # Aquecimento (buffers reutilizáveis, caches)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def legacy_analyze_lidar(depth_image):
+    """Implementação original (máscaras sobre o frame em metros) usada como referência"""
+    depth_meters = depth_image * 0.001
+    height, width = depth_meters.shape
+    sectors = [depth_meters[:, :width//3],
+               depth_meters[:, width//3:2*width//3],
+               depth_meters[:, 2*width//3:]]
+    minima = []
+    for sector in sectors:
+        valid = sector[sector > 0]
+        minima.append(np.min(valid) if len(valid) > 0 else 10.0)
+    return minima
+
+
+def bench_point_cloud(args):
+    """Nuvem de pontos: laços Python vs. projeção vetorizada"""
+    sensors = RealSenseController()
+
+    for height, width in [(768, 1024), (480, 640)]:
+        depth = synthetic_depth(height, width)
+        color = synthetic_color(height, width)
+
+        # Confere se as duas implementações produzem os mesmos arrays
+        ref_points, ref_colors = legacy_back_project(depth, color)
+        intrinsics = CameraIntrinsics.approximate(width, height)
+        points, colors = sensors.back_project(depth, color, intrinsics=intrinsics)
+        assert np.allclose(ref_points, points) and np.allclose(ref_colors, colors)
+
+        legacy_ms = time_call(lambda: legacy_back_project(depth, color), repeat=3)
+        print(f"{width}x{height}  legado:       {legacy_ms:8.2f} ms")
+        for stride in (4, 2, 1):
+            vector_ms = time_call(
+                lambda: sensors.back_project(depth, color, stride, intrinsics), args.repeat)
+            speedup = f"  ({legacy_ms / vector_ms:5.1f}x)" if stride == 4 else ""
+            print(f"{width}x{height}  vetorizado/{stride}: {vector_ms:8.2f} ms{speedup}")
+
+
+def bench_sectors(args):
+    """Mínimo por setor: máscaras em float64 vs. kernel de passe único em uint16"""
+    intrinsics = CameraIntrinsics.approximate(1024, 768)
+    depth = synthetic_depth(768, 1024)
+
+    legacy = lambda: legacy_analyze_lidar(depth)
+    print(f"1024x768  {'legado':10s} {time_call(legacy, args.repeat):7.2f} ms"
+          f"  pico {peak_allocation(legacy):9.1f} KiB")
+
+    for n_sectors in (3, 16):
+        detector = ObstacleDetector(safe_distance=0.8, n_sectors=n_sectors)
+        result = detector.analyze_lidar(depth, intrinsics)
+        assert list(result['distances'].values()) == legacy()
+
+        kernel = lambda: detector.analyze_lidar(depth, intrinsics)
+        print(f"1024x768  {f'kernel/{n_sectors}':10s} {time_call(kernel, args.repeat):7.2f} ms"
+              f"  pico {peak_allocation(kernel):9.1f} KiB")
+
+
+async def run_pool_frames(pool, frames, in_flight):
+    """Processa os frames mantendo até `in_flight` frames em andamento"""
+    semaphore = asyncio.Semaphore(in_flight)
+
+    async def process(lidar, lidar_intr, color, depth, camera_intr):
+        async with semaphore:
+            await asyncio.gather(
+                pool.analyze(lidar, lidar_intr, depth, camera_intr),
+                pool.encode_jpeg(color, 50),
+                pool.back_project(lidar, lidar_intr)
+            )
+
+    await asyncio.gather(*[process(*frame) for frame in frames])
+
+
+def bench_analysis_pool(args):
+    """Vazão do processamento (frames/s) por modo e número de trabalhadores"""
+    sensors = RealSenseController()
+    detector = ObstacleDetector(safe_distance=0.8)
+    lidar_intr = CameraIntrinsics.approximate(1024, 768)
+    camera_intr = CameraIntrinsics.approximate(640, 480)
+    frames = [
+        (synthetic_depth(768, 1024, seed), lidar_intr,
+         synthetic_color(480, 640, seed), synthetic_depth(480, 640, seed), camera_intr)
+        for seed in range(8)
+    ]
+    total = max(args.repeat, 8) * 4
+
+    for mode in AnalysisPool.MODES:
+        for workers in ((1,) if mode == 'inline' else (1, 2, 4)):
+            pool = AnalysisPool(detector, sensors, mode=mode, workers=workers)
+            batch = [frames[i % len(frames)] for i in range(total)]
+            # Aquecimento (inicializa trabalhadores, tabelas de raios e memória compartilhada)
+            asyncio.run(run_pool_frames(pool, frames, workers))
+
+            start = time.perf_counter()
+            asyncio.run(run_pool_frames(pool, batch, workers))
+            fps = total / (time.perf_counter() - start)
+            pool.shutdown()
+            print(f"{mode:8s} {workers} trabalhador(es): {fps:7.1f} frames/s")
+
+
+def smooth_depth(height, width, seed=0):
+    """Profundidade sintética suave (parede inclinada com ruído), mais parecida com a real"""
+    rng = np.random.default_rng(seed)
+    rows, cols = np.mgrid[0:height, 0:width]
+    depth = 1500 + rows * 3 + 200 * np.sin(cols / 50 + seed) + rng.normal(0, 4, (height, width))
+    depth = depth.astype(np.uint16)
+    depth[rng.random((height, width)) < 0.05] = 0
+    return depth
+
+
+def record_synthetic_bag(path, frames=30):
+    """Grava um bag sintético (LiDAR 1024x768 e câmera 640x480 a 30 Hz)"""
+    writer = sensor_bag.SensorBagWriter(path, {
+        'lidar': CameraIntrinsics.approximate(1024, 768).to_dict(),
+        'camera': CameraIntrinsics.approximate(640, 480).to_dict(),
+    })
+    for i in range(frames):
+        writer.add(sensor_bag.LIDAR, i / 30, smooth_depth(768, 1024, i))
+        writer.add(sensor_bag.CAMERA, i / 30 + 0.005, smooth_depth(480, 640, i), synthetic_color(480, 640, i))
+    writer.close()
+
+
+def bench_bag(args):
+    """Bag de sensores: tamanho, decodificação e análise de todos os frames gravados"""
+    if args.bag is None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'synthetic.bag')
+            record_synthetic_bag(path)
+            report_bag(path)
+    else:
+        report_bag(args.bag)
+
+
+def report_bag(path):
+    bag = sensor_bag.SensorBagReader(path)
+    lidar, camera = bag.frames(sensor_bag.LIDAR), bag.frames(sensor_bag.CAMERA)
+    raw = sum(int(r['height']) * int(r['width']) * (2 if r['stream'] == sensor_bag.LIDAR else 5)
+              for r in bag.index)
+    print(f"{path}: {len(lidar)} LiDAR + {len(camera)} câmera, {bag.duration:.1f} s, "
+          f"{os.path.getsize(path) / 1e6:.1f} MB ({raw / os.path.getsize(path):.1f}x menor que o bruto)")
+
+    for name, positions in (('LiDAR', lidar), ('câmera', camera)):
+        if len(positions):
+            decode_ms = time_call(lambda: [bag.read(i) for i in positions], repeat=3) / len(positions)
+            print(f"decodificação {name:7s} {decode_ms:6.2f} ms/frame")
+
+    # Mesma análise do sensor_loop, frame a frame (reprodutível entre máquinas)
+    detector = ObstacleDetector(safe_distance=0.8)
+    sensors = RealSenseController()
+    sensors.apply_calibration(bag.metadata)
+    depths = [bag.read(i) for i in lidar]
+    if depths:
+        analyze_ms = time_call(lambda: [detector.analyze_lidar(d, sensors.lidar_intrinsics)
+                                        for d in depths], repeat=3) / len(depths)
+        print(f"análise LiDAR        {analyze_ms:6.2f} ms/frame")
+
+
+class LegacySerialWriter:
+    """Escrita original: texto, bloqueante, a cada iteração (mesmo sem mudança)"""
+
+    def __init__(self, port):
+        self.port = port
+        self.sent = 0
+
+    def submit(self, m1, m2, m3):
+        self.port.write(encode_ascii_command(m1, m2, m3))
+        self.sent += 1
+        return True
+
+    def close(self):
+        pass
+
+
+def bench_serial(args):
+    """Serial (Arduino simulado em pty): conexão, latência e comandos escritos"""
+    ticks, rate = 60, 30  # 2 s de controle a 30 Hz; o comando muda a cada 10 ticks
+    for name, baudrate in (('legado', 9600), ('ascii', 9600), ('binary', 9600), ('binary', 115200)):
+        arduino = FakeArduino(baudrate=9600)
+        connect_start = time.perf_counter()
+        port = open_arduino(arduino.port, baudrate)
+        connect_ms = (time.perf_counter() - connect_start) * 1000
+        writer = LegacySerialWriter(port) if name == 'legado' else SerialCommandWriter(port, name)
+
+        submitted = {}  # comando -> instante do primeiro envio
+        start = time.perf_counter()
+        for tick in range(ticks):
+            change = tick // 10
+            command = (100 + change, -100 - change, change)
+            submitted.setdefault(command, time.perf_counter())
+            writer.submit(*command)
+            time.sleep(max(0.0, start + (tick + 1) / rate - time.perf_counter()))
+        time.sleep(0.2)
+        writer.close()
+
+        # Latência: primeiro envio de cada comando -> chegada completa no Arduino
+        arrivals = {}
+        for arrival, _, _, *command in arduino.received():
+            arrivals.setdefault(tuple(command), arrival)
+        latency = [(arrivals[c] - t) * 1000 for c, t in submitted.items() if c in arrivals]
+        port.close()
+        arduino.close()
+        rtt = f", ida e volta (ACK) {writer.rtt:5.2f} ms" if getattr(writer, 'rtt', None) else ""
+        print(f"{name:7s} {baudrate:6d} baud: pronto em {connect_ms:4.0f} ms, {writer.sent:3d} comandos escritos para {ticks} ticks, "
+              f"{len(arduino.commands)} recebidos, latência p50 {np.percentile(latency, 50):5.2f} ms "
+              f"p95 {np.percentile(latency, 95):5.2f} ms{rtt}")
+
+
+def noisy_wall(height, width, distance_mm=3000, speckle=0.005, seed=0):
+    """Parede livre a `distance_mm` com ruído de medição, buracos e pontos espúrios perto do sensor"""
+    rng = np.random.default_rng(seed)
+    depth = (distance_mm + rng.normal(0, 15, size=(height, width))).astype(np.uint16)
+    depth[rng.random((height, width)) < 0.05] = 0
+    depth[rng.random((height, width)) < speckle] = rng.integers(100, 400)
+    return depth
+
+
+def bench_preprocess(args):
+    """Pré-processamento da profundidade: custo das etapas, da análise e obstáculos falsos"""
+    depth = synthetic_depth(768, 1024)
+    small = decimate(depth, 2)  # Entrada das etapas seguintes
+    temporal = TemporalFilter()
+    temporal(synthetic_depth(384, 512, seed=1))
+    for name, stage in [('decimação/2', lambda: decimate(depth, 2)),
+                        ('decimação/4', lambda: decimate(depth, 4)),
+                        ('espacial/2', lambda: spatial_filter(small)),
+                        ('temporal/2', lambda: temporal(small)),
+                        ('buracos/2', lambda: fill_holes(small))]:
+        print(f"1024x768  {name:12s} {time_call(stage, args.repeat):7.2f} ms")
+
+    # Custo por frame: pré-processamento + análise, comparado com a análise do frame bruto
+    intrinsics = CameraIntrinsics.approximate(1024, 768)
+    detector = ObstacleDetector(safe_distance=0.8, n_sectors=16)
+    raw_ms = time_call(lambda: detector.analyze_lidar(depth, intrinsics), args.repeat)
+    print(f"1024x768  {'análise bruta':24s} {raw_ms:7.2f} ms")
+    for factor in (2, 4):
+        preprocessor = DepthPreprocessor(decimation=factor)
+        scaled = preprocessor.scale_intrinsics(intrinsics)
+        processed = preprocessor.process(depth)
+        analysis_ms = time_call(lambda: detector.analyze_lidar(processed, scaled), args.repeat)
+        total_ms = time_call(lambda: detector.analyze_lidar(preprocessor.process(depth), scaled), args.repeat)
+        print(f"1024x768  {f'análise decimada/{factor}':24s} {analysis_ms:7.2f} ms"
+              f"  (com pré-processamento {total_ms:6.2f} ms)")
+
+    # Obstáculos falsos: parede livre a 3 m com pontos espúrios a 0,1-0,4 m
+    frames = [noisy_wall(768, 1024, seed=seed) for seed in range(30)]
+    for name, preprocessor, percentile in [('bruto, mínimo', None, None),
+                                           ('bruto, p1', None, 1.0),
+                                           ('filtrado, mínimo', DepthPreprocessor(), None),
+                                           ('filtrado, p1', DepthPreprocessor(), 1.0)]:
+        detector = ObstacleDetector(safe_distance=0.8, n_sectors=16, percentile=percentile)
+        flagged = 0
+        for frame in frames:
+            if preprocessor:
+                frame = preprocessor.process(frame)
+            flagged += sum(d < detector.safe_distance for d in detector.analyze_lidar(frame)['sectors'])
+        print(f"parede livre  {name:17s} setores com obstáculo falso: {flagged:3d} de {16 * len(frames)}")
+
+
+def floor_scene(intrinsics, camera_height=0.3, camera_pitch=10.0, box=(1.2, 0.5), wall=4.0, seed=0):
+    """Profundidade (uint16) de chão, uma caixa (distância, altura) no terço central e uma parede alta"""
+    rng = np.random.default_rng(seed)
+    normal, d = camera_floor_plane(camera_height, np.radians(camera_pitch))
+    forward = np.array((0.0, 0.0, 1.0)) - normal[2] * normal
+    forward /= np.linalg.norm(forward)
+    x_ray, y_ray = intrinsics.ray_table(1)
+    up = normal[0] * x_ray + normal[1] * y_ray + normal[2]
+    ahead = forward[0] * x_ray + forward[1] * y_ray + forward[2]
+    with np.errstate(divide='ignore'):
+        z = np.where(up < 0, -d / up, np.inf)  # Chão
+        for distance, top, columns in [(wall, 10.0, slice(None)),
+                                       (box[0], box[1], slice(intrinsics.width // 3, 2 * intrinsics.width // 3))]:
+            hit = np.where(ahead > 0, distance / ahead, np.inf)
+            height = hit * up + d
+            inside = (height >= 0) & (height <= top) & (hit < z)
+            inside[:, :columns.start or 0] = False
+            inside[:, columns.stop or intrinsics.width:] = False
+            z = np.where(inside, hit, z)
+    z = z + rng.normal(0, 0.005, size=z.shape)
+    return np.where(np.isfinite(z) & (z < 10), np.rint(z / intrinsics.depth_scale), 0).astype(np.uint16)
+
+
+def bench_ground(args):
+    """Altura real com plano do chão: ajuste RANSAC, plano em cache e análise de altura"""
+    intrinsics = CameraIntrinsics(424, 240, 210, 210, 212, 120)  # D435 com decimação 2
+    depth = floor_scene(intrinsics)
+
+    ground = GroundPlaneEstimator(camera_height=0.3, camera_pitch=0.0)  # Montagem aproximada
+    ground.update(depth, intrinsics)
+    print(f"plano ajustado: altura {ground.camera_height:.3f} m (real 0.300), "
+          f"inclinação {ground.camera_pitch:.1f}° (real 10.0, montagem 0.0)")
+
+    def refit():
+        ground._plane = (*ground.prior, 0)
+        ground.update(depth, intrinsics)
+    print(f"424x240  {'reajuste (RANSAC)':20s} {time_call(refit, args.repeat):7.3f} ms")
+    print(f"424x240  {'plano em cache':20s} {time_call(lambda: ground.update(depth, intrinsics), args.repeat):7.3f} ms")
+
+    legacy = ObstacleDetector(safe_distance=0.8)
+    detector = ObstacleDetector(safe_distance=1.5, ground=ground)
+    for name, analyze in [('profundidade bruta', lambda: legacy.analyze_height(depth, intrinsics)),
+                          ('altura real', lambda: detector.analyze_height(depth, intrinsics))]:
+        distances = analyze()['distances']
+        print(f"424x240  {name:20s} {time_call(analyze, args.repeat):7.3f} ms  "
+              + "  ".join(f"{side} {distance:5.2f} m" for side, distance in distances.items()))
+
+
+def bench_costmap(args):
+    """Costmap 2D: atualização com inflação incremental e consulta de espaço livre"""
+    lidar_intr = CameraIntrinsics.approximate(1024, 768).decimated(2)
+    camera_intr = CameraIntrinsics(424, 240, 210, 210, 212, 120)
+    lidar = DepthPreprocessor(temporal_alpha=0).process(noisy_wall(768, 1024, distance_mm=2500))
+    camera = floor_scene(camera_intr)
+    ground = GroundPlaneEstimator(camera_height=0.3, camera_pitch=10.0)
+    detector = ObstacleDetector(safe_distance=0.8, ground=ground, obstacle_points=True)
+    lidar_points = detector.analyze_lidar(lidar, lidar_intr)['points']
+    camera_points = detector.analyze_height(camera, camera_intr)['points']
+    moved = [camera_points, camera_points + np.float32((0.05, 0.0))]  # Caixa anda 5 cm
+
+    for size, resolution in [(6.0, 0.05), (10.0, 0.02)]:
+        # 50 atualizações aleatórias: a inflação incremental tem de dar a mesma
+        # distância que a transformada da grade inteira a cada passo (a menos
+        # do arredondamento em float32, que muda com o recorte)
+        rng = np.random.default_rng(0)
+        incremental = Costmap(size=size, resolution=resolution, full_fraction=np.inf)
+        reference = Costmap(size=size, resolution=resolution, full_fraction=0)
+        for _ in range(50):
+            source = ('lidar', 'camera')[rng.integers(2)]
+            center = rng.uniform(-size / 2, size / 2, 2)
+            points = center + rng.normal(0.0, 0.3, (int(rng.integers(0, 200)), 2))
+            incremental.update(source, points)
+            reference.update(source, points)
+            assert np.array_equal(incremental.occupied, reference.occupied)
+            assert np.allclose(incremental.distance, reference.distance, rtol=0, atol=1e-6)
+
+        frames = iter(moved * (args.repeat + 1))
+        incremental.clear()
+        incremental.update('lidar', lidar_points)
+        incremental.update('camera', next(frames))
+        window_ms = time_call(lambda: incremental.update('camera', next(frames)), args.repeat)
+        reference.clear()
+        reference.update('lidar', lidar_points)
+        reference.update('camera', next(frames))
+        whole_ms = time_call(lambda: reference.update('camera', next(frames)), args.repeat)
+        print(f"{incremental.cells}x{incremental.cells}: 50 atualizações aleatórias "
+              f"iguais à grade inteira; obstáculo move 5 cm: só a janela {window_ms:.3f} ms, "
+              f"grade inteira {whole_ms:.3f} ms")
+
+        costmap = Costmap(size=size, resolution=resolution)
+        print(f"{costmap.cells}x{costmap.cells} células ({resolution * 100:.0f} cm): "
+              f"{len(lidar_points)} pontos do LiDAR, {len(camera_points)} da câmera")
+        full_ms = time_call(lambda: (costmap.clear(), costmap.update('lidar', lidar_points)), args.repeat)
+        print(f"  {'grade vazia -> LiDAR':26s} {full_ms:7.3f} ms")
+        costmap.update('lidar', lidar_points)
+        print(f"  {'mesmo frame (sem mudança)':26s} "
+              f"{time_call(lambda: costmap.update('lidar', lidar_points), args.repeat):7.3f} ms")
+
+        frames = iter(moved * (args.repeat + 1))
+        costmap.update('camera', next(frames))
+        camera_ms = time_call(lambda: costmap.update('camera', next(frames)), args.repeat)
+        print(f"  {'obstáculo move 5 cm':26s} {camera_ms:7.3f} ms"
+              f"  ({costmap.updated_cells} de {costmap.cells ** 2} células recalculadas)")
+
+        full = lambda: cv2.distanceTransform(np.where(costmap.occupied, 0, 255).astype(np.uint8),
+                                             cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+        print(f"  {'transformada completa':26s} {time_call(full, args.repeat):7.3f} ms")
+
+        navigator = AutonomousNavigator(detector, costmap=costmap)
+        free = lambda: costmap.free_space(navigator.SCAN_ANGLES)
+        print(f"  {f'espaço livre ({len(navigator.SCAN_ANGLES)} direções)':26s} "
+              f"{time_call(free, args.repeat):7.3f} ms")
+
+
+def wall_points(start, end, spacing=0.02):
+    """Pontos (Nx2) ao longo de uma parede do mundo, de `start` a `end`"""
+    start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+    count = max(int(np.linalg.norm(end - start) / spacing), 1) + 1
+    return start + np.linspace(0.0, 1.0, count)[:, None] * (end - start)
+
+
+def simulate_navigation(navigator, world, pose, ticks=450, rate=30.0, fov=np.radians(43.5), max_range=4.0):
+    """Malha fechada: sensores simulados -> costmap -> navegador -> rampa -> pose
+
+    Retorna a trajetória (ticks x 3) e as velocidades decididas (ticks x 3).
+    """
+    ramp = VelocityRamp()
+    x, y, theta = pose
+    poses, commands = [], []
+    for _ in range(ticks):
+        # Obstáculos no referencial do robô, só os que os sensores (à frente) enxergam
+        dx, dy = world[:, 0] - x, world[:, 1] - y
+        local = np.column_stack((dx * np.cos(theta) + dy * np.sin(theta), -dx * np.sin(theta) + dy * np.cos(theta)))
+        distance, bearing = np.hypot(*local.T), np.arctan2(local[:, 1], local[:, 0])
+        navigator.costmap.update('lidar', local[(np.abs(bearing) <= fov) & (distance < max_range)])
+        command = navigator.decide_velocity(None, None)
+        ramp.set_target(*command)
+        vx, vy, omega = ramp.step(1.0 / rate)
+        x += (vx * np.cos(theta) - vy * np.sin(theta)) / rate
+        y += (vx * np.sin(theta) + vy * np.cos(theta)) / rate
+        theta += omega / rate
+        poses.append((x, y, theta))
+        commands.append(command)
+    return np.array(poses), np.array(commands)
+
+
+def bench_planner(args):
+    """Planejador local (DWA): tempo por tick vs. amostras e malha fechada vs. regras por setor"""
+    corridor = np.vstack((wall_points((-1, -0.6), (8, -0.6)), wall_points((-1, 0.6), (8, 0.6))))
+    dead_end = np.vstack((wall_points((-1, -0.6), (2.5, -0.6)), wall_points((-1, 0.6), (2.5, 0.6)),
+                          wall_points((2.5, -0.6), (2.5, 0.6))))
+    detector = ObstacleDetector(safe_distance=0.8)
+
+    costmap = Costmap()
+    costmap.update('lidar', corridor[corridor[:, 0] > 0.1])
+    sectors = AutonomousNavigator(detector, costmap=costmap)
+    print(f"{'regras por setor':24s} {time_call(lambda: sectors.decide_velocity(None, None), args.repeat):7.3f} ms")
+    for samples in [(5, 3, 5), (7, 5, 11), (11, 7, 21), (15, 11, 31)]:
+        planner = DynamicWindowPlanner(costmap, samples=samples)
+        plan_ms = time_call(lambda: planner.plan((0.2, 0.0, 0.0)), args.repeat)
+        print(f"{f'DWA {planner.n_samples} amostras':24s} {plan_ms:7.3f} ms  "
+              f"({len(planner._steps)} passos, {plan_ms / (1000 / 30) * 100:4.1f}% do tick de 30 Hz)")
+
+    # Robô fora do centro e virado 20° para a parede
+    for scene, world in [('corredor', corridor), ('beco sem saída', dead_end)]:
+        for name in ('setores', 'DWA'):
+            costmap = Costmap()
+            planner = DynamicWindowPlanner(costmap) if name == 'DWA' else None
+            navigator = AutonomousNavigator(detector, costmap=costmap, planner=planner)
+            poses, commands = simulate_navigation(navigator, world, (0.0, 0.25, np.radians(20)), ticks=900)
+            turning = np.sign(commands[:, 2][np.abs(commands[:, 2]) > 0.05])
+            clearance = min(np.hypot(*(world - pose[:2]).T).min() for pose in poses)
+            print(f"{scene:15s} {name:8s} 30 s: x final {poses[-1, 0]:5.2f} m, "
+                  f"virado a {np.degrees(np.angle(np.exp(1j * poses[-1, 2]))):4.0f}°  "
+                  f"trocas de giro {np.count_nonzero(np.diff(turning)):3d}  "
+                  f"ticks de ré {np.count_nonzero(commands[:, 0] < 0):3d}  menor folga {clearance:4.2f} m")
+
+
+def sensor_frames(rate, phase, latency, jitter, drop, duration, rng):
+    """Frames simulados de um sensor: (chegada ao host, Frame) com captura no relógio comum"""
+    frames, sequence = [], 0
+    for k in range(int(duration * rate)):
+        capture = phase + k / rate + rng.normal(0, jitter)
+        if rng.random() < drop:
+            continue  # Perdido no sensor ou no USB
+        sequence += 1
+        frames.append((capture + latency + abs(rng.normal(0, jitter)), Frame(sequence, capture, None, capture, k)))
+    return frames
+
+
+def bench_sync(args):
+    """Pareamento LiDAR/câmera: diferença entre os frames usados juntos, mais novo vs. mais próximo"""
+    rng = np.random.default_rng(0)
+    duration, history = 60.0, 8
+    lidar = sensor_frames(30, 0.000, latency=0.008, jitter=0.002, drop=0.0, duration=duration, rng=rng)
+    camera = sensor_frames(30, 0.014, latency=0.025, jitter=0.002, drop=0.05, duration=duration, rng=rng)
+    pairer = FramePairer(tolerance=0.02)
+    naive, paired, calls = [], [], []
+    for tick in np.arange(0.1, duration, 1 / 30) + 0.003:
+        # O que já chegou ao host até este ciclo de controle
+        lidar_recent = [frame for arrival, frame in lidar if arrival <= tick][-history:]
+        camera_recent = [frame for arrival, frame in camera if arrival <= tick][-history:]
+        naive.append(abs(lidar_recent[-1].sync_time - camera_recent[-1].sync_time) * 1000)
+        start = time.perf_counter()
+        bundle = pairer.pair(lidar_recent, camera_recent)
+        calls.append((time.perf_counter() - start) * 1e6)
+        if bundle is not None and bundle.paired:
+            paired.append(bundle.skew * 1000)
+
+    for name, skew in (('mais novo de cada', naive), ('par mais próximo', paired)):
+        p50, p95 = np.percentile(skew, (50, 95))
+        print(f"{name:18s} diferença p50 {p50:5.1f} ms  p95 {p95:5.1f} ms  máx {max(skew):5.1f} ms  ({len(skew)} decisões)")
+    print(f"{pairer.summary()} | pareamento {np.median(calls):.1f} µs/ciclo")
+
+
+def bench_hotplug(args):
+    """Sensor desconectado: o outro e o controle seguem a 30 Hz enquanto ele é religado"""
+    backend = FakeRealSense(start_time=0.3)
+    sensors = RealSenseController(backend=backend)
+    sensors.start()
+    lidar, camera = (sensors.devices.slots[role].serial for role in ('lidar', 'camera'))
+    # (instante, ação): câmera desconectada e reconectada; LiDAR travado (sem evento USB)
+    events = [(1.0, lambda: backend.unplug(camera)), (3.0, lambda: backend.plug(camera)),
+              (5.0, lambda: backend.hang(lidar))]
+    # fase -> [ciclos, decisões, frames do LiDAR, frames da câmera, pior get_frames (ms)]
+    phases = {}
+    grabbers = (sensors.lidar_grabber, sensors.camera_grabber)
+    sequences = [grabber.sequence for grabber in grabbers]
+    plugged_at, recovered = None, None
+    start = time.perf_counter()
+    tick = start
+    while tick - start < 9.0:
+        now = time.perf_counter()
+        while events and now - start >= events[0][0]:
+            if events[0][0] == 3.0:
+                plugged_at = now
+            events.pop(0)[1]()
+        elapsed = now - start
+        phase = ('ambos' if elapsed < 1.0 else 'câmera fora' if elapsed < 3.0 else
+                 'câmera voltando' if elapsed < 5.0 else 'LiDAR travado')
+        bundle = sensors.get_frames()
+        cost = (time.perf_counter() - now) * 1000
+        stats = phases.setdefault(phase, [0, 0, 0, 0, 0.0])
+        stats[0] += 1
+        stats[1] += bundle is not None
+        for i, grabber in enumerate(grabbers):
+            stats[2 + i] += grabber.sequence - sequences[i]
+            sequences[i] = grabber.sequence
+        stats[4] = max(stats[4], cost)
+        if bundle is not None and bundle.camera is not None and plugged_at and recovered is None:
+            recovered = now - plugged_at
+        tick += 1 / 30
+        time.sleep(max(0.0, tick - time.perf_counter()))
+    summary = sensors.devices.summary()
+    sensors.stop()
+
+    for phase, (ticks, decisions, lidar_frames, camera_frames, worst) in phases.items():
+        duration = ticks / 30
+        print(f"{phase:16s} LiDAR {lidar_frames / duration:5.1f} Hz  câmera {camera_frames / duration:5.1f} Hz | "
+              f"{decisions:3d} decisões em {ticks} ciclos | pior get_frames {worst:.2f} ms")
+    if recovered is not None:
+        print(f"Câmera: primeiro frame usado {recovered:.2f} s depois de reconectar o cabo")
+    print(summary)
+    print(f"Enumerações de dispositivos: {backend.queries} | pipelines iniciados: {backend.starts}")
+
+
+BENCHMARKS = {
+    'point_cloud': bench_point_cloud,
+    'sectors': bench_sectors,
+    'preprocess': bench_preprocess,
+    'ground': bench_ground,
+    'costmap': bench_costmap,
+    'planner': bench_planner,
+    'sync': bench_sync,
+    'hotplug': bench_hotplug,
+    'analysis_pool': bench_analysis_pool,
+    'bag': bench_bag,
+    'serial': bench_serial,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do sistema de navegação")
+    parser.add_argument('names', nargs='*',
+                        help=f"Benchmarks a executar: {', '.join(BENCHMARKS)} (padrão: todos)")
+    parser.add_argument('--repeat', type=int, default=20, help="Repetições por medida")
+    parser.add_argument('--bag', help="Bag gravado com --record (padrão: bag sintético)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"benchmark desconhecido: {', '.join(unknown)}")
+
+    for name in args.names or BENCHMARKS:
+        print(f"\n=== {name}: {BENCHMARKS[name].__doc__} ===")
+        BENCHMARKS[name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Costmap 2D centrado no robô, com os obstáculos dos dois sensores
+- Grade (NumPy) de `size` x `size` metros com o robô no centro; eixo 0 para
+  frente (x), eixo 1 para a esquerda (y)
+- Cada sensor é uma camada com os obstáculos do seu frame mais recente;
+  a ocupação é a união das camadas (sem odometria, o mapa é recomposto a
+  partir dos frames, em vez de deslocado com o movimento)
+- Cada camada guarda o instante do seu frame: expire() descarta as que
+  ficaram velhas (sensor desconectado ou sem par) e as marca como
+  desconhecidas em `unknown`, em vez de deixá-las valendo como espaço livre
+- Inflação: distância de cada célula ao obstáculo mais próximo (transformada
+  de distância limitada a `inflation_radius`). Só a região em torno das
+  células que mudaram é recalculada; se ela cobre boa parte da grade, a
+  transformada da grade inteira sai mais barata
+- free_space() lança raios a partir do centro: quanto o robô anda em cada
+  direção até encostar (a menos de `robot_radius`) em um obstáculo
+"""
+
+import numpy as np
+import cv2
+
+LETHAL = 255  # Célula ocupada
+INSCRIBED = 254  # Robô encosta em um obstáculo com o centro nesta célula
+
+
+class Costmap:
+    """Ocupação, distância ao obstáculo e custo em uma grade centrada no robô"""
+
+    def __init__(self, size=6.0, resolution=0.05, robot_radius=0.2, inflation_radius=0.5, max_age=0.07,
+                 full_fraction=0.5):
+        self.resolution = resolution  # metros por célula
+        self.robot_radius = robot_radius
+        self.inflation_radius = max(inflation_radius, robot_radius)
+        self.cells = int(round(size / resolution)) | 1  # Ímpar: o robô fica no centro de uma célula
+        self.center = self.cells // 2
+        self.max_age = max_age  # s sem frame novo até a camada de um sensor expirar
+        # Fração da grade a partir da qual a inflação recalcula tudo (0 = sempre a grade inteira)
+        self.full_fraction = full_fraction
+        shape = (self.cells, self.cells)
+        self.occupied = np.zeros(shape, dtype=bool)
+        self.distance = np.full(shape, self.inflation_radius, dtype=np.float32)  # metros, limitada
+        self.updated_cells = 0  # Células recalculadas na última atualização
+        self.unknown = set()  # Sensores cuja camada expirou (sem frame recente)
+        self._layers = {}  # sensor -> ocupação do seu frame mais recente
+        self._stamps = {}  # sensor -> instante do frame da camada
+        self._radius_cells = int(np.ceil(self.inflation_radius / resolution))
+        self._rays = {}  # (ângulos, alcance) -> (índices das células, distâncias ao longo do raio)
+
+    @property
+    def extent(self):
+        """Alcance (m) do centro até a borda da grade"""
+        return self.center * self.resolution
+
+    def cells_of(self, points):
+        """Índices (linha, coluna) das células dos pontos (x à frente, y à esquerda; Nx2) dentro da grade"""
+        indices = np.floor(points / self.resolution + 0.5).astype(np.int64) + self.center
+        inside = ((indices >= 0) & (indices < self.cells)).all(axis=1)
+        return indices[inside, 0], indices[inside, 1]
+
+    def _mark(self, points):
+        """Ocupação com as células dos pontos; os de fora da grade caem numa borda descartada"""
+        padded = np.zeros((self.cells + 2, self.cells + 2), dtype=bool)
+        if points is not None and len(points):
+            # Com o deslocamento da borda tudo fica >= 0 e a conversão para
+            # inteiro (truncamento) arredonda para baixo, sem máscaras
+            indices = np.clip(np.asarray(points) * np.float32(1 / self.resolution)
+                              + np.float32(self.center + 1.5), 0, self.cells + 1).astype(np.intp)
+            padded[indices[:, 0], indices[:, 1]] = True
+        return padded[1:-1, 1:-1]
+
+    def update(self, source, points, stamp=None):
+        """Troca os obstáculos do sensor `source` pelos `points` (Nx2, metros) e atualiza a inflação
+
+        stamp: instante do frame (s), usado por expire().
+        """
+        self._layers[source] = self._mark(points)
+        self._stamps[source] = stamp
+        self.unknown.discard(source)
+        self._compose()
+
+    def expire(self, now, max_age=None):
+        """Descarta as camadas com frame mais velho que `max_age` s (padrão: self.max_age) em relação a `now`
+
+        Retorna os sensores que acabaram de ficar desconhecidos (ver `unknown`).
+        """
+        max_age = self.max_age if max_age is None else max_age
+        expired = [source for source, stamp in self._stamps.items()
+                   if stamp is not None and now - stamp > max_age]
+        for source in expired:
+            del self._layers[source], self._stamps[source]
+            self.unknown.add(source)
+        if expired:
+            self._compose()
+        return expired
+
+    def _compose(self):
+        if self._layers:
+            occupied = np.logical_or.reduce(list(self._layers.values()))
+        else:
+            occupied = np.zeros_like(self.occupied)
+        changed = occupied ^ self.occupied
+        self.occupied = occupied
+        self._inflate(changed)
+
+    def clear(self):
+        self._layers.clear()
+        self._stamps.clear()
+        self.unknown.clear()
+        self._compose()
+
+    def _inflate(self, changed):
+        """Recalcula a distância só onde ela pode ter mudado"""
+        rows, cols = np.nonzero(changed.any(axis=1))[0], np.nonzero(changed.any(axis=0))[0]
+        if not len(rows):
+            self.updated_cells = 0
+            return
+        # Uma célula só é afetada por mudanças a até `inflation_radius`; para
+        # recalculá-la, basta enxergar os obstáculos a até esse raio dela
+        r = self._radius_cells
+        out = (slice(max(rows[0] - r, 0), rows[-1] + r + 1), slice(max(cols[0] - r, 0), cols[-1] + r + 1))
+        inp = (slice(max(rows[0] - 2 * r, 0), rows[-1] + 2 * r + 1),
+               slice(max(cols[0] - 2 * r, 0), cols[-1] + 2 * r + 1))
+        area = (inp[0].stop - inp[0].start) * (min(inp[1].stop, self.cells) - inp[1].start)
+        if area >= self.full_fraction * self.cells ** 2:
+            # Janela grande: recortar e copiar custa mais do que economiza
+            out = inp = (slice(0, self.cells), slice(0, self.cells))
+        source = np.where(self.occupied[inp], 0, 255).astype(np.uint8)
+        distance = cv2.distanceTransform(source, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+        window = (slice(out[0].start - inp[0].start, out[0].stop - inp[0].start),
+                  slice(out[1].start - inp[1].start, out[1].stop - inp[1].start))
+        distance = np.minimum(distance[window] * self.resolution, self.inflation_radius)
+        self.distance[out] = distance
+        self.updated_cells = distance.size
+
+    @property
+    def cost(self):
+        """Custo por célula: 0 (livre, além da inflação) a 253, INSCRIBED ao alcance do robô e LETHAL no obstáculo"""
+        distance = self.distance
+        span = max(self.inflation_radius - self.robot_radius, 1e-9)
+        cost = np.rint(253 * np.clip((self.inflation_radius - distance) / span, 0.0, 1.0)).astype(np.uint8)
+        cost[distance <= self.robot_radius] = INSCRIBED
+        cost[distance == 0] = LETHAL
+        return cost
+
+    def _ray_cells(self, angles, max_range):
+        key = (angles.tobytes(), max_range)
+        rays = self._rays.get(key)
+        if rays is None:
+            steps = np.arange(0.0, min(max_range, self.extent), self.resolution / 2)
+            x = np.cos(angles)[:, None] * steps
+            y = np.sin(angles)[:, None] * steps
+            cells = (np.floor(x / self.resolution + 0.5).astype(np.int64) + self.center,
+                     np.floor(y / self.resolution + 0.5).astype(np.int64) + self.center)
+            rays = self._rays[key] = (cells, steps)
+        return rays
+
+    def free_space(self, angles, max_range=3.0):
+        """Distância livre (m) a partir do robô em cada direção (radianos, 0 = frente, + = esquerda)"""
+        angles = np.asarray(angles, dtype=np.float64)
+        cells, steps = self._ray_cells(angles, max_range)
+        blocked = self.distance[cells] <= self.robot_radius
+        # Sem bloqueio: todo o alcance do raio
+        return np.where(blocked.any(axis=1), steps[blocked.argmax(axis=1)], len(steps) * self.resolution / 2)
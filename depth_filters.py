@@ -0,0 +1,134 @@
+"""
+Pré-processamento dos frames de profundidade antes da detecção de obstáculos
+- Trabalha em arrays NumPy (uint16), então vale igual para os frames ao vivo
+  do pyrealsense2 e para os reproduzidos de um bag
+- Etapas, na ordem recomendada pela Intel para os filtros do RealSense:
+  decimação -> espacial -> temporal -> preenchimento de buracos
+- Decimação por fator f: cada bloco f x f vira o menor pixel válido do
+  bloco (conservador, como o mínimo por setor), com f² vezes menos pixels
+  para as etapas seguintes e para a análise; o ruído isolado que ela
+  preserva sai no filtro espacial logo depois
+- Os intrínsecos do frame decimado vêm de scale_intrinsics()
+"""
+
+import numpy as np
+import cv2
+
+
+def decimate(depth, factor):
+    """Reduz a resolução em `factor`: menor profundidade válida (não 0) de cada bloco, 0 se nenhuma"""
+    if factor <= 1:
+        return depth
+    height, width = depth.shape[0] // factor * factor, depth.shape[1] // factor * factor
+    # Subtrair 1 transforma os inválidos (0) em 65535, que nunca vencem o
+    # mínimo; reduz primeiro as linhas de cada bloco (vistas com passo, linhas
+    # contíguas) e depois as colunas
+    rows = np.subtract(depth[0:height:factor, :width], 1, dtype=np.uint16, casting='unsafe')
+    for i in range(1, factor):
+        np.minimum(rows, depth[i:height:factor, :width] - np.uint16(1), out=rows)
+    block = rows[:, 0::factor].copy()
+    for j in range(1, factor):
+        np.minimum(block, rows[:, j::factor], out=block)
+    # Desfaz o deslocamento: o sentinela 65535 volta a ser 0 (inválido)
+    block += np.uint16(1)
+    return block
+
+
+def spatial_filter(depth):
+    """Mediana 3x3: remove pontos isolados (ruído sal e pimenta) preservando bordas"""
+    return cv2.medianBlur(depth, 3)
+
+
+def fill_holes(depth, iterations=1):
+    """Preenche pixels inválidos com o vizinho válido mais próximo do sensor
+
+    Conservador para desvio de obstáculos: um buraco nunca fica mais distante
+    que a sua vizinhança. Cada iteração avança um pixel para dentro do buraco.
+    """
+    depth = depth.copy()
+    for _ in range(iterations):
+        holes = depth == 0
+        if not holes.any():
+            break
+        # Vizinhos (esquerda, direita, cima, baixo) com 0 trocado por 65535
+        candidates = depth - np.uint16(1)
+        nearest = np.full_like(depth, np.iinfo(np.uint16).max)
+        np.minimum(nearest[:, 1:], candidates[:, :-1], out=nearest[:, 1:])
+        np.minimum(nearest[:, :-1], candidates[:, 1:], out=nearest[:, :-1])
+        np.minimum(nearest[1:], candidates[:-1], out=nearest[1:])
+        np.minimum(nearest[:-1], candidates[1:], out=nearest[:-1])
+        depth[holes] = nearest[holes] + np.uint16(1)
+    return depth
+
+
+class TemporalFilter:
+    """Média exponencial por pixel entre frames consecutivos
+
+    Diferenças maiores que `delta` (unidades brutas) são tratadas como
+    movimento e não são suavizadas; pixels inválidos no frame atual ou no
+    anterior reiniciam a média.
+    """
+
+    def __init__(self, alpha=0.4, delta=200):
+        self.alpha = alpha  # Peso do frame novo (1 = sem filtro)
+        self.delta = delta
+        self._state = None
+
+    def reset(self):
+        self._state = None
+
+    def __call__(self, depth):
+        current = depth.astype(np.float32)
+        state = self._state
+        if state is None or state.shape != current.shape:
+            self._state = current
+            return depth
+        smooth = (current > 0) & (state > 0) & (np.abs(current - state) <= self.delta)
+        state = np.where(smooth, self.alpha * current + (1 - self.alpha) * state, current)
+        self._state = state
+        return np.rint(state).astype(np.uint16)
+
+
+class DepthPreprocessor:
+    """Pré-processamento configurável de um stream de profundidade
+
+    Guarda estado (filtro temporal): use uma instância por stream.
+    """
+
+    def __init__(self, decimation=2, spatial=True, temporal_alpha=0.4, temporal_delta=0.05,
+                 hole_filling=True):
+        self.decimation = int(decimation)
+        self.spatial = spatial
+        self.temporal_alpha = temporal_alpha  # 0 desativa o filtro temporal
+        self.temporal_delta = temporal_delta  # metros
+        self.hole_filling = hole_filling
+        self._temporal = None
+        self._scaled = {}  # Intrínsecos decimados, por intrínsecos originais
+
+    def reset(self):
+        """Esquece o histórico do filtro temporal (stream reiniciado)"""
+        self._temporal = None
+
+    def process(self, depth, depth_scale=0.001):
+        """Aplica as etapas configuradas a um frame uint16"""
+        depth = decimate(depth, self.decimation)
+        if self.spatial:
+            depth = spatial_filter(depth)
+        if self.temporal_alpha:
+            if self._temporal is None:
+                self._temporal = TemporalFilter(self.temporal_alpha)
+            self._temporal.delta = self.temporal_delta / depth_scale
+            depth = self._temporal(depth)
+        if self.hole_filling:
+            depth = fill_holes(depth)
+        return depth
+
+    def scale_intrinsics(self, intrinsics):
+        """Intrínsecos equivalentes para os frames decimados (cacheados)"""
+        if intrinsics is None or self.decimation <= 1:
+            return intrinsics
+        scaled = self._scaled.get(id(intrinsics))
+        if scaled is None or scaled[0] is not intrinsics:
+            scaled = (intrinsics, intrinsics.decimated(self.decimation))
+            self._scaled[id(intrinsics)] = scaled
+        return scaled[1]
@@ -0,0 +1,194 @@
+"""
+Reconexão dos sensores RealSense sem reiniciar o processo
+- Um backend lista os dispositivos, inicia o pipeline de um serial e avisa
+  quando dispositivos são conectados ou removidos (RealSenseBackend em
+  robot_autonomous_control.py; FakeRealSense em fake_realsense.py, sem hardware)
+- Cada sensor é um DeviceSlot com o serial identificado na partida: a
+  reconexão reabre só esse serial, sem reenumerar nem reiniciar o outro
+- Remoção (evento do backend ou falhas seguidas do FrameGrabber) desliga o
+  pipeline do grabber e agenda a reconexão em uma thread própria, com espera
+  exponencial entre as tentativas; a volta do serial acorda a tentativa
+- O grabber continua vivo com os mesmos filtros e gravação; o
+  outro sensor e o loop de controle seguem no ritmo normal, com conjuntos
+  de um sensor só (FramePairer) enquanto o perdido não volta
+"""
+
+import time
+from threading import Thread, Lock, Event
+
+
+class DeviceSlot:
+    """Um sensor gerenciado: papel, serial e o grabber que consome o seu pipeline"""
+
+    def __init__(self, role, serial, grabber, on_started=None):
+        self.role = role  # 'lidar' ou 'camera'
+        self.serial = serial
+        self.grabber = grabber
+        self.on_started = on_started  # Callback(intrínsecos) a cada início do pipeline
+        self.pipeline = None
+        self.connected = False
+        self.disconnects = 0
+        self.reconnects = 0
+        self.attempts = 0  # Tentativas falhas desde a última queda
+        self.down_since = None  # time.perf_counter() da queda
+        self.last_outage = None  # s da última queda até o pipeline voltar
+        self.wake = Event()  # Acorda a espera entre tentativas (serial voltou)
+        self.thread = None
+
+    @property
+    def name(self):
+        return self.grabber.sensor_name
+
+    def status(self):
+        """Estado em uma palavra: 'ok', 'reconectando' ou 'parado'"""
+        if self.connected:
+            return 'ok'
+        return 'reconectando' if self.thread and self.thread.is_alive() else 'parado'
+
+
+class DeviceManager:
+    """Mantém os pipelines dos sensores de pé, religando em segundo plano o que cair"""
+
+    def __init__(self, backend, backoff=0.5, max_backoff=10.0, failures=2):
+        self.backend = backend
+        self.backoff = backoff  # s até a segunda tentativa; dobra a cada falha
+        self.max_backoff = max_backoff
+        self.failures = failures  # Falhas seguidas de wait_for_frames para dar o sensor como perdido
+        self.slots = {}  # papel -> DeviceSlot
+        self.running = False
+        self._lock = Lock()
+
+    def add(self, role, serial, grabber, on_started=None):
+        """Registra um sensor; o pipeline só é iniciado em start()"""
+        slot = DeviceSlot(role, serial, grabber, on_started)
+        grabber.on_error = lambda error: self._grabber_failed(slot, error)
+        self.slots[role] = slot
+        return slot
+
+    def start(self):
+        """Inicia os pipelines (os que falharem continuam tentando em segundo plano)"""
+        self.running = True
+        if not self.backend.watch(self._devices_changed):
+            print("⚠ Sem eventos de conexão USB: quedas detectadas só pelas falhas de captura")
+        for slot in self.slots.values():
+            try:
+                self._connect(slot)
+            except Exception as e:
+                print(f"✗ Erro ao iniciar {slot.name}: {e} (tentando de novo em segundo plano)")
+                with self._lock:
+                    slot.down_since = time.perf_counter()
+                    self._schedule(slot, None)
+        return any(slot.connected for slot in self.slots.values())
+
+    def _connect(self, slot):
+        """Inicia o pipeline do serial e entrega ao grabber; exceção se falhar
+
+        False se o gerenciador parou enquanto o pipeline iniciava.
+        """
+        pipeline, intrinsics = self.backend.start(slot.serial, slot.role)
+        if slot.on_started:
+            slot.on_started(intrinsics)
+        with self._lock:
+            if self.running:
+                slot.pipeline = pipeline
+                slot.connected = True
+                slot.grabber.attach(pipeline)
+                return True
+        pipeline.stop()
+        return False
+
+    def lost(self, slot, reason):
+        """Dá o sensor como perdido: solta o pipeline e agenda a reconexão"""
+        with self._lock:
+            if not self.running or not slot.connected:
+                return  # Já reconectando (ou parando)
+            pipeline, slot.pipeline = slot.pipeline, None
+            slot.connected = False
+            slot.disconnects += 1
+            slot.down_since = time.perf_counter()
+            slot.grabber.detach()
+            self._schedule(slot, pipeline)
+        print(f"\n⚠ Conexão com {slot.name} perdida ({reason}); reconectando em segundo plano")
+
+    def _schedule(self, slot, pipeline):
+        slot.wake.clear()
+        slot.thread = Thread(target=self._reconnect, args=(slot, pipeline),
+                             name=f"reconnect-{slot.role}", daemon=True)
+        slot.thread.start()
+
+    def _reconnect(self, slot, pipeline):
+        if pipeline is not None:
+            try:
+                pipeline.stop()  # Pode demorar com o dispositivo fora: fora das threads de captura
+            except Exception:
+                pass
+        delay = self.backoff
+        while self.running:
+            slot.wake.clear()
+            try:
+                if not self._connect(slot):
+                    return
+            except Exception as e:
+                slot.attempts += 1
+                if slot.attempts == 1:
+                    print(f"✗ {slot.name} ainda indisponível: {e}")
+            else:
+                slot.reconnects += 1
+                slot.last_outage = time.perf_counter() - slot.down_since
+                print(f"✓ Conexão com {slot.name} restabelecida em {slot.last_outage:.1f} s "
+                      f"({slot.attempts} tentativas falhas)")
+                slot.attempts = 0
+                return
+            # Dispositivo de volta (evento) acorda antes e recomeça a espera curta
+            if slot.wake.wait(delay):
+                delay = self.backoff
+            else:
+                delay = min(delay * 2, self.max_backoff)
+
+    def _grabber_failed(self, slot, error):
+        """Chamado pelo FrameGrabber a cada falha de wait_for_frames"""
+        if slot.grabber.failures >= self.failures:
+            self.lost(slot, f"{slot.grabber.failures} falhas seguidas: {error}")
+
+    def _devices_changed(self, added, removed):
+        """Evento do backend (na thread dele): seriais conectados e removidos"""
+        if not self.running:
+            return
+        for slot in self.slots.values():
+            if slot.serial in removed:
+                self.lost(slot, "dispositivo removido")
+            elif slot.serial in added and not slot.connected:
+                slot.wake.set()
+
+    def summary(self):
+        """Resumo em uma linha do estado dos sensores, ou None se nunca caíram"""
+        if all(slot.connected and not slot.disconnects for slot in self.slots.values()):
+            return None
+        now = time.perf_counter()
+        parts = []
+        for slot in self.slots.values():
+            if slot.connected:
+                outage = f", última queda {slot.last_outage:.1f} s" if slot.last_outage is not None else ""
+                parts.append(f"{slot.name} ok ({slot.reconnects} reconexões{outage})")
+            else:
+                parts.append(f"{slot.name} {slot.status()} há {now - slot.down_since:.1f} s "
+                             f"({slot.attempts} tentativas)")
+        return "🔌 Sensores: " + " | ".join(parts)
+
+    def stop(self):
+        """Para as reconexões e os pipelines"""
+        self.running = False
+        for slot in self.slots.values():
+            slot.wake.set()
+        for slot in self.slots.values():
+            if slot.thread:
+                slot.thread.join(timeout=1)
+            with self._lock:
+                pipeline, slot.pipeline = slot.pipeline, None
+                slot.connected = False
+            if pipeline is not None:
+                try:
+                    pipeline.stop()
+                    print(f"✓ {slot.name}: pipeline parado")
+                except Exception as e:
+                    print(f"✗ Erro ao parar {slot.name}: {e}")
@@ -0,0 +1,127 @@
+"""
+Arduino simulado em um pseudo-terminal (pty), para testar sem o robô
+- Cria um par de pty: `port` é o caminho usado no lugar de /dev/ttyUSB0
+  (serial.Serial(port) ou RobotController.connect(port))
+- Decodifica os comandos com o mesmo protocolo do firmware (binário e texto)
+  e guarda cada um com o instante de chegada, para medir a latência
+- Responde frames binários com ACK, aplica o mesmo watchdog do firmware e
+  troca a taxa simulada quando recebe o frame BAUD
+- Simula o tempo de transmissão de cada byte na taxa configurada
+- Só funciona em sistemas POSIX (Linux/macOS)
+"""
+
+import os
+import select
+import time
+import tty
+from threading import Thread, Lock
+
+from serial_protocol import FrameParser, encode_frame, ACK, BAUD_ACK, BAUD_RATES
+
+BANNER = b"Sistema iniciado. Aguardando comandos...\r\n"
+WATCHDOG = 0.5  # segundos, como WATCHDOG_MS no firmware
+
+
+class FakeArduino(Thread):
+    """Lado do Arduino de um pty: recebe e decodifica comandos de motores"""
+
+    def __init__(self, baudrate=9600, banner=True, boot_time=0.5):
+        super().__init__(name="fake-arduino", daemon=True)
+        self.baudrate = baudrate
+        self.byte_time = 10 / baudrate if baudrate else 0.0  # 8N1: 10 bits por byte
+        self.parser = FrameParser()
+        self.commands = []  # (instante de chegada perf_counter, tipo, seq, m1, m2, m3)
+        self.heartbeats = 0
+        self.watchdog_stops = 0
+        self.motors = (0, 0, 0)
+        self.responsive = True  # False simula um Arduino travado (ignora tudo)
+        self.running = True
+        self._lock = Lock()
+        self._outgoing = []  # (instante em que termina de transmitir, bytes)
+        self._tx_free_at = 0.0
+        self._last_frame_at = None  # Watchdog armado quando não é None
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        if banner:
+            # Como depois do reset da placa: a mensagem sai quando o bootloader termina
+            self._outgoing.append((time.perf_counter() + boot_time, BANNER))
+        self.start()
+
+    def run(self):
+        arrival = 0.0  # Fim da transmissão do último byte recebido
+        while self.running:
+            now = time.perf_counter()
+            timeout = 0.05
+            if self._outgoing:
+                timeout = max(0.0, min(timeout, self._outgoing[0][0] - now))
+            ready, _, _ = select.select([self._master], [], [], timeout)
+            self._flush_outgoing()
+            self._check_watchdog()
+            if not ready:
+                continue
+            try:
+                data = os.read(self._master, 1024)
+            except OSError:
+                return
+            if not self.responsive:
+                continue
+            arrival = max(arrival, time.perf_counter())
+            for byte in data:
+                # Cada byte só fica disponível depois de transmitido na taxa da serial
+                arrival += self.byte_time
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                for frame in self.parser.feed(bytes([byte])):
+                    self._handle(*frame)
+
+    def _handle(self, kind, sequence, m1, m2, m3):
+        with self._lock:
+            if kind == 'baud':
+                self._change_baudrate(sequence, m1 * 100)
+                return
+            if kind == 'heartbeat':
+                self.heartbeats += 1
+            elif kind in ('binary', 'ascii'):
+                self.motors = (m1, m2, m3)
+                self.commands.append((time.perf_counter(), kind, sequence, m1, m2, m3))
+            if kind in ('binary', 'heartbeat'):
+                self._last_frame_at = time.perf_counter()
+                self._send(encode_frame(ACK, sequence, *self.motors))
+
+    def _change_baudrate(self, sequence, baudrate):
+        if baudrate in BAUD_RATES:
+            self.baudrate = baudrate
+        # Confirmação sai na taxa antiga; os bytes seguintes, na nova
+        self._send(encode_frame(BAUD_ACK, sequence, self.baudrate // 100))
+        self.byte_time = 10 / self.baudrate
+
+    def _send(self, data):
+        # A resposta sai pela serial na mesma taxa, depois da anterior
+        self._tx_free_at = max(self._tx_free_at, time.perf_counter()) + len(data) * self.byte_time
+        self._outgoing.append((self._tx_free_at, data))
+
+    def _flush_outgoing(self):
+        now = time.perf_counter()
+        while self._outgoing and self._outgoing[0][0] <= now:
+            os.write(self._master, self._outgoing.pop(0)[1])
+
+    def _check_watchdog(self):
+        with self._lock:
+            if self._last_frame_at is not None and time.perf_counter() - self._last_frame_at > WATCHDOG:
+                self._last_frame_at = None
+                self.motors = (0, 0, 0)
+                self.watchdog_stops += 1
+
+    def received(self):
+        """Cópia da lista de comandos recebidos"""
+        with self._lock:
+            return list(self.commands)
+
+    def close(self):
+        self.running = False
+        self.join(timeout=1)
+        os.close(self._master)
+        os.close(self._slave)
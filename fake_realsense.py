@@ -0,0 +1,158 @@
+"""
+Sensores RealSense simulados, para testar a reconexão sem hardware
+- FakeRealSense é um backend do DeviceManager (mesma interface do
+  RealSenseBackend): lista os dispositivos, inicia pipelines por serial e
+  avisa conexões/remoções, numa thread própria como o librealsense
+- unplug()/plug() simulam tirar e recolocar o cabo USB; hang() simula um
+  dispositivo que continua listado mas para de entregar frames (reiniciar o
+  pipeline o destrava)
+- Os pipelines entregam framesets com a interface usada pelo FrameGrabber
+  (get_depth_frame, get_color_frame, número e instante do frame) na taxa
+  configurada; com o dispositivo fora, wait_for_frames esgota o tempo e
+  levanta RuntimeError, como o pyrealsense2
+"""
+
+import time
+from threading import Thread, Lock, Event
+
+import numpy as np
+
+
+class FakeDevice:
+    """Um dispositivo simulado (nome, serial e resolução do stream de profundidade)"""
+
+    def __init__(self, name, serial, product_line, width, height, fps=30, color=False):
+        self.name = name
+        self.serial = serial
+        self.product_line = product_line
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.color = color  # Entrega também frames coloridos (D435)
+        self.connected = True
+        self.hung = False  # Listado, mas sem frames
+        self.depth = np.full((height, width), 2000, dtype=np.uint16)
+        self.image = np.zeros((height, width, 3), dtype=np.uint8) if color else None
+
+    def info(self):
+        return {'name': self.name, 'serial': self.serial, 'firmware': '0.0.0.0',
+                'product_line': self.product_line}
+
+    def intrinsics(self):
+        return {'width': self.width, 'height': self.height, 'fx': 500.0, 'fy': 500.0,
+                'ppx': self.width / 2, 'ppy': self.height / 2, 'depth_scale': 0.001}
+
+
+class FakeFrame:
+    def __init__(self, data):
+        self._data = data
+
+    def get_data(self):
+        return self._data
+
+
+class FakeFrameset:
+    def __init__(self, device, number, capture):
+        self.device = device
+        self.number = number
+        self.capture = capture  # time.perf_counter() da "exposição"
+
+    def get_depth_frame(self):
+        return FakeFrame(self.device.depth)
+
+    def get_color_frame(self):
+        return FakeFrame(self.device.image) if self.device.color else None
+
+    def get_frame_number(self):
+        return self.number
+
+    def get_timestamp(self):
+        return self.capture * 1000
+
+
+class FakePipeline:
+    """Pipeline de um dispositivo simulado, na taxa do dispositivo"""
+
+    def __init__(self, device):
+        self.device = device
+        self.frames = 0
+        self._period = 1.0 / device.fps
+        self._next = time.perf_counter() + self._period
+        self._stopped = Event()
+
+    def wait_for_frames(self, timeout_ms=1000):
+        deadline = time.perf_counter() + timeout_ms / 1000
+        while True:
+            if self._stopped.is_set():
+                raise RuntimeError("wait_for_frames cannot be called before start()")
+            now = time.perf_counter()
+            if self.device.connected and not self.device.hung and now >= self._next:
+                break
+            if now >= deadline:
+                raise RuntimeError(f"Frame didn't arrive within {timeout_ms}")
+            wait = self._next - now if self.device.connected and not self.device.hung else 0.01
+            self._stopped.wait(max(0.0, min(wait, deadline - now)))
+        capture = self._next
+        # Como o sensor: frames perdidos com o consumidor atrasado não se acumulam
+        self._next = max(self._next + self._period, now)
+        self.frames += 1
+        return FakeFrameset(self.device, self.frames, capture)
+
+    def stop(self):
+        self._stopped.set()
+
+
+class FakeRealSense:
+    """Backend simulado: um L515 e um D435 conectados (por padrão)"""
+
+    def __init__(self, devices=None, start_time=0.2, events=True):
+        if devices is None:
+            devices = [FakeDevice('Intel RealSense L515', 'f0000515', 'L500', 1024, 768),
+                       FakeDevice('Intel RealSense D435', '00000435', 'D400', 640, 480, color=True)]
+        self.devices_by_serial = {device.serial: device for device in devices}
+        self.start_time = start_time  # s para iniciar um pipeline (o real leva ~0,3 a 1 s)
+        self.starts = 0  # Pipelines iniciados
+        self.queries = 0  # Enumerações (devices())
+        self.events = events  # False: sem avisos de conexão/remoção (só as falhas de captura)
+        self._callback = None
+        self._lock = Lock()
+
+    def devices(self):
+        self.queries += 1
+        return [device.info() for device in self.devices_by_serial.values() if device.connected]
+
+    def start(self, serial, role):
+        time.sleep(self.start_time)
+        device = self.devices_by_serial.get(serial)
+        if device is None or not device.connected:
+            raise RuntimeError(f"No device connected with serial {serial}")
+        device.hung = False
+        with self._lock:
+            self.starts += 1
+        return FakePipeline(device), device.intrinsics()
+
+    @staticmethod
+    def stamp(frames):
+        return frames.capture, frames.capture, frames.number
+
+    def watch(self, callback):
+        self._callback = callback if self.events else None
+        return self.events
+
+    def _notify(self, added, removed):
+        if self._callback:
+            # O librealsense chama o callback numa thread própria
+            Thread(target=self._callback, args=(added, removed), daemon=True).start()
+
+    def unplug(self, serial):
+        self.devices_by_serial[serial].connected = False
+        self._notify([], [serial])
+
+    def plug(self, serial):
+        device = self.devices_by_serial[serial]
+        device.connected = True
+        device.hung = False
+        self._notify([serial], [])
+
+    def hang(self, serial, hung=True):
+        self.devices_by_serial[serial].hung = hung
@@ -0,0 +1,119 @@
+"""
+Sincronização dos frames do L515 e do D435
+- Cada frame carrega o instante de captura, o instante usado no pareamento
+  e o número do frame no sensor (Frame)
+- Com global_time_enabled, os dois dispositivos carimbam os frames no mesmo
+  relógio (o do host), então instantes de sensores diferentes são comparáveis;
+  sem ele, vale o instante de chegada
+- FramePairer escolhe, entre os últimos frames de cada sensor, o par mais
+  próximo no tempo (FrameBundle), dentro de uma tolerância; fora dela, só o
+  frame mais novo segue (o sensor atrasado fica de fora nesse ciclo)
+- Métricas: diferença entre os frames do par ('pair_skew', ms), frames sem
+  par e frames que nunca entraram em um par
+"""
+
+import time
+from collections import namedtuple
+
+# sequence: contador do FrameGrabber; timestamp: captura (time.perf_counter);
+# sync_time: instante comparável entre os sensores (s); frame_number: do sensor
+Frame = namedtuple('Frame', 'sequence timestamp data sync_time frame_number')
+
+STREAMS = ('lidar', 'camera')
+
+
+class FrameBundle:
+    """Frames do LiDAR e da câmera usados juntos em uma decisão"""
+
+    def __init__(self, lidar=None, camera=None, skew=None):
+        self.lidar = lidar  # Frame ou None
+        self.camera = camera
+        self.skew = skew  # s entre os dois frames (None se só há um)
+
+    @property
+    def paired(self):
+        return self.skew is not None
+
+    @property
+    def captured(self):
+        """Captura do frame mais antigo do conjunto (time.perf_counter)"""
+        return min(frame.timestamp for frame in (self.lidar, self.camera) if frame is not None)
+
+    def age(self, now=None):
+        """Idade (s) do frame mais antigo: quão velha é a decisão tomada com ele"""
+        return (time.perf_counter() if now is None else now) - self.captured
+
+
+class FramePairer:
+    """Pareia os frames dos dois sensores pelo instante mais próximo"""
+
+    def __init__(self, tolerance=0.02, metrics=None):
+        self.tolerance = tolerance  # s: diferença máxima entre os frames de um par
+        self.metrics = metrics  # LatencyMetrics opcional ('pair_skew')
+        self.paired = 0
+        self.unpaired = 0  # Conjuntos com um sensor só (o outro atrasado demais ou parado)
+        self.skipped = {stream: 0 for stream in STREAMS}  # Frames que nunca entraram em um conjunto
+        self._used = {stream: None for stream in STREAMS}  # Sequência do último frame usado
+
+    def pair(self, lidar_frames, camera_frames):
+        """FrameBundle com o par mais recente dentro da tolerância, ou None se não há frame novo
+
+        lidar_frames, camera_frames: últimos frames de cada sensor (do mais
+        antigo ao mais novo).
+        """
+        # Nunca volta para um frame mais antigo que o último usado
+        lidar_frames = self._unused('lidar', lidar_frames)
+        camera_frames = self._unused('camera', camera_frames)
+        if not lidar_frames or not camera_frames:
+            newest = (lidar_frames or camera_frames or [None])[-1]
+            if newest is None:
+                return None
+            bundle = FrameBundle(lidar=newest) if lidar_frames else FrameBundle(camera=newest)
+            return self._accept(bundle, paired=False)
+
+        # O mais novo do sensor atrasado é o instante mais recente em que há
+        # frames dos dois; o parceiro é o frame do outro mais próximo dele
+        lidar, camera = lidar_frames[-1], camera_frames[-1]
+        if lidar.sync_time <= camera.sync_time:
+            camera = min(camera_frames, key=lambda frame: abs(frame.sync_time - lidar.sync_time))
+        else:
+            lidar = min(lidar_frames, key=lambda frame: abs(frame.sync_time - camera.sync_time))
+        skew = abs(lidar.sync_time - camera.sync_time)
+
+        if skew <= self.tolerance:
+            bundle = self._accept(FrameBundle(lidar, camera, skew), paired=True)
+            if bundle is not None:
+                return bundle
+            # O par mais próximo já foi usado (o outro sensor parou ou atrasou):
+            # o frame novo segue sozinho em vez de esperar sair do histórico
+        # Sem par: segue só o sensor com o frame mais novo
+        if lidar_frames[-1].sync_time > camera_frames[-1].sync_time:
+            return self._accept(FrameBundle(lidar=lidar_frames[-1]), paired=False)
+        return self._accept(FrameBundle(camera=camera_frames[-1]), paired=False)
+
+    def _unused(self, stream, frames):
+        used = self._used[stream]
+        return [frame for frame in frames if used is None or frame.sequence >= used]
+
+    def _accept(self, bundle, paired):
+        frames = {'lidar': bundle.lidar, 'camera': bundle.camera}
+        if all(frame is None or frame.sequence == self._used[stream] for stream, frame in frames.items()):
+            return None  # Nada novo desde o último conjunto
+        for stream, frame in frames.items():
+            if frame is None or frame.sequence == self._used[stream]:
+                continue
+            if self._used[stream] is not None and frame.sequence > self._used[stream]:
+                self.skipped[stream] += frame.sequence - self._used[stream] - 1
+            self._used[stream] = frame.sequence
+        if paired:
+            self.paired += 1
+            if self.metrics:
+                self.metrics.record('pair_skew', bundle.skew * 1000)
+        else:
+            self.unpaired += 1
+        return bundle
+
+    def summary(self):
+        """Resumo em uma linha dos contadores de pareamento"""
+        return (f"🔗 Pareamento: {self.paired} pares, {self.unpaired} sem par | frames não usados: "
+                f"LiDAR {self.skipped['lidar']}, câmera {self.skipped['camera']}")
@@ -0,0 +1,158 @@
+"""
+Plano do chão e altura real dos pontos da câmera (D435)
+- Montagem da câmera (altura e inclinação) dá o plano esperado do chão no
+  referencial da câmera (x para a direita, y para baixo, z para frente)
+- O plano é ajustado por RANSAC vetorizado (todas as hipóteses avaliadas de
+  uma vez) sobre uma nuvem esparsa, só com pontos perto do plano atual
+  (paredes e obstáculos não entram no ajuste)
+- O plano fica em cache: a cada frame só se confere se os pontos do chão
+  continuam nele; o ajuste é refeito quando o plano deriva
+- Um ajuste só é aceito perto da montagem (inclinação e altura) e com boa
+  parte dos candidatos no plano: uma caixa grande ou um degrau na frente da
+  câmera não viram o chão
+- Altura acima do chão de cada pixel = z * (normal · raio) + d, com
+  normal · raio pré-calculado por plano: um produto por pixel
+"""
+
+import numpy as np
+
+
+def camera_floor_plane(camera_height, camera_pitch):
+    """Plano do chão (normal para cima, d) no referencial da câmera
+
+    camera_height: metros do chão até a câmera
+    camera_pitch: radianos, positivo com a câmera inclinada para baixo
+    Altura de um ponto p acima do chão = normal · p + d.
+    """
+    normal = np.array((0.0, -np.cos(camera_pitch), -np.sin(camera_pitch)))
+    return normal, float(camera_height)
+
+
+def fit_plane(points, iterations=64, threshold=0.02, rng=None):
+    """RANSAC: plano (normal, d) com mais pontos a menos de `threshold` metros
+
+    Retorna (normal, d, número de inliers), com o plano refinado por mínimos
+    quadrados sobre os inliers e a normal apontando para a câmera (d > 0),
+    ou None se não há pontos suficientes.
+    """
+    if len(points) < 3:
+        return None
+    rng = rng if rng is not None else np.random.default_rng()
+    samples = points[rng.integers(0, len(points), size=(iterations, 3))]
+    normals = np.cross(samples[:, 1] - samples[:, 0], samples[:, 2] - samples[:, 0])
+    norms = np.linalg.norm(normals, axis=1)
+    valid = norms > 1e-9  # Amostras com pontos repetidos ou colineares
+    if not valid.any():
+        return None
+    normals = normals[valid] / norms[valid, None]
+    offsets = -np.einsum('ij,ij->i', normals, samples[valid, 0])
+
+    # Todas as hipóteses de uma vez: (pontos x hipóteses)
+    counts = np.count_nonzero(np.abs(points @ normals.T + offsets) < threshold, axis=0)
+    best = counts.argmax()
+    inliers = points[np.abs(points @ normals[best] + offsets[best]) < threshold]
+
+    centroid = inliers.mean(axis=0)
+    normal = np.linalg.svd(inliers - centroid, full_matrices=False)[2][2]
+    d = -float(normal @ centroid)
+    if d < 0:
+        normal, d = -normal, -d
+    return normal, d, len(inliers)
+
+
+class GroundPlaneEstimator:
+    """Plano do chão em cache, reajustado quando deriva"""
+
+    def __init__(self, camera_height=0.3, camera_pitch=0.0, stride=8, threshold=0.02,
+                 search_band=0.25, max_tilt=15.0, max_height_error=0.1, min_inlier_fraction=0.3,
+                 refit_ratio=0.7, iterations=64, seed=0):
+        self.prior = camera_floor_plane(camera_height, np.radians(camera_pitch))
+        self.stride = stride  # Amostragem da nuvem usada no ajuste
+        self.threshold = threshold  # m, distância máxima de um ponto do chão ao plano
+        self.search_band = search_band  # m, pontos candidatos ao chão em torno do plano atual
+        self.max_tilt = np.radians(max_tilt)  # Desvio máximo da normal em relação à montagem
+        self.max_height_error = max_height_error  # m, desvio máximo da altura em relação à montagem
+        self.min_inlier_fraction = min_inlier_fraction  # Fração mínima dos candidatos no plano ajustado
+        self.refit_ratio = refit_ratio  # Reajusta abaixo desta fração dos inliers do último ajuste
+        self.iterations = iterations
+        self.fits = 0  # Ajustes aceitos
+        self.rejected = 0  # Ajustes descartados (não parecem o chão)
+        self._rng = np.random.default_rng(seed)
+        # (normal, d, inliers do ajuste): trocado de uma vez, então leituras
+        # concorrentes (pool de threads) sempre veem um plano consistente
+        self._plane = (*self.prior, 0)
+        self._tables = {}  # (intrínsecos, stride) -> (intrínsecos, plano, tabelas)
+
+    @property
+    def plane(self):
+        return self._plane[:2]
+
+    @property
+    def camera_height(self):
+        """Altura da câmera estimada pelo plano atual (m)"""
+        return self._plane[1]
+
+    @property
+    def camera_pitch(self):
+        """Inclinação da câmera estimada pelo plano atual (graus, positivo para baixo)"""
+        return float(np.degrees(np.arcsin(np.clip(-self._plane[0][2], -1.0, 1.0))))
+
+    def _sparse_cloud(self, depth_image, intrinsics):
+        x_ray, y_ray = intrinsics.ray_table(self.stride)
+        z = depth_image[::self.stride, ::self.stride] * intrinsics.depth_scale
+        valid = z > 0
+        z = z[valid]
+        return np.column_stack((x_ray[valid] * z, y_ray[valid] * z, z))
+
+    def update(self, depth_image, intrinsics):
+        """Confere o plano em cache com o frame e reajusta se derivou; retorna (normal, d)"""
+        normal, d, fitted = self._plane
+        points = self._sparse_cloud(depth_image, intrinsics)
+        heights = np.abs(points @ normal + d)
+        if fitted and np.count_nonzero(heights < self.threshold) >= self.refit_ratio * fitted:
+            return normal, d
+
+        # Só pontos perto do plano atual: paredes e objetos não viram "chão"
+        candidates = points[heights < self.search_band]
+        result = fit_plane(candidates, self.iterations, self.threshold, self._rng)
+        if result is not None:
+            fitted_normal, fitted_d, inliers = result
+            tilt = np.arccos(np.clip(fitted_normal @ self.prior[0], -1.0, 1.0))
+            # Comparado com a montagem, não com o último ajuste: uma sequência
+            # de ajustes ruins não leva o plano para longe do chão
+            if (tilt <= self.max_tilt and inliers >= 3
+                    and abs(fitted_d - self.prior[1]) <= self.max_height_error
+                    and inliers >= self.min_inlier_fraction * len(candidates)):
+                self._plane = (fitted_normal, fitted_d, inliers)
+                self.fits += 1
+            else:
+                self.rejected += 1
+        return self.plane
+
+    def _plane_tables(self, intrinsics, stride):
+        """(normal · raio, frente · raio, esquerda · raio, d) por pixel, para o plano atual"""
+        plane = self._plane
+        key = (id(intrinsics), stride)
+        cached = self._tables.get(key)
+        if cached is None or cached[0] is not intrinsics or cached[1] is not plane:
+            normal = plane[0]
+            # Frente do robô: eixo óptico projetado no chão
+            forward = np.array((0.0, 0.0, 1.0)) - normal[2] * normal
+            forward /= np.linalg.norm(forward)
+            left = np.cross(normal, forward)
+            x_ray, y_ray = intrinsics.ray_table(stride)
+            tables = (normal[0] * x_ray + normal[1] * y_ray + normal[2],
+                      forward[0] * x_ray + forward[1] * y_ray + forward[2],
+                      left[0] * x_ray + left[1] * y_ray + left[2], plane[1])
+            cached = self._tables[key] = (intrinsics, plane, tables)
+        return cached[2]
+
+    def height_map(self, depth_image, intrinsics, stride=2):
+        """(altura acima do chão, distância à frente, deslocamento à esquerda) em metros
+
+        Na grade amostrada por `stride`. Pixels inválidos (profundidade 0)
+        ficam com altura d e posição 0; filtre-os pela profundidade.
+        """
+        height_rays, forward_rays, left_rays, d = self._plane_tables(intrinsics, stride)
+        z = depth_image[::stride, ::stride] * intrinsics.depth_scale
+        return z * height_rays + d, z * forward_rays, z * left_rays
@@ -0,0 +1,106 @@
+"""
+Métricas de latência do sistema (da captura do frame ao comando do motor)
+- Cada estágio guarda as últimas N amostras (ms) em um buffer circular
+  pré-alocado: registrar é uma atribuição em um array, sem alocar memória
+- Percentis (p50/p95/p99) só são calculados quando pedidos (get_metrics ou
+  a linha de log periódica)
+- Tempos medidos com time.perf_counter(), o mesmo relógio dos timestamps de
+  captura do FrameGrabber
+- Registrado de várias threads (event loop, escritor da serial, rampa de
+  velocidade); um lock protege o dicionário de estágios e cada registro
+"""
+
+import time
+from contextlib import contextmanager
+from threading import Lock
+import numpy as np
+
+# Estágios na ordem do pipeline (usada no log)
+STAGES = (
+    'acquire',             # captura do frame -> leitura pelo sensor_loop
+    'pair_skew',           # diferença entre os frames do LiDAR e da câmera usados juntos
+    'analyze_lidar',
+    'analyze_height',
+    'costmap',             # pontos dos obstáculos -> costmap 2D inflado
+    'decide',              # velocidade do navegador (planejador local ou regras por setor)
+    'capture_to_command',  # captura do frame -> 1º comando do novo alvo de velocidade entregue ao escritor da serial
+    'serial_queue',        # comando entregue -> início da escrita (thread da serial)
+    'serial_write',
+    'serial_rtt',          # comando/heartbeat -> ACK do Arduino (ida e volta)
+    'encode',              # JPEG do vídeo
+    'broadcast',           # serialização e enfileiramento para os clientes
+    'control',             # duração de cada tarefa periódica do sensor_loop
+    'video',
+    'map',
+)
+
+
+class LatencyHistogram:
+    """Buffer circular com as últimas `size` amostras de um estágio (ms)"""
+
+    def __init__(self, size=1024):
+        self._samples = np.zeros(size)
+        self.count = 0  # Total de amostras já registradas
+
+    def record(self, ms):
+        self._samples[self.count % len(self._samples)] = ms
+        self.count += 1
+
+    def summary(self):
+        """Percentis da janela atual, ou None se não há amostras"""
+        window = self._samples[:min(self.count, len(self._samples))]
+        if len(window) == 0:
+            return None
+        p50, p95, p99 = np.percentile(window, (50, 95, 99))
+        return {'count': self.count, 'p50': round(float(p50), 3), 'p95': round(float(p95), 3),
+                'p99': round(float(p99), 3), 'max': round(float(window.max()), 3)}
+
+
+class LatencyMetrics:
+    """Histogramas de latência por estágio"""
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.stages = {}  # estágio -> LatencyHistogram
+        self._lock = Lock()
+
+    def record(self, stage, ms):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram(self.size)
+            histogram.record(ms)
+
+    def record_since(self, stage, start):
+        """Registra o tempo decorrido desde `start` (time.perf_counter())"""
+        self.record(stage, (time.perf_counter() - start) * 1000)
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_since(stage, start)
+
+    async def timed(self, stage, awaitable):
+        """Aguarda `awaitable` registrando quanto tempo levou"""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.record_since(stage, start)
+
+    def summary(self):
+        """{estágio: {count, p50, p95, p99, max}} dos estágios com amostras"""
+        with self._lock:
+            stages = dict(self.stages)
+        ordered = [stage for stage in STAGES if stage in stages]
+        ordered += [stage for stage in stages if stage not in STAGES]
+        return {stage: stages[stage].summary() for stage in ordered}
+
+    def log_line(self):
+        """Resumo em uma linha: p50/p95/p99 (ms) de cada estágio"""
+        parts = [f"{stage} {s['p50']:.1f}/{s['p95']:.1f}/{s['p99']:.1f}"
+                 for stage, s in self.summary().items()]
+        return "⏱ Latência p50/p95/p99 (ms): " + (" | ".join(parts) or "sem amostras")
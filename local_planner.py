@@ -0,0 +1,123 @@
+"""
+Planejador local por janela dinâmica (DWA) sobre o costmap 2D
+- Amostra velocidades (vx, vy, ω) alcançáveis a partir da velocidade atual
+  dentro de `window` segundos (aceleração limitada, como a rampa dos motores)
+- Simula todas as amostras de uma vez (arrays amostras x passos) por
+  `horizon` segundos e consulta a distância ao obstáculo do costmap em cada
+  ponto das trajetórias
+- Trajetórias que encostam em um obstáculo são descartadas; as demais são
+  pontuadas por velocidade à frente, folga, espaço livre na direção em que
+  o robô termina virado e proximidade da velocidade atual (evita oscilar)
+- Girar no lugar nunca colide (base circular): com a frente bloqueada, o
+  robô gira para o lado livre em vez de recuar
+"""
+
+import numpy as np
+
+
+class DynamicWindowPlanner:
+    """Escolhe (vx, vy, ω) avaliando em lote trajetórias de velocidade constante"""
+
+    # Direções (radianos) do espaço livre usado na pontuação: só o campo de
+    # visão dos sensores; fora dele o costmap não tem dados e pareceria livre
+    HEADINGS = np.radians(np.arange(-45, 46, 5))
+
+    def __init__(self, costmap, max_speed=0.3, max_turn=1.2, max_accel=0.6, max_angular_accel=3.0,
+                 samples=(7, 5, 11), window=0.5, horizon=1.5, dt=0.1,
+                 weights=None):
+        self.costmap = costmap
+        self.max_speed = max_speed  # m/s, à frente (não anda de ré: não há sensor atrás)
+        self.max_turn = max_turn  # rad/s
+        self.max_accel = max_accel  # m/s²
+        self.max_angular_accel = max_angular_accel  # rad/s²
+        self.samples = samples  # Amostras de (vx, vy, ω)
+        self.window = window  # s: velocidades alcançáveis a partir da atual
+        self.horizon = horizon  # s simulados por trajetória
+        self.dt = dt
+        self.weights = {'speed': 1.0, 'heading': 1.0, 'clearance': 0.6, 'smooth': 0.3, 'lateral': 0.2}
+        self.weights.update(weights or {})
+        self.best_score = None  # Pontuação da última escolha (None = nenhuma trajetória livre)
+        self._steps = np.arange(1, int(round(horizon / dt)) + 1) * dt
+
+    @property
+    def n_samples(self):
+        return int(np.prod(self.samples))
+
+    def window_samples(self, velocity):
+        """Amostras (N x 3) de velocidade alcançáveis a partir de `velocity`"""
+        vx, vy, omega = velocity
+        linear = self.max_accel * self.window
+        angular = self.max_angular_accel * self.window
+        axes = (np.linspace(max(vx - linear, 0.0), min(vx + linear, self.max_speed), self.samples[0]),
+                np.linspace(max(vy - linear, -0.5 * self.max_speed), min(vy + linear, 0.5 * self.max_speed),
+                            self.samples[1]),
+                np.linspace(max(omega - angular, -self.max_turn), min(omega + angular, self.max_turn),
+                            self.samples[2]))
+        grid = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+        # Parar é sempre uma opção
+        return np.vstack((grid, np.zeros((1, 3))))
+
+    def rollout(self, samples):
+        """Posições (x, y) e orientação de cada amostra em cada passo: arrays N x passos"""
+        vx, vy, omega = (samples[:, i, None] for i in range(3))
+        heading = omega * self._steps  # Orientação ao fim de cada passo
+        previous = heading - omega * self.dt  # ... e no começo (velocidade no referencial do robô)
+        cos, sin = np.cos(previous), np.sin(previous)
+        x = np.cumsum((vx * cos - vy * sin) * self.dt, axis=1)
+        y = np.cumsum((vx * sin + vy * cos) * self.dt, axis=1)
+        return x, y, heading
+
+    def clearance(self, x, y):
+        """Distância ao obstáculo (costmap) em cada ponto; fora da grade conta como livre"""
+        costmap = self.costmap
+        i = np.floor(x / costmap.resolution + 0.5).astype(np.int64) + costmap.center
+        j = np.floor(y / costmap.resolution + 0.5).astype(np.int64) + costmap.center
+        inside = (i >= 0) & (i < costmap.cells) & (j >= 0) & (j < costmap.cells)
+        distance = costmap.distance[np.clip(i, 0, costmap.cells - 1), np.clip(j, 0, costmap.cells - 1)]
+        return np.where(inside, distance, costmap.inflation_radius)
+
+    def score(self, samples, velocity):
+        """Pontuação de cada amostra (-inf se colide)"""
+        costmap = self.costmap
+        x, y, heading = self.rollout(samples)
+        distance = self.clearance(x, y)
+        start = costmap.distance[costmap.center, costmap.center]
+        if start > costmap.robot_radius:
+            free = distance.min(axis=1) > costmap.robot_radius
+        else:
+            # Já encostado: vale qualquer trajetória que se afaste do obstáculo
+            free = distance[:, -1] > start
+
+        open_space = costmap.free_space(self.HEADINGS)
+        step = self.HEADINGS[1] - self.HEADINGS[0]
+        index = np.rint((heading[:, -1] - self.HEADINGS[0]) / step).astype(np.int64)
+        ahead = open_space[np.clip(index, 0, len(self.HEADINGS) - 1)] / costmap.extent
+
+        w = self.weights
+        change = np.abs(samples - np.asarray(velocity, dtype=np.float64))
+        scores = (w['speed'] * samples[:, 0] / self.max_speed
+                  + w['heading'] * ahead
+                  + w['clearance'] * distance.min(axis=1) / costmap.inflation_radius
+                  - w['smooth'] * (change[:, 0] + change[:, 1]) / self.max_speed
+                  - w['smooth'] * change[:, 2] / self.max_turn
+                  - w['lateral'] * np.abs(samples[:, 1]) / self.max_speed)
+        return np.where(free, scores, -np.inf)
+
+    def plan(self, velocity=(0.0, 0.0, 0.0)):
+        """Melhor velocidade (vx, vy, ω) a partir da velocidade atual"""
+        samples = self.window_samples(velocity)
+        scores = self.score(samples, velocity)
+        best = int(scores.argmax())
+        if not np.isfinite(scores[best]):
+            self.best_score = None
+            return 0.0, 0.0, 0.0
+        if not samples[best].any():
+            # Parado não sai do lugar: sem trajetória que avance, gira no lugar
+            # para o lado com mais espaço livre (empate: direita)
+            open_space = self.costmap.free_space(self.HEADINGS)
+            side = 1.0 if open_space[self.HEADINGS > 0].sum() > open_space[self.HEADINGS < 0].sum() else -1.0
+            turning = np.isfinite(scores) & ~samples[:, :2].any(axis=1) & (samples[:, 2] * side > 0)
+            if turning.any():
+                best = int(np.where(turning, scores, -np.inf).argmax())
+        self.best_score = float(scores[best])
+        return tuple(float(v) for v in samples[best])
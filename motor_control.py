@@ -0,0 +1,217 @@
+"""
+Núcleo de controle dos motores, comum às três interfaces (robot_control.py,
+robot_control_web.py e o servidor WebSocket de robot_autonomous_control.py)
+- Cinemática da base omni de 3 rodas: uma direção (ou velocidade vx, vy, ω)
+  vira a velocidade de cada roda, igual em todas as interfaces
+- Velocidades sempre na escala do firmware (PWM, 0 a 255); cada interface
+  converte a própria escala (ex.: 0-100% na web) antes de chamar
+- Comando contínuo de velocidade (set_velocity): uma thread envia, em taxa
+  fixa, velocidades intermediárias com aceleração limitada até o alvo
+- Uma única fila de comandos por conexão (SerialCommandWriter): comandos
+  repetidos não são reenviados, rajadas são reduzidas ao mais recente e a
+  escrita é limitada a `max_rate` comandos por segundo
+"""
+
+import time
+from threading import Thread, Lock, current_thread
+import numpy as np
+
+import arduino_connection
+from arduino_connection import DEFAULT_BAUDRATE
+
+# Direção em que cada roda empurra a base (graus; x para frente, y para a
+# esquerda), na ordem m1, m2, m3: m1 na frente, transversal; m2 e m3 atrás
+WHEEL_ANGLES = np.radians((90.0, -30.0, 210.0))
+WHEEL_DIRECTIONS = np.column_stack((np.cos(WHEEL_ANGLES), np.sin(WHEEL_ANGLES)))
+BASE_RADIUS = 0.15  # m, do centro da base até cada roda
+WHEEL_MAX_SPEED = 0.5  # m/s da roda com PWM 255 (calibrar no robô)
+
+# Direções dos botões/teclas e da navegação autônoma: (vx, vy, ω) unitários
+DIRECTIONS = {
+    'forward': (1.0, 0.0, 0.0),
+    'backward': (-1.0, 0.0, 0.0),
+    'left': (0.0, 1.0, 0.0),
+    'right': (0.0, -1.0, 0.0),
+    'rotate_left': (0.0, 0.0, 1.0),
+    'rotate_right': (0.0, 0.0, -1.0),
+    'stop': (0.0, 0.0, 0.0),
+}
+
+
+def wheel_speeds(vx, vy, omega):
+    """Cinemática inversa: velocidade de cada roda (m/s) para vx, vy (m/s) e ω (rad/s)"""
+    return WHEEL_DIRECTIONS @ np.array((vx, vy)) + BASE_RADIUS * omega
+
+
+def motion_command(vx, vy, omega, speed):
+    """Velocidades (m1, m2, m3) para o movimento (vx, vy, ω), com a roda mais rápida em `speed`"""
+    wheels = wheel_speeds(vx, vy, omega)
+    peak = np.abs(wheels).max()
+    if peak < 1e-9:
+        return 0, 0, 0
+    return tuple(int(round(w)) for w in wheels * (speed / peak))
+
+
+def direction_command(direction, speed):
+    """Velocidades (m1, m2, m3) para mover na direção, com a roda mais rápida em `speed`"""
+    return motion_command(*DIRECTIONS[direction], speed)
+
+
+def velocity_command(vx, vy, omega):
+    """Velocidades (m1, m2, m3) em PWM para a velocidade da base
+    
+    Se alguma roda passaria do máximo, todas são reduzidas na mesma proporção
+    (mantém a direção do movimento).
+    """
+    wheels = wheel_speeds(vx, vy, omega) / WHEEL_MAX_SPEED
+    peak = np.abs(wheels).max()
+    if peak > 1:
+        wheels /= peak
+    return tuple(int(round(w * 255)) for w in wheels)
+
+
+class VelocityRamp:
+    """Aproxima a velocidade da base (vx, vy, ω) do alvo com aceleração limitada"""
+
+    def __init__(self, max_accel=0.6, max_decel=1.5, max_angular_accel=3.0):
+        self.max_accel = max_accel  # m/s²
+        self.max_decel = max_decel  # m/s², ao reduzir a velocidade (frear mais rápido)
+        self.max_angular_accel = max_angular_accel  # rad/s²
+        self.velocity = np.zeros(3)
+        self.target = np.zeros(3)
+
+    @property
+    def settled(self):
+        return np.array_equal(self.velocity, self.target)
+
+    def set_target(self, vx, vy, omega):
+        self.target = np.array((vx, vy, omega), dtype=float)
+
+    def reset(self):
+        self.velocity = np.zeros(3)
+        self.target = np.zeros(3)
+
+    def step(self, dt):
+        """Avança `dt` segundos e retorna a nova velocidade (vx, vy, ω)"""
+        delta = self.target - self.velocity
+        braking = np.hypot(*self.target[:2]) < np.hypot(*self.velocity[:2])
+        linear_limit = (self.max_decel if braking else self.max_accel) * dt
+        linear = np.hypot(*delta[:2])
+        if linear > linear_limit:
+            delta[:2] *= linear_limit / linear
+        angular_limit = self.max_angular_accel * dt
+        delta[2] = np.clip(delta[2], -angular_limit, angular_limit)
+        self.velocity = self.velocity + delta
+        if linear <= linear_limit and abs(self.target[2] - self.velocity[2]) < 1e-12:
+            self.velocity = self.target.copy()  # Chegou: sem resíduo de ponto flutuante
+        return tuple(self.velocity.tolist())
+
+
+class MotorControl:
+    """Conexão com o Arduino e fila única de comandos dos motores"""
+
+    def __init__(self, protocol='binary', baudrate=DEFAULT_BAUDRATE, max_rate=50.0, metrics=None,
+                 ramp_rate=50.0, ramp=None):
+        self.protocol = protocol  # 'binary' ou 'ascii' (firmware antigo)
+        self.baudrate = baudrate
+        self.max_rate = max_rate
+        self.metrics = metrics  # LatencyMetrics opcional
+        self.connection = None  # ArduinoConnection (persistente, por porta)
+        self.writer = None  # SerialCommandWriter
+        self.ramp = ramp or VelocityRamp()
+        self.ramp_rate = ramp_rate  # Velocidades intermediárias por segundo
+        self._ramp_thread = None  # Ativa enquanto a velocidade não chegou ao alvo
+        self._captured = None  # Captura do frame que decidiu o alvo, até o primeiro passo ir à serial
+        self._lock = Lock()
+
+    @property
+    def is_connected(self):
+        return self.writer is not None and not self.writer.failed and self.connection.is_open
+
+    @property
+    def port(self):
+        return self.connection.port if self.connection else None
+
+    def connect(self, port):
+        """Conecta ao Arduino (nada a fazer se já conectado nessa porta); exceção se falhar"""
+        if self.is_connected and self.connection.port == port:
+            return
+        self.close()
+        connection = arduino_connection.connect(port, self.baudrate)
+        try:
+            # Uma fila de comandos por porta, compartilhada com os outros usuários dela
+            self.writer = connection.command_writer(self.protocol, max_rate=self.max_rate, metrics=self.metrics)
+        except Exception:
+            arduino_connection.release(connection)
+            raise
+        self.connection = connection
+
+    def drive(self, m1, m2, m3):
+        """Velocidade de cada roda (-255 a 255), sem bloquear; cancela a rampa"""
+        if not self.writer:
+            return False
+        with self._lock:
+            self._ramp_thread = None
+            self._captured = None
+            self.ramp.reset()
+            return self.writer.submit(m1, m2, m3)
+
+    def set_velocity(self, vx, vy, omega, captured=None):
+        """Velocidade alvo da base (m/s, m/s, rad/s), alcançada com aceleração limitada
+
+        captured: captura (time.perf_counter) do frame que levou a este alvo;
+        com métricas, 'capture_to_command' é medido quando o primeiro passo da
+        rampa para um alvo novo é entregue ao escritor da serial.
+        """
+        if not self.writer or self.writer.failed:
+            return False
+        with self._lock:
+            if captured is not None and not np.array_equal(self.ramp.target, (vx, vy, omega)):
+                self._captured = captured
+            self.ramp.set_target(vx, vy, omega)
+            if self._ramp_thread is None and not self.ramp.settled:
+                self._ramp_thread = Thread(target=self._stream_setpoints, name="velocity-ramp", daemon=True)
+                self._ramp_thread.start()
+        return True
+
+    def _stream_setpoints(self):
+        period = 1.0 / self.ramp_rate
+        next_at = time.monotonic()
+        while True:
+            # Sob o lock: um drive() (ex.: parar) nunca é sobrescrito por uma velocidade antiga
+            with self._lock:
+                if self._ramp_thread is not current_thread():
+                    return  # Cancelada por drive(), stop() ou close()
+                self.writer.submit(*velocity_command(*self.ramp.step(period)))
+                if self._captured is not None:
+                    if self.metrics:
+                        self.metrics.record_since('capture_to_command', self._captured)
+                    self._captured = None
+                if self.ramp.settled:
+                    self._ramp_thread = None
+                    return
+            next_at += period
+            time.sleep(max(0.0, next_at - time.monotonic()))
+
+    def move(self, direction, speed):
+        """Move na direção (ver DIRECTIONS) com a roda mais rápida em `speed`"""
+        if direction not in DIRECTIONS:
+            return False
+        return self.drive(*direction_command(direction, speed))
+
+    def stop(self):
+        return self.drive(0, 0, 0)
+
+    def status(self):
+        return self.writer.status() if self.writer else None
+
+    def close(self):
+        """Devolve a conexão (o último usuário da porta escreve o comando pendente e a fecha)"""
+        with self._lock:
+            self._ramp_thread = None
+            self._captured = None
+            self.ramp.reset()
+        self.writer = None
+        if self.connection:
+            arduino_connection.release(self.connection)
+            self.connection = None
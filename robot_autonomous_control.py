@@ -12,55 +12,376 @@ import serial.tools.list_ports
 import asyncio
 import websockets
 import json
+import argparse
 import cv2
-import base64
+import time
 import open3d as o3d
-from threading import Thread
-from queue import Queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from threading import Thread, Lock, Condition, Event, local
+from queue import Queue, Empty, Full
 from collections import deque
+import stream_protocol
+import sensor_bag
+from depth_filters import DepthPreprocessor
+from ground_plane import GroundPlaneEstimator
+from costmap import Costmap
+from local_planner import DynamicWindowPlanner
+from voxel_map import VoxelMap
+from frame_sync import Frame, FramePairer
+from device_manager import DeviceManager
+from latency_metrics import LatencyMetrics
+from serial_protocol import SerialCommandWriter
+from arduino_connection import DEFAULT_BAUDRATE
+from motor_control import MotorControl
+
+
+class CameraIntrinsics:
+    """Intrínsecos e escala de profundidade de um stream de profundidade"""
+    
+    def __init__(self, width, height, fx, fy, ppx, ppy, depth_scale=0.001):
+        self.width = int(width)
+        self.height = int(height)
+        self.fx = float(fx)
+        self.fy = float(fy)
+        self.ppx = float(ppx)
+        self.ppy = float(ppy)
+        self.depth_scale = float(depth_scale)  # metros por unidade do z16
+        self._ray_tables = {}  # Raios pré-calculados por stride
+    
+    @classmethod
+    def from_profile(cls, pipeline_profile):
+        """Lê os intrínsecos do stream de profundidade de um pipeline iniciado"""
+        depth_profile = pipeline_profile.get_stream(rs.stream.depth).as_video_stream_profile()
+        intr = depth_profile.get_intrinsics()
+        depth_scale = pipeline_profile.get_device().first_depth_sensor().get_depth_scale()
+        return cls(intr.width, intr.height, intr.fx, intr.fy, intr.ppx, intr.ppy, depth_scale)
+    
+    @classmethod
+    def approximate(cls, width, height):
+        """Intrínsecos aproximados (fx=fy=500, centro da imagem) quando não há calibração"""
+        return cls(width, height, 500, 500, width / 2, height / 2, 0.001)
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['width'], data['height'], data['fx'], data['fy'],
+                   data['ppx'], data['ppy'], data.get('depth_scale', 0.001))
+    
+    def to_dict(self):
+        return {
+            'width': self.width,
+            'height': self.height,
+            'fx': self.fx,
+            'fy': self.fy,
+            'ppx': self.ppx,
+            'ppy': self.ppy,
+            'depth_scale': self.depth_scale
+        }
+    
+    def decimated(self, factor):
+        """Intrínsecos da imagem reduzida por `factor` (blocos factor x factor)"""
+        return CameraIntrinsics(self.width // factor, self.height // factor,
+                                self.fx / factor, self.fy / factor,
+                                (self.ppx + 0.5) / factor - 0.5, (self.ppy + 0.5) / factor - 0.5,
+                                self.depth_scale)
+    
+    def matches(self, depth_image):
+        """Verifica se os intrínsecos correspondem à resolução da imagem"""
+        return depth_image.shape[:2] == (self.height, self.width)
+    
+    def to_raw(self, meters):
+        """Converte uma distância em metros para unidades brutas (arredonda para cima)
+        
+        Para valores brutos inteiros, raw * depth_scale < meters equivale a
+        raw < to_raw(meters).
+        """
+        return int(np.ceil(round(meters / self.depth_scale, 6)))
+    
+    def ray_table(self, stride=4):
+        """Retorna os raios (x/z, y/z) da grade amostrada, cacheados por stride"""
+        table = self._ray_tables.get(stride)
+        if table is None:
+            u = np.arange(0, self.width, stride, dtype=np.float64)
+            v = np.arange(0, self.height, stride, dtype=np.float64)
+            shape = (len(v), len(u))
+            x_ray = np.ascontiguousarray(np.broadcast_to((u - self.ppx) / self.fx, shape))
+            y_ray = np.ascontiguousarray(np.broadcast_to(((v - self.ppy) / self.fy)[:, None], shape))
+            table = (x_ray, y_ray)
+            self._ray_tables[stride] = table
+        return table
+
+
+class FrameGrabber(Thread):
+    """Captura frames de um pipeline em uma thread dedicada
+    
+    Mantém apenas os últimos `history` frames (descarta os antigos, nunca
+    enfileira), de modo que quem lê nunca bloqueia esperando o sensor.
+    Sem pipeline (sensor desconectado), espera até attach() entregar um.
+    """
+    
+    def __init__(self, name, pipeline, extract, timeout_ms=1000, stamp=None, history=8):
+        super().__init__(name=f"grabber-{name}", daemon=True)
+        self.sensor_name = name
+        self.pipeline = pipeline
+        self._online = Event()
+        if pipeline is not None:
+            self._online.set()
+        self.extract = extract  # frameset -> dados (numpy) ou None
+        # frameset -> (captura em time.perf_counter ou None, instante para
+        # pareamento em s ou None, número do frame ou None); None = chegada
+        self.stamp = stamp
+        self.timeout_ms = timeout_ms
+        self.running = False
+        self.recorder = None  # Callback (timestamp, dados) para gravação, opcional
+        self.process = None  # Callback dados brutos -> dados entregues (pré-processamento), opcional
+        self.dropped = 0  # Frames sobrescritos antes de serem lidos
+        self.sensor_dropped = 0  # Frames perdidos antes de chegar (saltos no número do frame)
+        self.failures = 0  # Falhas seguidas de wait_for_frames
+        self.on_error = None  # Callback(exceção) a cada falha de wait_for_frames (DeviceManager)
+        self._lock = Lock()
+        self._read = Condition(self._lock)
+        self._history = deque(maxlen=history)  # Frame, do mais antigo ao mais novo
+        self._sequence = 0
+        self._consumed = 0
+        self._frame_number = None
+    
+    def start(self):
+        self.running = True
+        super().start()
+    
+    def attach(self, pipeline):
+        """Passa a ler de um novo pipeline (sensor reconectado)"""
+        self._frame_number = None  # A numeração recomeça no sensor
+        self.failures = 0
+        self.pipeline = pipeline
+        self._online.set()
+    
+    def detach(self):
+        """Para de ler do pipeline atual (sensor perdido) até o próximo attach()"""
+        self._online.clear()
+        self.pipeline = None
+    
+    def run(self):
+        while self.running:
+            pipeline = self.pipeline
+            if pipeline is None:
+                self._online.wait(0.1)
+                continue
+            try:
+                frames = pipeline.wait_for_frames(timeout_ms=self.timeout_ms)
+            except Exception as e:
+                # Falhas de um pipeline já trocado ou parado não contam
+                if self.running and pipeline is self.pipeline:
+                    self.failures += 1
+                    print(f"Erro ao obter dados do {self.sensor_name}: {e}")
+                    if self.on_error:
+                        self.on_error(e)
+                continue
+            self.failures = 0
+            try:
+                data = self.extract(frames)
+            except Exception as e:
+                print(f"Erro ao obter dados do {self.sensor_name}: {e}")
+                continue
+            
+            if data is None:
+                continue
+            
+            timestamp = time.perf_counter()
+            capture, sync_time, frame_number = self.stamp(frames) if self.stamp else (None, None, None)
+            if capture is not None:
+                timestamp = min(timestamp, capture)
+            if frame_number is not None:
+                if self._frame_number is not None and frame_number > self._frame_number + 1:
+                    self.sensor_dropped += frame_number - self._frame_number - 1
+                self._frame_number = frame_number
+            if self.recorder:
+                self.recorder(timestamp, data)  # Grava o frame bruto
+            if self.process:
+                try:
+                    data = self.process(data)
+                except Exception as e:
+                    print(f"Erro ao pré-processar {self.sensor_name}: {e}")
+                    continue
+            
+            with self._lock:
+                if self._sequence > self._consumed:
+                    self.dropped += 1
+                self._sequence += 1
+                self._history.append(Frame(self._sequence, timestamp, data,
+                                           timestamp if sync_time is None else sync_time, frame_number))
+    
+    def latest(self):
+        """Retorna o Frame mais recente (sequence, timestamp, data, ...), ou None
+        
+        timestamp: time.perf_counter() no momento da captura.
+        """
+        with self._lock:
+            if not self._history:
+                return None
+            self._consumed = self._history[-1].sequence
+            self._read.notify_all()
+            return self._history[-1]
+    
+    def recent(self):
+        """Últimos frames (do mais antigo ao mais novo); o mais novo conta como lido"""
+        with self._lock:
+            if self._history:
+                self._consumed = self._history[-1].sequence
+                self._read.notify_all()
+            return list(self._history)
+    
+    def wait_consumed(self, sequence, timeout=None):
+        """Espera o frame `sequence` (ou um posterior) ser lido; False se esgotar o tempo"""
+        with self._lock:
+            return self._read.wait_for(lambda: self._consumed >= sequence, timeout)
+    
+    @property
+    def sequence(self):
+        return self._sequence
+    
+    def stop(self):
+        self.running = False
+        if self.is_alive():
+            self.join(timeout=self.timeout_ms / 1000 + 1)
+
+
+class RealSenseBackend:
+    """Dispositivos RealSense pelo pyrealsense2 (backend do DeviceManager)
+    
+    Mesma interface do FakeRealSense (fake_realsense.py): devices(),
+    start(serial, papel) -> (pipeline, intrínsecos em dict), stamp(frames)
+    e watch(callback) para os avisos de conexão/remoção do librealsense.
+    """
+    
+    STREAMS = {
+        'lidar': ((rs.stream.depth, 1024, 768, rs.format.z16, 30),),
+        'camera': ((rs.stream.color, 640, 480, rs.format.bgr8, 30),
+                   (rs.stream.depth, 640, 480, rs.format.z16, 30))
+    }
+    
+    def __init__(self):
+        self._context = None
+        self._devices = {}  # serial -> rs.device, para reconhecer as remoções
+    
+    @property
+    def context(self):
+        if self._context is None:
+            self._context = rs.context()
+        return self._context
+    
+    def devices(self):
+        """Dispositivos conectados (nome, serial, firmware, linha de produto)"""
+        device_list = []
+        for dev in self.context.query_devices():
+            serial = dev.get_info(rs.camera_info.serial_number)
+            self._devices[serial] = dev
+            device_list.append({
+                'name': dev.get_info(rs.camera_info.name),
+                'serial': serial,
+                'firmware': dev.get_info(rs.camera_info.firmware_version),
+                'product_line': dev.get_info(rs.camera_info.product_line)
+            })
+        return device_list
+    
+    def start(self, serial, role):
+        """Inicia os streams do papel no dispositivo `serial`"""
+        pipeline = rs.pipeline(self.context)
+        config = rs.config()
+        config.enable_device(serial)
+        for stream in self.STREAMS[role]:
+            config.enable_stream(*stream)
+        profile = pipeline.start(config)
+        self._enable_global_time(profile)
+        return pipeline, CameraIntrinsics.from_profile(profile).to_dict()
+    
+    def watch(self, callback):
+        """Chama callback(seriais conectados, seriais removidos) a cada mudança no USB"""
+        def changed(info):
+            removed = [serial for serial, dev in list(self._devices.items()) if info.was_removed(dev)]
+            for serial in removed:
+                del self._devices[serial]
+            added = []
+            for dev in info.get_new_devices():
+                serial = dev.get_info(rs.camera_info.serial_number)
+                self._devices[serial] = dev
+                added.append(serial)
+            callback(added, removed)
+        self.context.set_devices_changed_callback(changed)
+        return True
+    
+    @staticmethod
+    def _enable_global_time(profile):
+        """Carimba os frames no relógio do host: instantes do L515 e do D435 comparáveis"""
+        for sensor in profile.get_device().query_sensors():
+            if sensor.supports(rs.option.global_time_enabled):
+                sensor.set_option(rs.option.global_time_enabled, 1)
+    
+    @staticmethod
+    def stamp(frames):
+        """(captura em time.perf_counter, mesmo instante para pareamento, número do frame)
+        
+        Só instantes no relógio do host (global/sistema) são convertidos; o
+        relógio interno de cada dispositivo não é comparável entre sensores.
+        """
+        frame_number = frames.get_frame_number()
+        if frames.get_frame_timestamp_domain() not in (rs.timestamp_domain.global_time,
+                                                       rs.timestamp_domain.system_time):
+            return None, None, frame_number
+        capture = frames.get_timestamp() / 1000 - time.time() + time.perf_counter()
+        return capture, capture, frame_number
+
 
 class RealSenseController:
     """Gerencia os sensores Intel RealSense"""
     
-    def __init__(self):
-        self.pipeline_lidar = None
-        self.pipeline_camera = None
+    def __init__(self, calibration_file=None, depth_filter=None, sync_tolerance=0.02, metrics=None,
+                 backend=None):
+        # Acesso aos dispositivos (RealSenseBackend, ou FakeRealSense para testes)
+        # e reconexão em segundo plano de quem cair (DeviceManager, em start())
+        self.backend = backend if backend is not None else RealSenseBackend()
+        self.devices = None
         self.lidar_started = False
         self.camera_started = False
         self.lidar_serial = None
         self.camera_serial = None
         
-        # Para reconstrução 3D
-        self.point_cloud = o3d.geometry.PointCloud()
-        self.mesh = None
+        # Threads de aquisição (uma por pipeline)
+        self.lidar_grabber = None
+        self.camera_grabber = None
+        self.recorder = None  # Gravação em bag (start_recording)
+        
+        # Intrínsecos dos streams de profundidade (capturados em start())
+        self.lidar_intrinsics = None
+        self.camera_intrinsics = None
+        self._fallback_intrinsics = {}
+        if calibration_file:
+            self.load_calibration(calibration_file)
+        
+        # Pré-processamento da profundidade (opções de DepthPreprocessor; None desativa),
+        # aplicado na thread de aquisição depois da gravação do frame bruto
+        self.lidar_filter = DepthPreprocessor(**depth_filter) if depth_filter is not None else None
+        self.camera_filter = DepthPreprocessor(**depth_filter) if depth_filter is not None else None
+        
+        # Pareamento dos frames dos dois sensores pelo instante de captura (get_frames)
+        self.pairer = FramePairer(sync_tolerance, metrics)
         
     def list_devices(self):
         """Lista todos os dispositivos RealSense conectados"""
-        ctx = rs.context()
-        devices = ctx.query_devices()
+        device_list = self.backend.devices()
         print("\n=== Dispositivos RealSense Detectados ===")
         
-        if len(devices) == 0:
+        if len(device_list) == 0:
             print("✗ Nenhum dispositivo RealSense encontrado!")
             print("  Verifique se os sensores estão conectados via USB")
             print("  Execute: lsusb | grep Intel")
             return []
         
-        device_list = []
-        for i, dev in enumerate(devices):
-            name = dev.get_info(rs.camera_info.name)
-            serial = dev.get_info(rs.camera_info.serial_number)
-            firmware = dev.get_info(rs.camera_info.firmware_version)
-            product_line = dev.get_info(rs.camera_info.product_line)
-            print(f"{i+1}. {name}")
-            print(f"   Serial: {serial}")
-            print(f"   Firmware: {firmware}")
-            print(f"   Linha de Produto: {product_line}")
-            device_list.append({
-                'name': name, 
-                'serial': serial, 
-                'product_line': product_line
-            })
+        for i, dev in enumerate(device_list):
+            print(f"{i+1}. {dev['name']}")
+            print(f"   Serial: {dev['serial']}")
+            print(f"   Firmware: {dev['firmware']}")
+            print(f"   Linha de Produto: {dev['product_line']}")
         
         return device_list
     
@@ -106,161 +427,459 @@ class RealSenseController:
         return self.lidar_serial is not None or self.camera_serial is not None
     
     def start(self):
-        """Inicia os sensores"""
+        """Inicia os sensores
+        
+        Os dispositivos são enumerados só aqui; depois, um sensor que cair é
+        religado em segundo plano pelo seu serial (DeviceManager), sem parar
+        o outro nem o loop de controle.
+        """
         if not self.identify_devices():
             print("✗ Nenhum dispositivo RealSense disponível!")
             return False
         
-        # Inicia LiDAR (embaixo do robô)
+        # Aquisição em threads dedicadas: um sensor lento não trava o outro
+        self.devices = DeviceManager(self.backend)
         if self.lidar_serial:
-            try:
-                self.pipeline_lidar = rs.pipeline()
-                config_lidar = rs.config()
-                config_lidar.enable_device(self.lidar_serial)
-                config_lidar.enable_stream(rs.stream.depth, 1024, 768, rs.format.z16, 30)
-                self.pipeline_lidar.start(config_lidar)
+            self.lidar_grabber = FrameGrabber('LiDAR', None, self._extract_lidar, stamp=self.backend.stamp)
+            self.devices.add('lidar', self.lidar_serial, self.lidar_grabber,
+                             on_started=lambda intrinsics: self._sensor_started('lidar', intrinsics))
+        if self.camera_serial:
+            self.camera_grabber = FrameGrabber('câmera', None, self._extract_camera, stamp=self.backend.stamp)
+            self.devices.add('camera', self.camera_serial, self.camera_grabber,
+                             on_started=lambda intrinsics: self._sensor_started('camera', intrinsics))
+        self._attach_filters()
+        for grabber in (self.lidar_grabber, self.camera_grabber):
+            if grabber:
+                grabber.start()
+        self.devices.start()
+        
+        return self.lidar_started or self.camera_started
+    
+    def _sensor_started(self, role, intrinsics):
+        """Pipeline (re)iniciado: intrínsecos do perfil e filtro temporal zerado"""
+        intrinsics = CameraIntrinsics.from_dict(intrinsics)
+        if role == 'lidar':
+            self.lidar_intrinsics = intrinsics
+            if self.lidar_filter:
+                self.lidar_filter.reset()
+            if not self.lidar_started:
                 self.lidar_started = True
                 print("✓ LiDAR iniciado (posição: embaixo do robô)")
-            except Exception as e:
-                print(f"✗ Erro ao iniciar LiDAR: {e}")
-                self.pipeline_lidar = None
-        
-        # Inicia Câmera (em cima do robô)
-        if self.camera_serial:
-            try:
-                self.pipeline_camera = rs.pipeline()
-                config_camera = rs.config()
-                config_camera.enable_device(self.camera_serial)
-                config_camera.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
-                config_camera.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-                self.pipeline_camera.start(config_camera)
+        else:
+            self.camera_intrinsics = intrinsics
+            if self.camera_filter:
+                self.camera_filter.reset()
+            if not self.camera_started:
                 self.camera_started = True
                 print("✓ Câmera iniciada (posição: em cima do robô)")
-            except Exception as e:
-                print(f"✗ Erro ao iniciar câmera: {e}")
-                self.pipeline_camera = None
+    
+    def sensor_status(self):
+        """Sensores entregando frames agora ({'lidar': bool, 'camera': bool})"""
+        if self.devices is None:
+            return {'lidar': self.lidar_grabber is not None, 'camera': self.camera_grabber is not None}
+        return {role: role in self.devices.slots and self.devices.slots[role].connected
+                for role in ('lidar', 'camera')}
+    
+    def _attach_filters(self):
+        """Liga o pré-processamento da profundidade às threads de aquisição"""
+        if self.lidar_grabber and self.lidar_filter:
+            self.lidar_grabber.process = lambda depth: self.lidar_filter.process(
+                depth, self._depth_scale(self.lidar_intrinsics))
+        if self.camera_grabber and self.camera_filter:
+            self.camera_grabber.process = lambda data: (data[0], self.camera_filter.process(
+                data[1], self._depth_scale(self.camera_intrinsics)))
+    
+    @staticmethod
+    def _depth_scale(intrinsics):
+        return intrinsics.depth_scale if intrinsics else 0.001
+    
+    @property
+    def lidar_depth_intrinsics(self):
+        """Intrínsecos dos frames do LiDAR entregues (já decimados, se houver filtro)"""
+        if self.lidar_filter:
+            return self.lidar_filter.scale_intrinsics(self.lidar_intrinsics)
+        return self.lidar_intrinsics
+    
+    @property
+    def camera_depth_intrinsics(self):
+        """Intrínsecos da profundidade da câmera entregue (já decimada, se houver filtro)"""
+        if self.camera_filter:
+            return self.camera_filter.scale_intrinsics(self.camera_intrinsics)
+        return self.camera_intrinsics
+    
+    def frame_sequence(self):
+        """Retorna os contadores de frames (LiDAR, câmera) para detectar dados novos"""
+        return (self.lidar_grabber.sequence if self.lidar_grabber else 0,
+                self.camera_grabber.sequence if self.camera_grabber else 0)
+    
+    @staticmethod
+    def _extract_lidar(frames):
+        depth_frame = frames.get_depth_frame()
+        if not depth_frame:
+            return None
+        return np.array(depth_frame.get_data())
+    
+    @staticmethod
+    def _extract_camera(frames):
+        color_frame = frames.get_color_frame()
+        depth_frame = frames.get_depth_frame()
+        if not color_frame or not depth_frame:
+            return None
+        return np.array(color_frame.get_data()), np.array(depth_frame.get_data())
+    
+    def get_frames(self):
+        """Frames do LiDAR e da câmera mais próximos no tempo (FrameBundle), sem bloquear
         
-        return self.lidar_started or self.camera_started
+        None se não chegou frame novo desde a última chamada.
+        """
+        return self.pairer.pair(self.lidar_grabber.recent() if self.lidar_grabber else [],
+                                self.camera_grabber.recent() if self.camera_grabber else [])
     
     def get_lidar_data(self):
-        """Obtém dados do LiDAR (obstáculos no chão)"""
-        if not self.lidar_started or not self.pipeline_lidar:
+        """Obtém o frame mais recente do LiDAR (obstáculos no chão), sem bloquear"""
+        if not self.lidar_grabber:
             return None
         
-        try:
-            frames = self.pipeline_lidar.wait_for_frames(timeout_ms=5000)
-            depth_frame = frames.get_depth_frame()
-            if not depth_frame:
-                return None
-            
-            depth_image = np.asanyarray(depth_frame.get_data())
-            return depth_image
-        except Exception as e:
-            print(f"Erro ao obter dados do LiDAR: {e}")
+        latest = self.lidar_grabber.latest()
+        if not latest:
             return None
+        return latest[2]
     
     def get_camera_data(self):
-        """Obtém dados da câmera (verificação de altura)"""
-        if not self.camera_started or not self.pipeline_camera:
+        """Obtém o frame mais recente da câmera (verificação de altura), sem bloquear"""
+        if not self.camera_grabber:
             return None, None
         
-        try:
-            frames = self.pipeline_camera.wait_for_frames(timeout_ms=5000)
-            color_frame = frames.get_color_frame()
-            depth_frame = frames.get_depth_frame()
-            
-            if not color_frame or not depth_frame:
-                return None, None
-            
-            color_image = np.asanyarray(color_frame.get_data())
-            depth_image = np.asanyarray(depth_frame.get_data())
-            
-            return color_image, depth_image
-        except Exception as e:
-            print(f"Erro ao obter dados da câmera: {e}")
+        latest = self.camera_grabber.latest()
+        if not latest:
             return None, None
+        return latest[2]
     
-    def create_point_cloud(self, depth_image, color_image=None):
-        """Cria nuvem de pontos para reconstrução 3D"""
+    def load_calibration(self, path):
+        """Carrega intrínsecos de um arquivo JSON (substituto offline dos sensores)"""
+        with open(path) as f:
+            self.apply_calibration(json.load(f))
+        print(f"✓ Calibração carregada de {path}")
+    
+    def apply_calibration(self, data):
+        """Aplica intrínsecos no formato de calibration_data()"""
+        if data.get('lidar'):
+            self.lidar_intrinsics = CameraIntrinsics.from_dict(data['lidar'])
+        if data.get('camera'):
+            self.camera_intrinsics = CameraIntrinsics.from_dict(data['camera'])
+    
+    def calibration_data(self):
+        """Intrínsecos atuais como dicionário (formato do arquivo de calibração)"""
+        return {
+            'lidar': self.lidar_intrinsics.to_dict() if self.lidar_intrinsics else None,
+            'camera': self.camera_intrinsics.to_dict() if self.camera_intrinsics else None
+        }
+    
+    def save_calibration(self, path):
+        """Salva os intrínsecos capturados em um arquivo JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.calibration_data(), f, indent=2)
+        print(f"✓ Calibração salva em {path}")
+    
+    def start_recording(self, path):
+        """Grava os frames dos sensores em um bag (ver sensor_bag.py) até stop()"""
+        recorder = sensor_bag.SensorBagWriter(path, self.calibration_data())
+        if self.lidar_grabber:
+            self.lidar_grabber.recorder = \
+                lambda timestamp, depth: recorder.add(sensor_bag.LIDAR, timestamp, depth)
+        if self.camera_grabber:
+            self.camera_grabber.recorder = \
+                lambda timestamp, data: recorder.add(sensor_bag.CAMERA, timestamp, data[1], data[0])
+        self.recorder = recorder
+        print(f"✓ Gravando sensores em {path}")
+    
+    def stop_recording(self):
+        """Finaliza a gravação (grava o índice do bag)"""
+        if not self.recorder:
+            return
+        for grabber in (self.lidar_grabber, self.camera_grabber):
+            if grabber:
+                grabber.recorder = None
+        self.recorder.close()
+        print(f"✓ Gravação finalizada: {self.recorder.frames} frames "
+              f"({self.recorder.dropped} descartados)")
+        self.recorder = None
+    
+    def resolve_intrinsics(self, depth_image, intrinsics=None):
+        """Retorna intrínsecos válidos para a imagem (aproximados se não houver calibração)"""
+        if intrinsics is not None and intrinsics.matches(depth_image):
+            return intrinsics
+        height, width = depth_image.shape[:2]
+        fallback = self._fallback_intrinsics.get((height, width))
+        if fallback is None:
+            fallback = CameraIntrinsics.approximate(width, height)
+            self._fallback_intrinsics[(height, width)] = fallback
+        return fallback
+    
+    def back_project(self, depth_image, color_image=None, stride=4, intrinsics=None):
+        """Projeta a imagem de profundidade em pontos 3D (vetorizado)
+        
+        Retorna (points, colors) como arrays Nx3 em float64, ou (None, None)
+        se não houver pontos válidos.
+        """
         if depth_image is None:
-            return None
+            return None, None
         
-        # Converte profundidade para metros
-        depth_meters = depth_image * 0.001
-        
-        # Cria malha de coordenadas
-        height, width = depth_meters.shape
-        fx = fy = 500  # Focal length aproximada
-        cx, cy = width / 2, height / 2
-        
-        points = []
-        colors = []
-        
-        for v in range(0, height, 4):  # Amostragem para performance
-            for u in range(0, width, 4):
-                z = depth_meters[v, u]
-                if z > 0.1 and z < 10:  # Filtra valores inválidos
-                    x = (u - cx) * z / fx
-                    y = (v - cy) * z / fy
-                    points.append([x, y, z])
-                    
-                    if color_image is not None:
-                        b, g, r = color_image[v, u]
-                        colors.append([r/255.0, g/255.0, b/255.0])
-                    else:
-                        colors.append([0.5, 0.5, 0.5])
+        intrinsics = self.resolve_intrinsics(depth_image, intrinsics)
+        x_ray, y_ray = intrinsics.ray_table(stride)
+        
+        # Filtra em unidades brutas; só os pixels válidos são convertidos para metros
+        raw = depth_image[::stride, ::stride]
+        min_raw = int(round(0.1 / intrinsics.depth_scale, 6))
+        max_raw = intrinsics.to_raw(10)
+        valid = (raw > min_raw) & (raw < max_raw)
+        
+        z_valid = raw[valid] * intrinsics.depth_scale
+        if len(z_valid) == 0:
+            return None, None
+        
+        points = np.empty((len(z_valid), 3), dtype=np.float64)
+        points[:, 0] = x_ray[valid] * z_valid
+        points[:, 1] = y_ray[valid] * z_valid
+        points[:, 2] = z_valid
         
-        if len(points) == 0:
+        if color_image is not None:
+            # BGR -> RGB normalizado
+            colors = color_image[::stride, ::stride][valid][:, ::-1] / 255.0
+        else:
+            colors = np.full((len(z_valid), 3), 0.5)
+        
+        return points, colors
+    
+    def create_point_cloud(self, depth_image, color_image=None, stride=4, intrinsics=None):
+        """Cria nuvem de pontos para reconstrução 3D"""
+        points, colors = self.back_project(depth_image, color_image, stride, intrinsics)
+        if points is None:
             return None
         
         pcd = o3d.geometry.PointCloud()
-        pcd.points = o3d.utility.Vector3dVector(np.array(points))
-        pcd.colors = o3d.utility.Vector3dVector(np.array(colors))
+        pcd.points = o3d.utility.Vector3dVector(points)
+        pcd.colors = o3d.utility.Vector3dVector(colors)
         
         return pcd
     
     def stop(self):
         """Para os sensores"""
-        if self.lidar_started and self.pipeline_lidar:
-            self.pipeline_lidar.stop()
-            print("✓ LiDAR parado")
-        if self.camera_started and self.pipeline_camera:
-            self.pipeline_camera.stop()
-            print("✓ Câmera parada")
+        for grabber in (self.lidar_grabber, self.camera_grabber):
+            if grabber:
+                grabber.stop()
+        self.stop_recording()
+        if self.devices:
+            self.devices.stop()
+
+
+class BagStream:
+    """Fonte de frames de um stream do bag, com a interface de pipeline do FrameGrabber
+    
+    Guarda só o frame mais recente publicado (como um sensor real, que não
+    espera quem lê); wait_for_frames retorna a posição do frame no bag.
+    """
+    
+    def __init__(self):
+        self._queue = Queue(maxsize=1)
+    
+    def publish(self, position):
+        try:
+            self._queue.put_nowait(position)
+        except Full:
+            try:
+                self._queue.get_nowait()
+            except Empty:
+                pass
+            self._queue.put_nowait(position)
+    
+    def wait_for_frames(self, timeout_ms=1000):
+        try:
+            return self._queue.get(timeout=timeout_ms / 1000)
+        except Empty:
+            return None
+    
+    def stop(self):
+        pass
+
+
+class ReplayController(RealSenseController):
+    """Reproduz um bag gravado com a mesma interface do RealSenseController
+    
+    rate: 1 = tempo real, 2 = duas vezes mais rápido, 0 = o mais rápido
+    possível (cada frame é liberado quando o anterior do mesmo stream foi
+    lido, então o consumidor processa todos os frames, sem descartar).
+    """
+    
+    def __init__(self, bag_path, rate=1.0, loop=False, calibration_file=None, depth_filter=None,
+                 sync_tolerance=0.02, metrics=None):
+        super().__init__(calibration_file, depth_filter, sync_tolerance, metrics)
+        self.bag = sensor_bag.SensorBagReader(bag_path)
+        self.rate = rate
+        self.loop = loop
+        self.finished = Event()  # Sinalizado ao fim da reprodução (sem loop)
+        self._stopped = Event()
+        self._player = None
+        self._sources = {}
+    
+    def start(self):
+        """Inicia a reprodução (intrínsecos gravados no bag têm prioridade)"""
+        self.apply_calibration(self.bag.metadata)
+        for stream, name in ((sensor_bag.LIDAR, 'LiDAR'), (sensor_bag.CAMERA, 'câmera')):
+            if len(self.bag.frames(stream)) == 0:
+                continue
+            source = BagStream()
+            grabber = FrameGrabber(name, source, self._read_frame, stamp=self._stamp_position)
+            self._sources[stream] = (source, grabber)
+            if stream == sensor_bag.LIDAR:
+                self.lidar_grabber, self.lidar_started = grabber, True
+            else:
+                self.camera_grabber, self.camera_started = grabber, True
+        
+        if not self._sources:
+            print("✗ Bag sem frames!")
+            return False
+        self._attach_filters()
+        for _, grabber in self._sources.values():
+            grabber.start()
+        
+        speed = f"{self.rate}x" if self.rate > 0 else "o mais rápido possível"
+        print(f"✓ Reproduzindo {self.bag.path}: {len(self.bag)} frames, "
+              f"{self.bag.duration:.1f} s ({speed})")
+        self._player = Thread(target=self._play, name="bag-player", daemon=True)
+        self._player.start()
+        return True
+    
+    def _read_frame(self, position):
+        return None if position is None else self.bag.read(position)
+    
+    def _stamp_position(self, position):
+        """Pareamento pelo instante gravado (mesmo relógio nos dois streams; o bag não guarda o número do frame)"""
+        return None, float(self.bag.index['timestamp'][position]), None
+    
+    def _play(self):
+        timestamps = np.asarray(self.bag.index['timestamp'])
+        streams = np.asarray(self.bag.index['stream'])
+        # Sequência do último frame publicado em cada grabber
+        published = {stream: grabber.sequence for stream, (_, grabber) in self._sources.items()}
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            for position in range(len(timestamps)):
+                stream = streams[position]
+                source, grabber = self._sources[stream]
+                if self.rate > 0:
+                    due = started + (timestamps[position] - timestamps[0]) / self.rate
+                    if self._stopped.wait(max(0.0, due - time.monotonic())):
+                        return
+                else:
+                    while not grabber.wait_consumed(published[stream], timeout=0.1):
+                        if self._stopped.is_set():
+                            return
+                source.publish(position)
+                published[stream] += 1
+            if not self.loop:
+                break
+        self.finished.set()
+    
+    def stop(self):
+        """Para a reprodução"""
+        self._stopped.set()
+        if self._player:
+            self._player.join(timeout=1)
+        for grabber in (self.lidar_grabber, self.camera_grabber):
+            if grabber:
+                grabber.stop()
+        self.stop_recording()
+        print("✓ Reprodução parada")
 
 
 class ObstacleDetector:
     """Detecta obstáculos usando dados dos sensores"""
     
-    def __init__(self, safe_distance=0.5, height_threshold=1.5):
+    def __init__(self, safe_distance=0.5, height_threshold=1.5, n_sectors=3, percentile=None,
+                 ground=None, ground_clearance=0.05, height_stride=2, obstacle_points=False):
         self.safe_distance = safe_distance  # metros - distância segura horizontal
         self.height_threshold = height_threshold  # metros - altura máxima permitida
+        self.n_sectors = n_sectors  # setores verticais analisados (além de esquerda/centro/direita)
+        # Percentil da profundidade de cada setor (None = mínimo): alguns pixels
+        # espúrios perto do sensor deixam de decidir o setor sozinhos
+        self.percentile = percentile
+        # Plano do chão da câmera (GroundPlaneEstimator): com ele, a análise de
+        # altura usa a altura real de cada ponto acima do chão
+        self.ground = ground
+        self.ground_clearance = ground_clearance  # metros - abaixo disso é chão
+        self.height_stride = height_stride  # Amostragem da imagem na análise de altura
+        # Inclui no resultado os pontos dos obstáculos (Nx2: x à frente, y à
+        # esquerda, metros) em 'points', para o costmap
+        self.obstacle_points = obstacle_points
+        self._scratch = local()  # Buffers de trabalho reutilizados (um por thread)
         
-    def analyze_lidar(self, depth_image):
-        """Analisa dados do LiDAR (embaixo) para obstáculos no chão"""
-        if depth_image is None:
-            return None
+    def sector_minima(self, depth_image, n_sectors):
+        """Menor profundidade bruta válida de cada setor vertical, em um único passe
         
-        # Converte para metros
-        depth_meters = depth_image * 0.001
+        Trabalha direto no uint16: subtrair 1 transforma os pixels inválidos (0)
+        em 65535, que nunca vencem o mínimo. Reduz por coluna e depois por setor,
+        sem máscaras nem cópias do frame (o buffer de trabalho é reutilizado).
+        Retorna (mínimos dos n_sectors, mínimos de esquerda/centro/direita) em
+        unidades brutas; 0 indica setor sem pixels válidos.
+        """
+        buffers = getattr(self._scratch, 'buffers', None)
+        if buffers is None:
+            buffers = self._scratch.buffers = {}
+        scratch = buffers.get(depth_image.shape)
+        if scratch is None:
+            scratch = buffers[depth_image.shape] = np.empty(depth_image.shape, dtype=np.uint16)
         
-        # Divide a imagem em setores (esquerda, centro, direita)
-        height, width = depth_meters.shape
-        left_sector = depth_meters[:, :width//3]
-        center_sector = depth_meters[:, width//3:2*width//3]
-        right_sector = depth_meters[:, 2*width//3:]
+        np.subtract(depth_image, 1, out=scratch, casting='unsafe')
+        column_minima = scratch.min(axis=0)
         
-        # Calcula distância mínima em cada setor
-        left_valid = left_sector[left_sector > 0]
-        center_valid = center_sector[center_sector > 0]
-        right_valid = right_sector[right_sector > 0]
+        width = depth_image.shape[1]
+        sectors = np.minimum.reduceat(column_minima, [i * width // n_sectors for i in range(n_sectors)])
+        thirds = np.minimum.reduceat(column_minima, [0, width // 3, 2 * width // 3])
+        # Desfaz o deslocamento: o sentinela 65535 volta a ser 0 (inválido)
+        return sectors + np.uint16(1), thirds + np.uint16(1)
+    
+    def sector_percentiles(self, depth_image, n_sectors, percentile):
+        """Percentil da profundidade bruta válida de cada setor vertical
+        
+        Mesmo formato de sector_minima (0 indica setor sem pixels válidos).
+        """
+        width = depth_image.shape[1]
         
-        left_min = np.min(left_valid) if len(left_valid) > 0 else 10.0
-        center_min = np.min(center_valid) if len(center_valid) > 0 else 10.0
-        right_min = np.min(right_valid) if len(right_valid) > 0 else 10.0
+        def reduce(bounds):
+            result = np.zeros(len(bounds) - 1, dtype=np.uint16)
+            for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+                values = depth_image[:, start:end]
+                values = values[values > 0]
+                if values.size:
+                    k = min(int(values.size * percentile / 100), values.size - 1)
+                    result[i] = np.partition(values, k)[k]
+            return result
         
-        obstacles = {
-            'type': 'ground',
+        sectors = reduce([i * width // n_sectors for i in range(n_sectors + 1)])
+        thirds = reduce([0, width // 3, 2 * width // 3, width])
+        return sectors, thirds
+    
+    def sector_depths(self, depth_image):
+        """Profundidade representativa de cada setor: mínimo ou percentil configurado"""
+        if self.percentile:
+            return self.sector_percentiles(depth_image, self.n_sectors, self.percentile)
+        return self.sector_minima(depth_image, self.n_sectors)
+    
+    def _sector_report(self, kind, minima, depth_scale, threshold_raw=None):
+        """Converte apenas os mínimos por setor para metros e monta o resultado"""
+        sectors, thirds = minima
+        
+        def to_meters(raw):
+            valid = raw > 0
+            if threshold_raw is not None:
+                valid &= raw < threshold_raw
+            return np.where(valid, raw * depth_scale, 10.0)
+        
+        left_min, center_min, right_min = to_meters(thirds).tolist()
+        
+        return {
+            'type': kind,
             'left': bool(left_min < self.safe_distance),
             'center': bool(center_min < self.safe_distance),
             'right': bool(right_min < self.safe_distance),
@@ -268,136 +887,210 @@ class ObstacleDetector:
                 'left': float(left_min),
                 'center': float(center_min),
                 'right': float(right_min)
-            }
+            },
+            'sectors': to_meters(sectors).tolist()
         }
+    
+    def analyze_lidar(self, depth_image, intrinsics=None):
+        """Analisa dados do LiDAR (embaixo) para obstáculos no chão"""
+        if depth_image is None:
+            return None
+        
+        # Trabalha em unidades brutas (uint16); só os mínimos são convertidos para metros
+        height, width = depth_image.shape
+        if intrinsics is None:
+            intrinsics = CameraIntrinsics.approximate(width, height)
         
-        return obstacles
+        # Distância em cada setor (esquerda, centro, direita e os N setores):
+        # mínimo ou percentil configurado
+        minima = self.sector_depths(depth_image)
+        report = self._sector_report('ground', minima, intrinsics.depth_scale)
+        if self.obstacle_points:
+            # Todo ponto válido do LiDAR é obstáculo (sensor baixo, olhando para frente)
+            report['points'] = self._points(depth_image, intrinsics, depth_image > 0)
+        return report
     
-    def analyze_height(self, depth_image):
+    def _points(self, depth_image, intrinsics, mask, stride=4):
+        """Pontos (x à frente, y à esquerda) dos pixels de `mask` no referencial do sensor"""
+        x_ray, _ = intrinsics.ray_table(stride)
+        mask = mask[::stride, ::stride]
+        z = depth_image[::stride, ::stride][mask] * intrinsics.depth_scale
+        return np.column_stack((z, -x_ray[:mask.shape[0], :mask.shape[1]][mask] * z)).astype(np.float32)
+    
+    def analyze_height(self, depth_image, intrinsics=None):
         """Analisa dados da câmera (em cima) para verificar altura dos objetos"""
         if depth_image is None:
             return None
         
-        # Converte para metros
-        depth_meters = depth_image * 0.001
+        height, width = depth_image.shape
+        if intrinsics is None:
+            intrinsics = CameraIntrinsics.approximate(width, height)
+        if self.ground is not None:
+            return self._analyze_ground_height(depth_image, intrinsics)
         
-        # Analisa a região superior da imagem (objetos altos)
-        height, width = depth_meters.shape
-        upper_region = depth_meters[:height//2, :]
+        # Limite de altura convertido uma vez para unidades brutas
+        threshold_raw = intrinsics.to_raw(self.height_threshold)
         
-        # Divide em setores
-        left_sector = upper_region[:, :width//3]
-        center_sector = upper_region[:, width//3:2*width//3]
-        right_sector = upper_region[:, 2*width//3:]
+        # Analisa a região superior da imagem (objetos altos)
+        upper_region = depth_image[:height//2, :]
         
-        # Detecta objetos altos próximos
-        left_valid = left_sector[(left_sector > 0) & (left_sector < self.height_threshold)]
-        center_valid = center_sector[(center_sector > 0) & (center_sector < self.height_threshold)]
-        right_valid = right_sector[(right_sector > 0) & (right_sector < self.height_threshold)]
+        # Detecta objetos altos próximos: se o menor valor válido do setor já
+        # passa do limite, nenhum pixel do setor está abaixo dele
+        minima = self.sector_depths(upper_region)
+        report = self._sector_report('height', minima, intrinsics.depth_scale, threshold_raw)
+        if self.obstacle_points:
+            mask = np.zeros(depth_image.shape, dtype=bool)
+            mask[:height//2] = (upper_region > 0) & (upper_region < threshold_raw)
+            report['points'] = self._points(depth_image, intrinsics, mask)
+        return report
+    
+    def _analyze_ground_height(self, depth_image, intrinsics):
+        """Obstáculos = pontos entre o chão e `height_threshold`, pela altura real
         
-        left_min = np.min(left_valid) if len(left_valid) > 0 else 10.0
-        center_min = np.min(center_valid) if len(center_valid) > 0 else 10.0
-        right_min = np.min(right_valid) if len(right_valid) > 0 else 10.0
+        Cada setor recebe a distância à frente (no chão) do obstáculo mais próximo.
+        """
+        self.ground.update(depth_image, intrinsics)
+        heights, forward, left = self.ground.height_map(depth_image, intrinsics, self.height_stride)
+        sampled = depth_image[::self.height_stride, ::self.height_stride]
+        obstacle = (sampled > 0) & (heights > self.ground_clearance) & (heights < self.height_threshold)
         
-        height_obstacles = {
-            'type': 'height',
-            'left': bool(left_min < self.safe_distance),
-            'center': bool(center_min < self.safe_distance),
-            'right': bool(right_min < self.safe_distance),
-            'distances': {
-                'left': float(left_min),
-                'center': float(center_min),
-                'right': float(right_min)
-            }
-        }
-        
-        return height_obstacles
+        # Distâncias de volta em unidades brutas (0 = sem obstáculo) para o kernel por setor
+        forward_raw = np.clip(np.rint(forward / intrinsics.depth_scale), 1, 65535)
+        minima = self.sector_depths(np.where(obstacle, forward_raw, 0).astype(np.uint16))
+        report = self._sector_report('height', minima, intrinsics.depth_scale)
+        report['ground'] = {'camera_height': round(self.ground.camera_height, 3),
+                            'camera_pitch': round(self.ground.camera_pitch, 1)}
+        if self.obstacle_points:
+            report['points'] = np.column_stack((forward[obstacle], left[obstacle])).astype(np.float32)
+        return report
 
 
 class AutonomousNavigator:
     """Sistema de navegação autônoma"""
     
-    def __init__(self, obstacle_detector):
+    # Direções consultadas no costmap (da direita para a esquerda) e meia
+    # abertura da frente; os lados vão até SIDE_ANGLE, como os terços da imagem
+    SCAN_ANGLES = np.radians(np.arange(-90, 91, 5))
+    FRONT_ANGLE = np.radians(15)
+    SIDE_ANGLE = np.radians(45)
+    
+    def __init__(self, obstacle_detector, max_speed=0.3, max_turn=1.2, costmap=None, planner=None):
         self.detector = obstacle_detector
         self.current_state = 'idle'
+        self.max_speed = max_speed  # m/s com a frente livre
+        self.max_turn = max_turn  # rad/s com a frente bloqueada
+        self.costmap = costmap  # Costmap opcional: espaço livre em qualquer direção
+        self.planner = planner  # DynamicWindowPlanner opcional (no lugar das regras por setor)
+        self.velocity = (0.0, 0.0, 0.0)  # Última velocidade decidida
         
-    def decide_movement(self, ground_obstacles, height_obstacles):
-        """Decide o movimento baseado nos obstáculos (chão e altura)"""
-        # Combina informações de ambos os sensores
-        obstacles_combined = {
-            'left': False,
-            'center': False,
-            'right': False
-        }
+    def decide_velocity(self, ground_obstacles, height_obstacles):
+        """Velocidade contínua (vx, vy, ω) em m/s e rad/s a partir das distâncias
+        
+        Em vez de cinco movimentos fixos: avança mais devagar conforme a frente
+        se aproxima da distância segura, gira para o lado mais livre na mesma
+        proporção e se afasta lateralmente do lado mais próximo. Com um
+        planejador, a velocidade vem dele (trajetórias avaliadas no costmap).
+        """
+        if self.costmap is not None and self.costmap.unknown:
+            # Camada de um sensor expirou: o que ele via não é espaço livre
+            self.current_state = 'blocked'
+            self.velocity = (0.0, 0.0, 0.0)
+            return self.velocity
+        if self.planner is not None:
+            self.velocity = self._plan()
+            return self.velocity
+        
+        turn = None
+        if self.costmap is not None:
+            distances, turn = self._costmap_distances()
+        else:
+            distances = {'left': 10.0, 'center': 10.0, 'right': 10.0}
+            for obstacles in (ground_obstacles, height_obstacles):
+                if obstacles:
+                    for side in distances:
+                        distances[side] = min(distances[side], obstacles['distances'][side])
+        
+        # Folga de 0 (na distância segura ou mais perto) a 1 (no dobro dela ou mais)
+        safe = self.detector.safe_distance
+        front, left, right = (min(max((distances[side] - safe) / safe, 0.0), 1.0)
+                              for side in ('center', 'left', 'right'))
+        
+        if front == 0 and left == 0 and right == 0:
+            self.current_state = 'backward'
+            return -0.5 * self.max_speed, 0.0, 0.0
         
-        if ground_obstacles:
-            obstacles_combined['left'] |= ground_obstacles['left']
-            obstacles_combined['center'] |= ground_obstacles['center']
-            obstacles_combined['right'] |= ground_obstacles['right']
-        
-        if height_obstacles:
-            obstacles_combined['left'] |= height_obstacles['left']
-            obstacles_combined['center'] |= height_obstacles['center']
-            obstacles_combined['right'] |= height_obstacles['right']
-        
-        # Decisão de movimento
-        if not obstacles_combined['center']:
-            # Caminho livre à frente
-            return 'forward', 150
-        elif not obstacles_combined['right']:
-            # Desviar para direita
-            return 'right', 120
-        elif not obstacles_combined['left']:
-            # Desviar para esquerda
-            return 'left', 120
+        # Empate (lados igualmente livres): gira para a direita
+        if turn is None:
+            turn = 1.0 if left > right else -1.0
+        self.current_state = 'forward' if front == 1 else 'avoiding'
+        return (self.max_speed * front,
+                0.5 * self.max_speed * (left - right),
+                turn * self.max_turn * (1.0 - front))
+    
+    def _plan(self):
+        vx, vy, omega = self.planner.plan(self.velocity)
+        if self.planner.best_score is None:
+            self.current_state = 'blocked'
+        elif vx >= 0.5 * self.max_speed:
+            self.current_state = 'forward'
         else:
-            # Obstáculos em todos os lados - recuar
-            return 'backward', 100
+            self.current_state = 'avoiding'
+        return vx, vy, omega
+    
+    def _costmap_distances(self):
+        """Distâncias na frente e nos lados, e o lado com mais espaço livre para girar"""
+        angles = self.SCAN_ANGLES
+        # Espaço livre + raio do robô = distância até o obstáculo, como nos setores
+        free = self.costmap.free_space(angles) + self.costmap.robot_radius
+        front = np.abs(angles) <= self.FRONT_ANGLE
+        left = (angles > self.FRONT_ANGLE) & (angles <= self.SIDE_ANGLE)
+        right = (angles < -self.FRONT_ANGLE) & (angles >= -self.SIDE_ANGLE)
+        distances = {'center': float(free[front].min()), 'left': float(free[left].min()),
+                     'right': float(free[right].min())}
+        # Todas as direções de cada lado, até 90° (empate: direita)
+        turn = 1.0 if free[angles > 0].sum() > free[angles < 0].sum() else -1.0
+        return distances, turn
 
 
 class RobotController:
-    """Controla o robô via Arduino"""
+    """Controla o robô via Arduino (adaptador do núcleo em motor_control.py)"""
     
-    def __init__(self):
-        self.serial_port = None
+    def __init__(self, metrics=None, protocol='binary', baudrate=DEFAULT_BAUDRATE):
+        # Fila única de comandos: repetidos não são reenviados, rajadas são
+        # reduzidas ao mais recente; cinemática comum às outras interfaces
+        self.motors = MotorControl(protocol=protocol, baudrate=baudrate, metrics=metrics)
         self.speed = 150
-        
+    
+    @property
+    def writer(self):
+        return self.motors.writer
+    
     def connect(self, port):
         """Conecta ao Arduino"""
         try:
-            self.serial_port = serial.Serial(port, 9600, timeout=1)
-            print(f"✓ Conectado ao Arduino na porta {port}")
+            self.motors.connect(port)
+            print(f"✓ Conectado ao Arduino na porta {port} "
+                  f"(protocolo {self.motors.protocol}, {self.motors.connection.baudrate} baud)")
             return True
         except Exception as e:
             print(f"✗ Erro ao conectar: {e}")
             return False
     
     def send_command(self, m1, m2, m3):
-        """Envia comando para o Arduino"""
-        if not self.serial_port:
-            return False
-            
-        command = f"{m1},{m2},{m3}\n"
-        try:
-            self.serial_port.write(command.encode())
-            return True
-        except Exception as e:
-            print(f"✗ Erro ao enviar comando: {e}")
-            return False
+        """Envia comando para o Arduino (sem bloquear; repetidos não são reenviados)"""
+        return self.motors.drive(m1, m2, m3)
+    
+    def set_velocity(self, vx, vy, omega, captured=None):
+        """Velocidade da base (m/s, m/s, rad/s), alcançada em rampa"""
+        return self.motors.set_velocity(vx, vy, omega, captured)
+    
+    def close(self):
+        """Envia o último comando pendente e fecha a serial"""
+        self.motors.close()
     
     def move(self, direction, speed):
-        """Move o robô na direção especificada"""
-        if direction == 'forward':
-            return self.send_command(speed, speed, speed)
-        elif direction == 'backward':
-            return self.send_command(-speed, -speed, -speed)
-        elif direction == 'left':
-            return self.send_command(-speed, speed, 0)
-        elif direction == 'right':
-            return self.send_command(speed, -speed, 0)
-        elif direction == 'stop':
-            return self.send_command(0, 0, 0)
-        return False
+        """Move o robô na direção especificada (ver motor_control.DIRECTIONS)"""
+        return self.motors.move(direction, speed)
     
     def get_available_ports(self):
         """Lista portas seriais disponíveis"""
@@ -405,149 +1098,664 @@ class RobotController:
         return [port.device for port in ports]
 
 
+# Estado de cada processo trabalhador do AnalysisPool (modo 'process')
+_worker_state = {}
+
+
+def _init_analysis_worker(safe_distance, height_threshold, n_sectors, percentile, ground, ground_clearance,
+                          height_stride, obstacle_points):
+    """Inicializa o processo trabalhador com seu próprio detector (e sua cópia do plano do chão)"""
+    _worker_state['detector'] = ObstacleDetector(safe_distance, height_threshold, n_sectors, percentile,
+                                                 ground, ground_clearance, height_stride, obstacle_points)
+    _worker_state['intrinsics'] = {}
+    _worker_state['shm'] = {}
+
+
+def _attach_shared_frame(ref):
+    """Mapeia (sem copiar) um frame colocado em memória compartilhada"""
+    name, shape, dtype = ref
+    shm = _worker_state['shm'].get(name)
+    if shm is None:
+        # O bloco pertence ao processo principal, que faz o unlink
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_state['shm'][name] = shm
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker_intrinsics(data):
+    """Reconstrói (e cacheia, com as tabelas de raios) os intrínsecos no trabalhador"""
+    if data is None:
+        return None
+    key = tuple(sorted(data.items()))
+    intrinsics = _worker_state['intrinsics'].get(key)
+    if intrinsics is None:
+        intrinsics = CameraIntrinsics.from_dict(data)
+        _worker_state['intrinsics'][key] = intrinsics
+    return intrinsics
+
+
+def _analyze_lidar_in_worker(ref, intrinsics_data):
+    frame = _attach_shared_frame(ref)
+    return _worker_state['detector'].analyze_lidar(frame, _worker_intrinsics(intrinsics_data))
+
+
+def _analyze_height_in_worker(ref, intrinsics_data):
+    frame = _attach_shared_frame(ref)
+    return _worker_state['detector'].analyze_height(frame, _worker_intrinsics(intrinsics_data))
+
+
+def _encode_jpeg(color_image, quality, scale=1.0):
+    """Reduz (opcional) e comprime o frame; retorna (jpeg, largura, altura)"""
+    if scale != 1.0:
+        color_image = cv2.resize(color_image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode('.jpg', color_image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    height, width = color_image.shape[:2]
+    return buffer.tobytes(), width, height
+
+
+class SharedFramePool:
+    """Blocos de memória compartilhada reutilizáveis para entregar frames aos processos"""
+    
+    def __init__(self):
+        self._free = {}  # tamanho em bytes -> blocos livres
+        self._blocks = []
+        self._lock = Lock()
+    
+    def put(self, array):
+        """Copia o frame para um bloco livre; retorna (bloco, referência para o trabalhador)"""
+        array = np.ascontiguousarray(array)
+        with self._lock:
+            free = self._free.setdefault(array.nbytes, [])
+            if free:
+                shm = free.pop()
+            else:
+                shm = shared_memory.SharedMemory(create=True, size=array.nbytes)
+                self._blocks.append(shm)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        return shm, (shm.name, array.shape, array.dtype.str)
+    
+    def release(self, shm, nbytes):
+        with self._lock:
+            self._free[nbytes].append(shm)
+    
+    def close(self):
+        with self._lock:
+            for shm in self._blocks:
+                shm.close()
+                shm.unlink()
+            self._blocks = []
+            self._free = {}
+
+
+class AnalysisPool:
+    """Executa o processamento pesado dos sensores fora do event loop
+    
+    Modos:
+    - 'inline': executa no próprio loop (comportamento original)
+    - 'thread': pool de threads (NumPy/OpenCV liberam o GIL)
+    - 'process': pool de processos para a análise, com os frames entregues
+      via memória compartilhada
+    
+    O trabalho de visualização (JPEG, nuvem de pontos, mapa 3D) roda em
+    threads separadas (run_in_background), para nunca ocupar os trabalhadores
+    da análise de obstáculos.
+    
+    No modo 'process' os trabalhadores recebem uma cópia do detector feita
+    na criação do pool.
+    """
+    
+    MODES = ('inline', 'thread', 'process')
+    
+    def __init__(self, detector, sensors, mode='thread', workers=2, metrics=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de execução inválido: {mode}")
+        self.detector = detector
+        self.sensors = sensors
+        self.mode = mode
+        self.workers = workers
+        self.metrics = metrics  # LatencyMetrics opcional (tempo de cada análise)
+        self.thread_executor = None
+        self.process_executor = None
+        self.background_executor = None
+        self.frames = None
+        
+        if mode in ('thread', 'process'):
+            self.thread_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+            # Duas threads: vídeo e mapa 3D não esperam um pelo outro
+            self.background_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='background')
+        if mode == 'process':
+            self.process_executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_analysis_worker,
+                initargs=(detector.safe_distance, detector.height_threshold, detector.n_sectors,
+                          detector.percentile, detector.ground, detector.ground_clearance,
+                          detector.height_stride, detector.obstacle_points)
+            )
+            self.frames = SharedFramePool()
+    
+    async def run_in_thread(self, func, *args):
+        """Executa no pool de threads (ou direto, no modo 'inline')"""
+        if self.thread_executor is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_executor, func, *args)
+    
+    async def run_in_background(self, func, *args):
+        """Executa nas threads de visualização (ou direto, no modo 'inline')"""
+        if self.background_executor is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.background_executor, func, *args)
+    
+    async def _run_in_process(self, func, frame, *args):
+        shm, ref = self.frames.put(frame)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.process_executor, func, ref, *args)
+        finally:
+            self.frames.release(shm, frame.nbytes)
+    
+    async def analyze_lidar(self, depth_image, intrinsics=None):
+        if self.process_executor:
+            intrinsics_data = intrinsics.to_dict() if intrinsics else None
+            return await self._run_in_process(_analyze_lidar_in_worker, depth_image, intrinsics_data)
+        return await self.run_in_thread(self.detector.analyze_lidar, depth_image, intrinsics)
+    
+    async def analyze_height(self, depth_image, intrinsics=None):
+        if self.process_executor:
+            intrinsics_data = intrinsics.to_dict() if intrinsics else None
+            return await self._run_in_process(_analyze_height_in_worker, depth_image, intrinsics_data)
+        return await self.run_in_thread(self.detector.analyze_height, depth_image, intrinsics)
+    
+    async def analyze(self, lidar_data, lidar_intrinsics, camera_depth, camera_intrinsics):
+        """Analisa os dois sensores em paralelo; retorna (ground_obstacles, height_obstacles)"""
+        async def none():
+            return None
+        
+        lidar = self.analyze_lidar(lidar_data, lidar_intrinsics) if lidar_data is not None else none()
+        height = self.analyze_height(camera_depth, camera_intrinsics) if camera_depth is not None else none()
+        if self.metrics:
+            if lidar_data is not None:
+                lidar = self.metrics.timed('analyze_lidar', lidar)
+            if camera_depth is not None:
+                height = self.metrics.timed('analyze_height', height)
+        return await asyncio.gather(lidar, height)
+    
+    async def back_project(self, depth_image, intrinsics=None, stride=4):
+        return await self.run_in_background(self.sensors.back_project, depth_image, None, stride, intrinsics)
+    
+    async def encode_jpeg(self, color_image, quality=50, scale=1.0):
+        return await self.run_in_background(_encode_jpeg, color_image, quality, scale)
+    
+    def shutdown(self):
+        if self.thread_executor:
+            self.thread_executor.shutdown(wait=True)
+        if self.background_executor:
+            self.background_executor.shutdown(wait=True)
+        if self.process_executor:
+            self.process_executor.shutdown(wait=True)
+        if self.frames:
+            self.frames.close()
+
+
+class PeriodicTask:
+    """Tarefa periódica com prazo fixo (deadline)
+    
+    Cada execução começa no seu horário (início + n períodos), independente
+    de quanto a anterior demorou, então a taxa não deriva com a carga. Uma
+    execução que passa do prazo conta como atraso (overrun); se o atraso
+    cobre períodos inteiros, esses ciclos são pulados em vez de executados
+    em sequência para recuperar o tempo.
+    """
+    
+    def __init__(self, name, rate, func, metrics=None):
+        self.name = name
+        self.period = 1.0 / rate
+        self.func = func  # Função assíncrona sem argumentos
+        self.metrics = metrics  # LatencyMetrics opcional (duração de cada execução)
+        self.runs = 0
+        self.overruns = 0  # Execuções que passaram do prazo
+        self.skipped = 0  # Ciclos pulados por atraso
+    
+    async def run(self, running):
+        """Executa enquanto running() for verdadeiro (a primeira vez após um período)"""
+        deadline = time.monotonic() + self.period
+        while running():
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            start = time.perf_counter()
+            try:
+                await self.func()
+            except Exception as e:
+                print(f"Erro na tarefa '{self.name}': {e}")
+            if self.metrics:
+                self.metrics.record_since(self.name, start)
+            self.runs += 1
+            
+            deadline += self.period
+            late = time.monotonic() - deadline
+            if late > 0:
+                self.overruns += 1
+                missed = int(late / self.period)
+                self.skipped += missed
+                deadline += missed * self.period
+    
+    def stats(self):
+        return {'rate': round(1.0 / self.period, 2), 'runs': self.runs,
+                'overruns': self.overruns, 'skipped': self.skipped}
+
+
+class VideoStreamer:
+    """Estágio de streaming da câmera
+    
+    Reduz a resolução e comprime em JPEG enviado como frame binário, sem
+    base64. A taxa de quadros (fps) é a da tarefa de vídeo do sensor_loop,
+    independente do controle.
+    """
+    
+    def __init__(self, scale=0.5, fps=10, quality=50):
+        self.scale = scale
+        self.fps = fps
+        self.quality = quality
+        self.frame_id = 0
+    
+    async def encode(self, color_image, analysis):
+        """Comprime o quadro no pool de análise e monta o frame binário"""
+        jpeg, width, height = await analysis.encode_jpeg(color_image, self.quality, self.scale)
+        self.frame_id += 1
+        return stream_protocol.encode_video_frame(jpeg, self.frame_id, width, height)
+
+
+class ClientChannel:
+    """Fila de envio de um cliente WebSocket
+    
+    Mensagens de controle são entregues em ordem; mensagens de stream
+    (telemetria, nuvem de pontos...) guardam apenas a mais recente de cada
+    stream, então um cliente lento pula frames em vez de atrasar os demais.
+    """
+    
+    # Streams enviados a todo cliente; os demais (ex.: vídeo) exigem inscrição
+    DEFAULT_STREAMS = ('sensor_data', 'map')
+    
+    def __init__(self, websocket, on_close=None):
+        self.websocket = websocket
+        self.on_close = on_close  # Callback(channel) quando o envio para sozinho (conexão caiu ou erro)
+        self.closed = False
+        self.subscriptions = set(self.DEFAULT_STREAMS)
+        self.map_version = -1  # Versão do mapa 3D que o cliente já recebeu
+        self.map_keyframe_at = 0.0  # Último keyframe do mapa enviado (time.monotonic)
+        self.reliable = deque()  # Mensagens que não podem ser descartadas
+        self.latest = {}  # stream -> payload mais recente ainda não enviado
+        self.coalesced = 0  # Frames substituídos antes de serem enviados
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._writer())
+    
+    def push(self, payload, stream=None):
+        """Agenda o envio de um payload já serializado (str ou bytes), sem esperar
+        
+        O payload também pode ser uma função, chamada só na hora do envio (pode
+        retornar None para não enviar nada).
+        """
+        if stream is None:
+            self.reliable.append(payload)
+        else:
+            if stream in self.latest:
+                self.coalesced += 1
+            self.latest[stream] = payload
+        self._wakeup.set()
+    
+    async def _writer(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self.reliable or self.latest:
+                    if self.reliable:
+                        payload = self.reliable.popleft()
+                    else:
+                        stream = next(iter(self.latest))
+                        payload = self.latest.pop(stream)
+                    if callable(payload):
+                        try:
+                            payload = payload()
+                        except Exception as e:
+                            # Só esta mensagem se perde; o cliente continua recebendo
+                            print(f"✗ Erro ao gerar mensagem para o cliente: {e}")
+                            continue
+                        if payload is None:
+                            continue
+                    await self.websocket.send(payload)
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            print(f"✗ Erro no envio para o cliente: {e}")
+        finally:
+            # Sem o escritor o cliente não recebe mais nada: avisa o servidor
+            if not self.closed and self.on_close:
+                self.on_close(self)
+    
+    def close(self):
+        self.closed = True
+        self._task.cancel()
+
+
 class WebSocketServer:
     """Servidor WebSocket para comunicação com interface web"""
     
-    def __init__(self, robot_controller, realsense_controller, obstacle_detector, navigator):
+    def __init__(self, robot_controller, realsense_controller, obstacle_detector, navigator,
+                 analysis_pool=None, video_streamer=None, voxel_map=None, keyframe_interval=30.0,
+                 metrics=None, metrics_interval=10.0, control_rate=30.0, cloud_rate=2.0):
         self.robot = robot_controller
         self.sensors = realsense_controller
         self.detector = obstacle_detector
         self.navigator = navigator
-        self.clients = set()
+        self.analysis = analysis_pool or AnalysisPool(obstacle_detector, realsense_controller, mode='inline')
+        self.video = video_streamer or VideoStreamer()
+        self.map = voxel_map or VoxelMap()
+        self.keyframe_interval = keyframe_interval  # segundos entre keyframes do mapa por cliente
+        self.metrics = metrics or LatencyMetrics()
+        self.metrics_interval = metrics_interval  # segundos entre linhas de log (0 = desligado)
+        self.control_rate = control_rate  # Hz: análise de obstáculos + comando dos motores
+        self.cloud_rate = cloud_rate  # Hz: fusão da nuvem de pontos no mapa 3D
+        self.tasks = []  # PeriodicTask em execução (ver sensor_loop)
+        self._map_frames = {}  # versão base (-1 = keyframe) -> frame, para a versão atual do mapa
+        self._map_frames_version = None
+        self.clients = {}  # websocket -> ClientChannel
         self.autonomous_mode = False
         self.running = True
         
     async def register(self, websocket):
         """Registra novo cliente"""
-        self.clients.add(websocket)
+        channel = ClientChannel(websocket, on_close=self._channel_closed)
+        self.clients[websocket] = channel
+        # Cliente que chega depois recebe o mapa atual em um único keyframe
+        self.push_map_updates([channel])
         print(f"✓ Cliente conectado. Total: {len(self.clients)}")
+        return channel
         
     async def unregister(self, websocket):
-        """Remove cliente"""
-        self.clients.remove(websocket)
-        print(f"✗ Cliente desconectado. Total: {len(self.clients)}")
-    
-    async def send_to_all(self, message):
-        """Envia mensagem para todos os clientes"""
-        if self.clients:
-            await asyncio.gather(
-                *[client.send(json.dumps(message)) for client in self.clients],
-                return_exceptions=True
-            )
+        """Remove cliente (se o envio já não o removeu)"""
+        channel = self.clients.pop(websocket, None)
+        if channel is not None:
+            channel.close()
+            print(f"✗ Cliente desconectado. Total: {len(self.clients)}")
+    
+    def _channel_closed(self, channel):
+        """O envio para o cliente parou: tira da lista e fecha a conexão (handle_client termina)"""
+        if self.clients.get(channel.websocket) is channel:
+            del self.clients[channel.websocket]
+            print(f"✗ Cliente desconectado. Total: {len(self.clients)}")
+        asyncio.ensure_future(channel.websocket.close())
+    
+    async def send_to_all(self, message, stream=None):
+        """Envia mensagem para todos os clientes
+        
+        A mensagem é serializada uma única vez (dict vira JSON, bytes vão como
+        frame binário) e entregue à fila de cada cliente sem esperar o envio.
+        Com `stream`, só clientes inscritos recebem, e os atrasados recebem só
+        a versão mais recente.
+        """
+        channels = [channel for channel in self.clients.values()
+                    if stream is None or stream in channel.subscriptions]
+        if channels:
+            payload = message if isinstance(message, bytes) else json.dumps(message)
+            for channel in channels:
+                channel.push(payload, stream)
+    
+    def _map_update_for(self, channel):
+        """Atualização do mapa 3D para o cliente (gerada na hora do envio)
+        
+        Envia um keyframe (mapa completo) a clientes novos, que pediram
+        ressincronização, atrasados além das marcas de remoção guardadas ou
+        sem keyframe há `keyframe_interval` segundos; aos demais, apenas o
+        delta desde a versão que já têm. Clientes na mesma versão compartilham
+        o mesmo frame codificado.
+        """
+        if channel.map_version >= self.map.version:
+            return None
+        if self._map_frames_version != self.map.version:
+            self._map_frames = {}
+            self._map_frames_version = self.map.version
+        
+        now = time.monotonic()
+        base = channel.map_version
+        if base < 0 or now - channel.map_keyframe_at >= self.keyframe_interval:
+            base = -1
+        cached = self._map_frames.get(base)
+        if cached is None and base >= 0:
+            delta = self.map.delta_since(base)
+            if delta is None:
+                base = -1
+                cached = self._map_frames.get(base)
+            else:
+                added, colors, removed, version = delta
+                cached = (stream_protocol.encode_map_update(version, base, added, colors, removed),
+                          version)
+                self._map_frames[base] = cached
+        if cached is None:
+            centers, colors, version = self.map.snapshot()
+            cached = (stream_protocol.encode_map_update(version, 0, centers, colors,
+                                                        np.empty((0, 3)), keyframe=True), version)
+            self._map_frames[base] = cached
+        if base < 0:
+            channel.map_keyframe_at = now
+        frame, channel.map_version = cached
+        return frame
+    
+    def push_map_updates(self, channels=None):
+        """Agenda o envio das alterações do mapa 3D aos clientes inscritos"""
+        for channel in channels or self.clients.values():
+            if 'map' in channel.subscriptions:
+                channel.push(lambda channel=channel: self._map_update_for(channel), stream='map')
+    
+    def has_subscribers(self, stream):
+        """Verifica se algum cliente está inscrito no stream"""
+        return any(stream in channel.subscriptions for channel in self.clients.values())
     
     async def handle_client(self, websocket):
         """Gerencia comunicação com cliente"""
-        await self.register(websocket)
+        channel = await self.register(websocket)
         try:
             async for message in websocket:
                 data = json.loads(message)
-                await self.process_command(data)
+                await self.process_command(data, channel)
         finally:
             await self.unregister(websocket)
     
-    async def process_command(self, data):
-        """Processa comandos recebidos"""
+    async def process_command(self, data, channel=None):
+        """Processa comandos recebidos (channel é o cliente que enviou, se houver)"""
         cmd_type = data.get('type')
         
         if cmd_type == 'connect':
             port = data.get('port')
-            success = self.robot.connect(port)
+            # Espera o Arduino reiniciar fora do event loop
+            loop = asyncio.get_running_loop()
+            success = await loop.run_in_executor(None, self.robot.connect, port)
             await self.send_to_all({'type': 'connection', 'status': success})
             
         elif cmd_type == 'move':
-            direction = data.get('direction')
-            speed = data.get('speed', 150)
-            self.robot.move(direction, speed)
+            if 'm1' in data:
+                # Velocidade de cada roda (controle de motores da interface)
+                self.robot.send_command(data['m1'], data.get('m2', 0), data.get('m3', 0))
+            else:
+                self.robot.move(data.get('direction'), data.get('speed', 150))
+            
+        elif cmd_type == 'velocity':
+            self.robot.set_velocity(data.get('vx', 0.0), data.get('vy', 0.0), data.get('omega', 0.0))
             
         elif cmd_type == 'set_autonomous':
             self.autonomous_mode = data.get('enabled', False)
+            if not self.autonomous_mode:
+                self.robot.set_velocity(0.0, 0.0, 0.0)  # Desacelera até parar
+                self.navigator.velocity = (0.0, 0.0, 0.0)
             await self.send_to_all({'type': 'autonomous_status', 'enabled': self.autonomous_mode})
             
         elif cmd_type == 'get_ports':
             ports = self.robot.get_available_ports()
             await self.send_to_all({'type': 'ports', 'ports': ports})
+            
+        elif cmd_type == 'subscribe' and channel is not None:
+            stream = data.get('stream')
+            if data.get('enabled', True):
+                channel.subscriptions.add(stream)
+            else:
+                channel.subscriptions.discard(stream)
+            if stream == 'map':
+                self.push_map_updates([channel])
+        
+        elif cmd_type == 'get_metrics':
+            metrics = {'type': 'metrics', 'stages': self.metrics.summary(),
+                       'tasks': {task.name: task.stats() for task in self.tasks},
+                       'serial': self.robot.motors.status()}
+            if channel is not None:
+                channel.push(json.dumps(metrics))
+            else:
+                await self.send_to_all(metrics)
+        
+        elif cmd_type == 'map_resync' and channel is not None:
+            # Cliente perdeu a sequência de deltas: o próximo envio é um keyframe
+            channel.map_version = -1
+            self.push_map_updates([channel])
     
     async def sensor_loop(self):
-        """Loop principal de processamento dos sensores"""
-        frame_count = 0
-        consecutive_errors = 0
-        max_consecutive_errors = 20
+        """Loop principal de processamento dos sensores
         
-        while self.running:
-            try:
-                # Obtém dados dos sensores
-                lidar_data = self.sensors.get_lidar_data()  # Obstáculos no chão
-                color_image, camera_depth = self.sensors.get_camera_data()  # Altura dos objetos
-                
-                # Verifica se conseguiu dados
-                if lidar_data is None and color_image is None:
-                    consecutive_errors += 1
-                    if consecutive_errors >= max_consecutive_errors:
-                        print(f"\n✗ Muitos erros consecutivos ({consecutive_errors})")
-                        print("  Os sensores podem estar desconectados")
-                        consecutive_errors = 0
-                    await asyncio.sleep(0.5)
-                    continue
-                else:
-                    consecutive_errors = 0
-                
-                # Detecta obstáculos
-                ground_obstacles = None
-                height_obstacles = None
-                
-                if lidar_data is not None:
-                    ground_obstacles = self.detector.analyze_lidar(lidar_data)
-                
-                if camera_depth is not None:
-                    height_obstacles = self.detector.analyze_height(camera_depth)
-            
-            # Navegação autônoma
-            if self.autonomous_mode and (ground_obstacles or height_obstacles):
-                direction, speed = self.navigator.decide_movement(ground_obstacles, height_obstacles)
-                self.robot.move(direction, speed)
-            
-            # Prepara dados para enviar
-            message = {
-                'type': 'sensor_data',
-                'timestamp': asyncio.get_event_loop().time(),
-                'ground_obstacles': ground_obstacles,
-                'height_obstacles': height_obstacles
-            }
-            
-            # Envia frame da câmera (comprimido)
-            if color_image is not None:
-                _, buffer = cv2.imencode('.jpg', color_image, [cv2.IMWRITE_JPEG_QUALITY, 50])
-                image_base64 = base64.b64encode(buffer).decode('utf-8')
-                message['camera'] = image_base64
-            
-            # Reconstrução 3D a cada 10 frames
-            frame_count += 1
-            if frame_count % 10 == 0:
-                # Usa dados do LiDAR para reconstrução 3D
-                if lidar_data is not None:
-                    pcd = self.sensors.create_point_cloud(lidar_data, None)
-                    if pcd is not None:
-                        # Serializa nuvem de pontos simplificada
-                        points = np.asarray(pcd.points)
-                        colors = np.asarray(pcd.colors)
-                        
-                        # Amostragem para reduzir tamanho
-                        if len(points) > 1000:
-                            indices = np.random.choice(len(points), 1000, replace=False)
-                            points = points[indices]
-                            colors = colors[indices]
-                        
-                        message['point_cloud'] = {
-                            'points': points.tolist(),
-                            'colors': colors.tolist()
-                        }
-            
-                await self.send_to_all(message)
-            except Exception as e:
-                print(f"Erro no loop de sensores: {e}")
-                consecutive_errors += 1
-            
-            await asyncio.sleep(0.1)  # 10 Hz
+        Tarefas periódicas independentes, cada uma com seu prazo: controle
+        (obstáculos + motores), vídeo, mapa 3D e log de latência. A
+        visualização roda em paralelo e nunca atrasa o controle; toda tarefa
+        usa só o frame mais recente e pula o trabalho se ele já foi processado.
+        """
+        self._control_sequence = None
+        self._video_sequence = None
+        self._cloud_sequence = None
+        self._frames_missing = 0
+        
+        self.tasks = [PeriodicTask('control', self.control_rate, self.control_tick, self.metrics),
+                      PeriodicTask('video', self.video.fps, self.video_tick, self.metrics),
+                      PeriodicTask('map', self.cloud_rate, self.map_tick, self.metrics)]
+        if self.metrics_interval:
+            self.tasks.append(PeriodicTask('log', 1.0 / self.metrics_interval, self.log_tick))
+        
+        await asyncio.gather(*(task.run(lambda: self.running) for task in self.tasks))
+    
+    async def control_tick(self):
+        """Análise de obstáculos, navegação autônoma e telemetria do frame mais recente"""
+        sequence = self.sensors.frame_sequence()
+        if sequence == self._control_sequence:
+            # Sem frame novo: nada a fazer; avisa se os sensores pararam
+            self._frames_missing += 1
+            costmap = self.navigator.costmap
+            if (self.autonomous_mode and costmap is not None
+                    and self._frames_missing == max(int(costmap.max_age * self.control_rate), 1)):
+                # Obstáculos do último frame já velhos demais para decidir: para
+                self.navigator.current_state = 'blocked'
+                self.robot.set_velocity(0.0, 0.0, 0.0)
+            if self._frames_missing == int(self.control_rate * 2):
+                print("\n✗ Nenhum frame novo dos sensores há 2 s")
+                print("  Os sensores podem estar desconectados")
+            return
+        self._control_sequence = sequence
+        self._frames_missing = 0
+        
+        # Frames dos dois sensores capturados juntos (par mais próximo no tempo)
+        bundle = self.sensors.get_frames()
+        if bundle is None:
+            return
+        lidar_data = bundle.lidar.data if bundle.lidar else None  # Obstáculos no chão
+        camera_depth = bundle.camera.data[1] if bundle.camera else None  # Altura dos objetos
+        if bundle.lidar:
+            self.metrics.record_since('acquire', bundle.lidar.timestamp)
+        
+        # Detecta obstáculos (fora do event loop, conforme o modo do AnalysisPool)
+        ground_obstacles, height_obstacles = await self.analysis.analyze(
+            lidar_data, self.sensors.lidar_depth_intrinsics,
+            camera_depth, self.sensors.camera_depth_intrinsics)
+        
+        # Pontos dos obstáculos vão para o costmap (não para os clientes)
+        costmap = self.navigator.costmap
+        frames = (('lidar', ground_obstacles, bundle.lidar), ('camera', height_obstacles, bundle.camera))
+        for source, obstacles, frame in frames:
+            points = obstacles.pop('points', None) if obstacles else None
+            if costmap is not None and points is not None:
+                with self.metrics.measure('costmap'):
+                    costmap.update(source, points, frame.sync_time)
+        if costmap is not None:
+            # Idade em relação ao frame mais novo do conjunto (no replay, o tempo da gravação)
+            newest = max(frame.sync_time for _, _, frame in frames if frame)
+            for source in costmap.expire(newest):
+                print(f"\n⚠ Obstáculos de '{source}' sem frame novo há mais de "
+                      f"{costmap.max_age * 1000:.0f} ms: navegação parada até ele voltar")
+        
+        # Navegação autônoma
+        if self.autonomous_mode and (ground_obstacles or height_obstacles):
+            with self.metrics.measure('decide'):
+                velocity = self.navigator.decide_velocity(ground_obstacles, height_obstacles)
+            # A rampa do núcleo de motores leva a velocidade até o alvo em passos suaves;
+            # ela mede 'capture_to_command' (da captura do frame mais antigo usado na
+            # decisão até o primeiro comando do alvo novo entregue ao escritor da serial)
+            self.robot.set_velocity(*velocity, captured=bundle.captured)
+        
+        message = {
+            'type': 'sensor_data',
+            'timestamp': asyncio.get_event_loop().time(),
+            'ground_obstacles': ground_obstacles,
+            'height_obstacles': height_obstacles,
+            # Idade dos dados usados e diferença entre os frames dos dois sensores
+            'frame_age_ms': round(bundle.age() * 1000, 1),
+            'pair_skew_ms': round(bundle.skew * 1000, 1) if bundle.paired else None,
+            # Sensores entregando frames (False enquanto um reconecta)
+            'sensors': self.sensors.sensor_status()
+        }
+        with self.metrics.measure('broadcast'):
+            await self.send_to_all(message, stream='sensor_data')
+    
+    async def video_tick(self):
+        """Comprime e envia o frame mais recente da câmera (só se alguém assiste)"""
+        sequence = self.sensors.frame_sequence()[1]
+        if sequence == self._video_sequence or not self.has_subscribers('video'):
+            return
+        color_image, _ = self.sensors.get_camera_data()
+        if color_image is None:
+            return
+        self._video_sequence = sequence
+        
+        video_frame = await self.metrics.timed('encode', self.video.encode(color_image, self.analysis))
+        await self.send_to_all(video_frame, stream='video')
+    
+    async def map_tick(self):
+        """Funde a nuvem do LiDAR no mapa 3D persistente; clientes recebem só o que mudou"""
+        sequence = self.sensors.frame_sequence()[0]
+        if sequence == self._cloud_sequence:
+            return
+        lidar_data = self.sensors.get_lidar_data()
+        if lidar_data is None:
+            return
+        self._cloud_sequence = sequence
+        
+        points, colors = await self.analysis.back_project(lidar_data, self.sensors.lidar_depth_intrinsics)
+        if points is not None:
+            changes = await self.analysis.run_in_background(self.map.integrate, points, colors)
+            if changes:
+                self.push_map_updates()
+    
+    async def log_tick(self):
+        """Linha de log com a latência por estágio e os atrasos das tarefas"""
+        print(self.metrics.log_line())
+        print(self.sensors.pairer.summary())
+        devices = self.sensors.devices.summary() if self.sensors.devices else None
+        if devices:
+            print(devices)
+        lost = [f"{grabber.sensor_name} {grabber.sensor_dropped}"
+                for grabber in (self.sensors.lidar_grabber, self.sensors.camera_grabber)
+                if grabber and grabber.sensor_dropped]
+        if lost:
+            print("⚠ Frames perdidos antes de chegar (número do frame): " + " | ".join(lost))
+        late = [f"{task.name} {task.overruns} ({task.skipped} ciclos pulados)"
+                for task in self.tasks if task.overruns]
+        if late:
+            print("⚠ Tarefas atrasadas: " + " | ".join(late))
     
     async def start_server(self, host='localhost', port=8765):
         """Inicia o servidor WebSocket"""
@@ -559,27 +1767,136 @@ class WebSocketServer:
 
 def main():
     """Função principal"""
+    parser = argparse.ArgumentParser(description="Sistema de Controle Autônomo")
+    parser.add_argument('--calibration', metavar='JSON',
+                        help="Intrínsecos dos sensores (usados quando não há dispositivo)")
+    parser.add_argument('--save-calibration', metavar='JSON',
+                        help="Salva os intrínsecos capturados dos sensores")
+    parser.add_argument('--sectors', type=int, default=3,
+                        help="Número de setores verticais analisados por sensor")
+    parser.add_argument('--percentile', type=float, default=0.0,
+                        help="Percentil da profundidade usado em cada setor (padrão: 0 = mínimo)")
+    parser.add_argument('--camera-height', type=float, default=0.3,
+                        help="Altura da câmera D435 acima do chão, em metros (padrão: 0.3)")
+    parser.add_argument('--camera-pitch', type=float, default=0.0,
+                        help="Inclinação da câmera D435 para baixo, em graus (padrão: 0)")
+    parser.add_argument('--height-threshold', type=float, default=1.5,
+                        help="Altura máxima (m) de um obstáculo para a câmera; acima disso o robô passa por baixo")
+    parser.add_argument('--planner', choices=('dwa', 'sectors'), default='dwa',
+                        help="Navegação: planejador local por janela dinâmica ou regras por setor (padrão: dwa)")
+    parser.add_argument('--planner-samples', type=int, nargs=3, default=(7, 5, 11), metavar=('VX', 'VY', 'W'),
+                        help="Amostras de velocidade do planejador por eixo (padrão: 7 5 11)")
+    parser.add_argument('--costmap-resolution', type=float, default=0.05,
+                        help="Tamanho da célula do costmap 2D, em metros (padrão: 0.05)")
+    parser.add_argument('--costmap-size', type=float, default=6.0,
+                        help="Lado do costmap 2D centrado no robô, em metros (padrão: 6)")
+    parser.add_argument('--max-layer-age', type=float, default=70,
+                        help="Idade máxima (ms) dos obstáculos de um sensor no costmap antes de parar o robô (padrão: 70)")
+    parser.add_argument('--robot-radius', type=float, default=0.2,
+                        help="Raio do robô usado na inflação do costmap, em metros (padrão: 0.2)")
+    parser.add_argument('--inflation-radius', type=float, default=0.5,
+                        help="Raio de inflação dos obstáculos no costmap, em metros (padrão: 0.5)")
+    parser.add_argument('--sync-tolerance', type=float, default=20.0,
+                        help="Diferença máxima (ms) entre os frames do LiDAR e da câmera usados juntos (padrão: 20)")
+    parser.add_argument('--decimation', type=int, default=2,
+                        help="Fator de decimação da profundidade (1 = resolução original; padrão: 2)")
+    parser.add_argument('--no-spatial-filter', action='store_true',
+                        help="Desliga o filtro espacial (mediana 3x3) da profundidade")
+    parser.add_argument('--temporal-alpha', type=float, default=0.4,
+                        help="Peso do frame novo no filtro temporal (0 = desligado; padrão: 0.4)")
+    parser.add_argument('--no-hole-filling', action='store_true',
+                        help="Não preenche os buracos (pixels sem profundidade)")
+    parser.add_argument('--video-scale', type=float, default=0.5,
+                        help="Fator de redução da resolução do vídeo (padrão: 0.5)")
+    parser.add_argument('--video-fps', type=float, default=10,
+                        help="Taxa de quadros do vídeo enviado (padrão: 10)")
+    parser.add_argument('--video-quality', type=int, default=50,
+                        help="Qualidade JPEG do vídeo, 1-100 (padrão: 50)")
+    parser.add_argument('--voxel-size', type=float, default=0.05,
+                        help="Tamanho do voxel do mapa 3D em metros (padrão: 0.05)")
+    parser.add_argument('--max-voxels', type=int, default=200000,
+                        help="Limite de voxels mantidos no mapa 3D")
+    parser.add_argument('--keyframe-interval', type=float, default=30.0,
+                        help="Segundos entre keyframes (mapa completo) enviados a cada cliente")
+    parser.add_argument('--executor', choices=AnalysisPool.MODES, default='thread',
+                        help="Onde rodar o processamento pesado (padrão: thread)")
+    parser.add_argument('--workers', type=int, default=2,
+                        help="Número de trabalhadores do pool de análise")
+    parser.add_argument('--serial-protocol', choices=SerialCommandWriter.PROTOCOLS, default='binary',
+                        help="Formato dos comandos ao Arduino ('ascii' para o firmware antigo)")
+    parser.add_argument('--baudrate', type=int, default=DEFAULT_BAUDRATE,
+                        help=f"Taxa da serial negociada com o Arduino (padrão: {DEFAULT_BAUDRATE}; "
+                             "firmware antigo fica em 9600)")
+    parser.add_argument('--max-speed', type=float, default=0.3,
+                        help="Velocidade máxima na navegação autônoma, em m/s (padrão: 0.3)")
+    parser.add_argument('--control-hz', type=float, default=30.0,
+                        help="Frequência do controle: obstáculos + motores (padrão: 30)")
+    parser.add_argument('--cloud-hz', type=float, default=2.0,
+                        help="Frequência de atualização do mapa 3D (padrão: 2)")
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                        help="Segundos entre linhas de log de latência (0 = desligado)")
+    parser.add_argument('--record', metavar='BAG',
+                        help="Grava os frames dos sensores em um bag (ver sensor_bag.py)")
+    parser.add_argument('--replay', metavar='BAG',
+                        help="Usa um bag gravado no lugar dos sensores")
+    parser.add_argument('--rate', type=float, default=1.0,
+                        help="Velocidade da reprodução: 1 = tempo real, 0 = o mais rápido possível")
+    parser.add_argument('--loop', action='store_true',
+                        help="Reinicia a reprodução ao fim do bag")
+    args = parser.parse_args()
+    
     print("=== Sistema de Controle Autônomo ===\n")
     
     # Inicializa componentes
     print("Inicializando sensores...")
-    sensors = RealSenseController()
+    metrics = LatencyMetrics()
+    depth_filter = {'decimation': args.decimation, 'spatial': not args.no_spatial_filter,
+                    'temporal_alpha': args.temporal_alpha, 'hole_filling': not args.no_hole_filling}
+    sync = {'sync_tolerance': args.sync_tolerance / 1000, 'metrics': metrics}
+    if args.replay:
+        sensors = ReplayController(args.replay, rate=args.rate, loop=args.loop,
+                                   calibration_file=args.calibration, depth_filter=depth_filter, **sync)
+    else:
+        sensors = RealSenseController(calibration_file=args.calibration, depth_filter=depth_filter, **sync)
     sensors.start()
+    if args.record:
+        sensors.start_recording(args.record)
+    if args.save_calibration:
+        sensors.save_calibration(args.save_calibration)
+    
+    ground = GroundPlaneEstimator(camera_height=args.camera_height, camera_pitch=args.camera_pitch)
+    detector = ObstacleDetector(safe_distance=0.8, height_threshold=args.height_threshold,
+                                n_sectors=args.sectors, percentile=args.percentile or None, ground=ground,
+                                obstacle_points=True)
+    costmap = Costmap(size=args.costmap_size, resolution=args.costmap_resolution,
+                      robot_radius=args.robot_radius, inflation_radius=args.inflation_radius,
+                      max_age=args.max_layer_age / 1000)
+    planner = None
+    if args.planner == 'dwa':
+        planner = DynamicWindowPlanner(costmap, max_speed=args.max_speed, samples=tuple(args.planner_samples))
+    navigator = AutonomousNavigator(detector, max_speed=args.max_speed, costmap=costmap, planner=planner)
+    robot = RobotController(metrics=metrics, protocol=args.serial_protocol, baudrate=args.baudrate)
     
-    detector = ObstacleDetector(safe_distance=0.8)
-    navigator = AutonomousNavigator(detector)
-    robot = RobotController()
+    analysis = AnalysisPool(detector, sensors, mode=args.executor, workers=args.workers, metrics=metrics)
+    print(f"✓ Processamento em modo '{args.executor}' ({args.workers} trabalhadores)")
     
     # Inicia servidor WebSocket
-    server = WebSocketServer(robot, sensors, detector, navigator)
+    video = VideoStreamer(scale=args.video_scale, fps=args.video_fps, quality=args.video_quality)
+    voxel_map = VoxelMap(voxel_size=args.voxel_size, max_voxels=args.max_voxels)
+    server = WebSocketServer(robot, sensors, detector, navigator, analysis, video, voxel_map,
+                             keyframe_interval=args.keyframe_interval,
+                             metrics=metrics, metrics_interval=args.metrics_interval,
+                             control_rate=args.control_hz, cloud_rate=args.cloud_hz)
     
     try:
         asyncio.run(server.start_server())
     except KeyboardInterrupt:
         print("\n\nEncerrando sistema...")
         sensors.stop()
-        if robot.serial_port:
+        analysis.shutdown()
+        if robot.writer:
             robot.move('stop', 0)
+            robot.close()
         print("✓ Sistema encerrado")
 
 
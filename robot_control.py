@@ -2,7 +2,7 @@ import tkinter as tk
 from tkinter import ttk
 import serial
 import serial.tools.list_ports
-import time
+from motor_control import MotorControl
 
 class RobotController:
     def __init__(self):
@@ -10,7 +10,7 @@ class RobotController:
         self.root.title("Controle do Robô")
         self.root.geometry("400x500")
         
-        self.serial_connection = None
+        self.motors = MotorControl()  # Núcleo comum de controle dos motores
         self.speed = 200  # Velocidade padrão
         
         self.setup_ui()
@@ -73,14 +73,12 @@ class RobotController:
     
     def connect_serial(self):
         try:
-            if self.serial_connection and self.serial_connection.is_open:
-                self.serial_connection.close()
-            
             port = self.port_var.get()
             if port:
-                self.serial_connection = serial.Serial(port, 9600, timeout=1)
-                time.sleep(2)  # Aguarda o Arduino resetar
-                self.status_label.config(text="Conectado", foreground="green")
+                # Pronto assim que o Arduino envia a mensagem de início
+                self.motors.connect(port)
+                self.status_label.config(text=f"Conectado ({self.motors.connection.baudrate} baud)",
+                                         foreground="green")
             else:
                 self.status_label.config(text="Selecione uma porta", foreground="red")
         except Exception as e:
@@ -89,34 +87,26 @@ class RobotController:
     def update_speed(self, value):
         self.speed = int(value)
     
-    def send_command(self, m1, m2, m3):
-        if self.serial_connection and self.serial_connection.is_open:
-            try:
-                command = f"{m1},{m2},{m3}\n"
-                self.serial_connection.write(command.encode())
-                print(f"Enviado: M1={m1}, M2={m2}, M3={m3}")
-            except Exception as e:
-                print(f"Erro ao enviar comando: {e}")
+    def move(self, direction):
+        # Velocidade de cada roda calculada pela cinemática em motor_control.py
+        if self.motors.move(direction, self.speed):
+            print(f"Enviado: {direction} (velocidade {self.speed})")
     
     def move_forward(self):
-        # Para frente: m1 parado, m2 para frente, m3 para trás
-        self.send_command(0, self.speed, -self.speed)
+        self.move('forward')
     
     def move_backward(self):
-        # Para trás: m1 parado, m2 para trás, m3 para frente
-        self.send_command(0, -self.speed, self.speed)
+        self.move('backward')
     
     def move_right(self):
-        # Para direita: m2 parado, m1 para trás, m3 para frente
-        self.send_command(-self.speed, 0, self.speed)
+        self.move('right')
     
     def move_left(self):
-        # Para esquerda: m3 parado, m1 para frente, m2 para trás
-        self.send_command(self.speed, -self.speed, 0)
+        self.move('left')
     
     def stop(self):
         # Parar todos os motores
-        self.send_command(0, 0, 0)
+        self.move('stop')
     
     def key_press(self, event):
         key = event.keysym.lower()
@@ -139,8 +129,8 @@ class RobotController:
         try:
             self.root.mainloop()
         finally:
-            if self.serial_connection and self.serial_connection.is_open:
-                self.serial_connection.close()
+            self.motors.stop()
+            self.motors.close()
 
 if __name__ == "__main__":
     controller = RobotController()
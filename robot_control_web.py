@@ -1,14 +1,22 @@
 from flask import Flask, render_template_string, request, jsonify
 import serial
 import serial.tools.list_ports
-import time
-import threading
+import json
+from threading import Thread, Lock
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.server import serve
+from motor_control import MotorControl, DIRECTIONS, motion_command
 
 app = Flask(__name__)
 
+# Teleoperação pelo teclado: canal WebSocket persistente (em vez de um POST por tecla)
+TELEOP_PORT = 5001
+TELEOP_DEADMAN = 0.3  # Segundos sem atualização com tecla pressionada: o robô para
+
 class RobotController:
     def __init__(self):
-        self.serial_connection = None
+        # Núcleo comum de controle dos motores, compartilhado entre as requisições
+        self.motors = MotorControl()
         self.speed = 80  # Velocidade padrão mais baixa (0-100)
         self.is_connected = False
         
@@ -17,49 +25,141 @@ class RobotController:
     
     def connect_serial(self, port):
         try:
-            if self.serial_connection and self.serial_connection.is_open:
-                self.serial_connection.close()
-            
-            self.serial_connection = serial.Serial(port, 9600, timeout=1)
-            time.sleep(2)  # Aguarda o Arduino resetar
+            # Reaproveita a conexão aberta; senão, pronta assim que o Arduino inicia
+            self.motors.connect(port)
             self.is_connected = True
-            return True, "Conectado com sucesso"
+            return True, f"Conectado com sucesso ({self.motors.connection.baudrate} baud)"
         except Exception as e:
             self.is_connected = False
             return False, f"Erro: {str(e)}"
     
-    def send_command(self, m1, m2, m3):
-        if self.serial_connection and self.serial_connection.is_open:
-            try:
-                command = f"{m1},{m2},{m3}\n"
-                self.serial_connection.write(command.encode())
-                return True, f"Enviado: M1={m1}, M2={m2}, M3={m3}"
-            except Exception as e:
-                return False, f"Erro ao enviar comando: {e}"
-        return False, "Não conectado"
+    def move(self, direction):
+        if not self.motors.is_connected:
+            return False, "Não conectado"
+        # Converte velocidade de 0-100 para 0-255 (escala do núcleo de controle)
+        arduino_speed = int(self.speed * 2.55)
+        if not self.motors.move(direction, arduino_speed):
+            return False, "Erro ao enviar comando"
+        return True, f"Enviado: {direction} (velocidade {self.speed}%)"
     
-    def move_forward(self):
-        # Converte velocidade de 0-100 para 0-255
+    def set_velocity(self, vx, vy, omega):
+        if not self.motors.is_connected:
+            return False, "Não conectado"
+        # Velocidade da base (m/s, m/s, rad/s); o núcleo acelera em rampa até ela
+        self.motors.set_velocity(vx, vy, omega)
+        return True, f"Velocidade: vx={vx}, vy={vy}, ω={omega}"
+    
+    def hold(self, directions):
+        """Move conforme as teclas pressionadas (ex.: frente + esquerda = diagonal)"""
+        if not self.motors.is_connected:
+            return False, "Não conectado"
+        vx, vy, omega = (sum(DIRECTIONS[d][i] for d in directions) for i in range(3))
         arduino_speed = int(self.speed * 2.55)
-        return self.send_command(0, arduino_speed, -arduino_speed)
+        if not self.motors.drive(*motion_command(vx, vy, omega, arduino_speed)):
+            return False, "Erro ao enviar comando"
+        return True, f"Enviado: {'+'.join(directions) or 'stop'} (velocidade {self.speed}%)"
+    
+    def move_forward(self):
+        return self.move('forward')
     
     def move_backward(self):
-        arduino_speed = int(self.speed * 2.55)
-        return self.send_command(0, -arduino_speed, arduino_speed)
+        return self.move('backward')
     
     def move_right(self):
-        arduino_speed = int(self.speed * 2.55)
-        return self.send_command(-arduino_speed, 0, arduino_speed)
+        return self.move('right')
     
     def move_left(self):
-        arduino_speed = int(self.speed * 2.55)
-        return self.send_command(arduino_speed, -arduino_speed, 0)
+        return self.move('left')
     
     def stop(self):
-        return self.send_command(0, 0, 0)
+        return self.move('stop')
 
 robot = RobotController()
 
+
+def parse_teleop(message):
+    """(direções, velocidade 0-100 ou None) de uma mensagem {keys, speed}; ValueError se inválida"""
+    data = json.loads(message)
+    if not isinstance(data, dict):
+        raise ValueError("mensagem deve ser um objeto")
+    keys = data.get('keys', [])
+    if not isinstance(keys, list):
+        raise ValueError("'keys' deve ser uma lista")
+    directions = [d for d in keys if isinstance(d, str) and d in DIRECTIONS and d != 'stop']
+    speed = data.get('speed')
+    if speed is not None:
+        if isinstance(speed, bool) or not isinstance(speed, (int, float)) or speed != speed:
+            raise ValueError("'speed' deve ser um número")
+        # Escala da interface (0-100%); vira 0-255 no Arduino
+        speed = int(min(max(speed, 0), 100))
+    return directions, speed
+
+
+def teleop_handler(websocket):
+    """Recebe {keys, speed} do cliente; enquanto houver tecla pressionada, o
+    cliente reenvia o estado em taxa fixa, e o silêncio para o robô"""
+    moving = False
+    try:
+        while True:
+            try:
+                message = websocket.recv(timeout=TELEOP_DEADMAN if moving else None)
+            except TimeoutError:
+                # Homem-morto: a rede caiu ou a aba parou de enviar com o robô andando
+                robot.stop()
+                moving = False
+                continue
+            except ConnectionClosed:
+                return
+            
+            try:
+                directions, speed = parse_teleop(message)
+            except ValueError as e:  # Inclui JSON inválido
+                # Mensagem inválida: para em vez de manter o último comando
+                if moving:
+                    robot.stop()
+                    moving = False
+                websocket.send(json.dumps({'success': False, 'message': f"Mensagem inválida: {e}"}))
+                continue
+            if speed is not None:
+                robot.speed = speed
+            success, message = robot.hold(directions)
+            moving = success and bool(directions)
+            if not success:
+                websocket.send(json.dumps({'success': False, 'message': message}))
+    finally:
+        # Qualquer saída (conexão fechada ou erro) com o robô andando para os motores
+        if moving:
+            robot.stop()
+
+
+def start_teleop_server(host='0.0.0.0', port=TELEOP_PORT):
+    """Servidor WebSocket de teleoperação em uma thread, ao lado do Flask"""
+    # Sem compressão: mensagens de poucos bytes, latência importa mais
+    server = serve(teleop_handler, host, port, compression=None)
+    Thread(target=server.serve_forever, name="teleop-server", daemon=True).start()
+    return server
+
+
+_teleop_lock = Lock()
+_teleop_started = False
+
+def ensure_teleop_server():
+    """Abre o servidor de teleoperação no processo que atende as requisições
+    
+    Vale para qualquer forma de rodar o app (app.run com ou sem reloader,
+    servidor WSGI): o processo que vigia os arquivos no modo debug nunca
+    atende requisições, então não disputa a porta.
+    """
+    global _teleop_started
+    with _teleop_lock:
+        if _teleop_started:
+            return
+        _teleop_started = True
+        try:
+            start_teleop_server()
+        except OSError as e:
+            print(f"✗ Teleoperação indisponível (porta {TELEOP_PORT}): {e}")
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="pt-BR">
@@ -261,7 +361,8 @@ HTML_TEMPLATE = """
 
         <div class="keyboard-info">
             <h4>⌨️ Controle por Teclado:</h4>
-            <p><strong>W/↑:</strong> Frente | <strong>S/↓:</strong> Trás | <strong>A/←:</strong> Esquerda | <strong>D/→:</strong> Direita | <strong>Espaço:</strong> Parar</p>
+            <p><strong>W/↑:</strong> Frente | <strong>S/↓:</strong> Trás | <strong>A/←:</strong> Esquerda | <strong>D/→:</strong> Direita | <strong>Q/E:</strong> Girar | <strong>Espaço:</strong> Parar</p>
+            <p>O robô anda enquanto a tecla estiver pressionada (combine teclas para diagonais).</p>
         </div>
     </div>
 
@@ -272,6 +373,7 @@ HTML_TEMPLATE = """
         // Carrega portas disponíveis ao iniciar
         window.onload = function() {
             refreshPorts();
+            connectTeleop();
         };
 
         function showMessage(text, isError = false) {
@@ -360,35 +462,81 @@ HTML_TEMPLATE = """
         function moveRight() { sendCommand('right'); }
         function stop() { sendCommand('stop'); }
 
-        // Controle por teclado
+        // Controle por teclado: canal WebSocket de teleoperação, com as teclas
+        // pressionadas enviadas no máximo a cada TELEOP_INTERVAL ms
+        const TELEOP_INTERVAL = 50;
+        const KEY_DIRECTIONS = {
+            'w': 'forward', 'arrowup': 'forward',
+            's': 'backward', 'arrowdown': 'backward',
+            'a': 'left', 'arrowleft': 'left',
+            'd': 'right', 'arrowright': 'right',
+            'q': 'rotate_left', 'e': 'rotate_right'
+        };
+        const heldKeys = new Set();
+        let teleop = null;
+        let teleopTimer = null;
+        let teleopDirty = false;
+        let teleopLastSent = 0;
+
+        function connectTeleop() {
+            teleop = new WebSocket(`ws://${location.hostname}:{{ teleop_port }}`);
+            teleop.onmessage = (event) => {
+                const data = JSON.parse(event.data);
+                if (!data.success) showMessage(data.message, true);
+            };
+            teleop.onclose = () => setTimeout(connectTeleop, 2000);
+        }
+
+        function sendTeleop() {
+            teleopDirty = false;
+            if (!teleop || teleop.readyState !== WebSocket.OPEN) return;
+            const keys = [...new Set([...heldKeys].map(key => KEY_DIRECTIONS[key]))];
+            teleop.send(JSON.stringify({ keys: keys, speed: Number(speed) }));
+            teleopLastSent = performance.now();
+        }
+
+        function teleopChanged() {
+            // Mudanças no meio do intervalo saem juntas no próximo envio
+            teleopDirty = true;
+            if (performance.now() - teleopLastSent >= TELEOP_INTERVAL) sendTeleop();
+            if (!teleopTimer) teleopTimer = setInterval(teleopTick, TELEOP_INTERVAL);
+        }
+
+        function teleopTick() {
+            // Com tecla pressionada, reenviar mantém o homem-morto do servidor satisfeito
+            if (teleopDirty || heldKeys.size > 0) sendTeleop();
+            if (heldKeys.size === 0 && !teleopDirty) {
+                clearInterval(teleopTimer);
+                teleopTimer = null;
+            }
+        }
+
         document.addEventListener('keydown', function(event) {
             if (!isConnected) return;
 
-            switch(event.key.toLowerCase()) {
-                case 'w':
-                case 'arrowup':
-                    event.preventDefault();
-                    moveForward();
-                    break;
-                case 's':
-                case 'arrowdown':
-                    event.preventDefault();
-                    moveBackward();
-                    break;
-                case 'a':
-                case 'arrowleft':
-                    event.preventDefault();
-                    moveLeft();
-                    break;
-                case 'd':
-                case 'arrowright':
-                    event.preventDefault();
-                    moveRight();
-                    break;
-                case ' ':
-                    event.preventDefault();
-                    stop();
-                    break;
+            const key = event.key.toLowerCase();
+            if (key === ' ') {
+                event.preventDefault();
+                heldKeys.clear();
+                teleopChanged();
+                if (!teleop || teleop.readyState !== WebSocket.OPEN) stop();
+            } else if (key in KEY_DIRECTIONS) {
+                event.preventDefault();
+                if (event.repeat) return;  // Repetição automática do sistema: nada mudou
+                heldKeys.add(key);
+                teleopChanged();
+            }
+        });
+
+        document.addEventListener('keyup', function(event) {
+            if (heldKeys.delete(event.key.toLowerCase())) teleopChanged();
+        });
+
+        // Janela perdeu o foco: o keyup não chegaria
+        window.addEventListener('blur', function() {
+            if (heldKeys.size > 0) {
+                heldKeys.clear();
+                teleopChanged();
             }
         });
     </script>
@@ -398,7 +546,8 @@ HTML_TEMPLATE = """
 
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    ensure_teleop_server()
+    return render_template_string(HTML_TEMPLATE, teleop_port=TELEOP_PORT)
 
 @app.route('/api/ports')
 def get_ports():
@@ -435,8 +584,16 @@ def move():
     
     return jsonify({'success': success, 'message': message})
 
+@app.route('/api/velocity', methods=['POST'])
+def velocity():
+    data = request.json
+    success, message = robot.set_velocity(float(data.get('vx', 0)), float(data.get('vy', 0)),
+                                          float(data.get('omega', 0)))
+    return jsonify({'success': success, 'message': message})
+
 if __name__ == '__main__':
     print("🤖 Servidor do Robô iniciando...")
     print("📡 Acesse: http://localhost:5000")
     print("🔧 Certifique-se de que o Arduino está conectado!")
+    print(f"🎮 Teleoperação (WebSocket): ws://localhost:{TELEOP_PORT}")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
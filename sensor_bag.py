@@ -0,0 +1,157 @@
+"""
+Gravação e reprodução dos sensores (bag) para rodar o sistema sem hardware
+- Cada frame é gravado como um bloco: profundidade uint16 comprimida com zlib
+  (depois de um filtro de diferenças ao longo da linha, que deixa a
+  profundidade suave mais compressível) e, na câmera, a cor em JPEG
+- O índice (um registro por frame, com o instante de captura) fica no fim do
+  arquivo e é lido com memmap, assim como os blocos: abrir um bag grande não
+  carrega nada na memória
+- A gravação roda em uma thread própria; se o disco não acompanhar, frames
+  são descartados em vez de atrasar a aquisição
+"""
+
+import json
+import os
+import struct
+import zlib
+import numpy as np
+import cv2
+from threading import Thread
+from queue import Queue, Full
+
+# Streams gravados
+LIDAR = 0  # Profundidade do L515
+CAMERA = 1  # Cor e profundidade da D435
+
+MAGIC = b'RSBAG\x00\x01\x00'
+
+# Cabeçalho: MAGIC + tamanho (u32) dos metadados em JSON, seguidos dos metadados
+HEADER = struct.Struct('<8sI')
+# Rodapé: posição (u64) e número de registros (u32) do índice + MAGIC
+FOOTER = struct.Struct('<QI8s')
+
+# Um registro por frame; offsets absolutos no arquivo (color_size = 0 no LiDAR)
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),  # time.perf_counter() na captura
+    ('stream', 'u1'),
+    ('height', '<u2'),
+    ('width', '<u2'),
+    ('depth_offset', '<u8'),
+    ('depth_size', '<u4'),
+    ('color_offset', '<u8'),
+    ('color_size', '<u4'),
+])
+
+
+class SensorBagWriter(Thread):
+    """Grava frames dos sensores em um arquivo bag, em uma thread dedicada"""
+
+    def __init__(self, path, metadata=None, compression=1, jpeg_quality=90, queue_size=64):
+        super().__init__(name="bag-writer", daemon=True)
+        self.path = path
+        self.compression = compression  # Nível do zlib (1 = mais rápido)
+        self.jpeg_quality = jpeg_quality
+        self.frames = 0
+        self.dropped = 0  # Frames descartados com a fila cheia
+        self._queue = Queue(maxsize=queue_size)
+        self._index = []
+        self._file = open(path, 'wb')
+
+        meta = json.dumps(metadata or {}).encode('utf-8')
+        self._file.write(HEADER.pack(MAGIC, len(meta)) + meta)
+        self.start()
+
+    def add(self, stream, timestamp, depth, color=None):
+        """Agenda a gravação de um frame, sem bloquear quem chama"""
+        try:
+            self._queue.put_nowait((stream, timestamp, depth, color))
+        except Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._write(*item)
+
+    def _write(self, stream, timestamp, depth, color):
+        height, width = depth.shape
+        depth_offset = self._file.tell()
+        # Diferença para o pixel à esquerda (módulo 2^16, desfeita com cumsum)
+        filtered = np.diff(depth.astype('<u2', copy=False), axis=1, prepend=np.uint16(0))
+        depth_block = zlib.compress(filtered.tobytes(), self.compression)
+        self._file.write(depth_block)
+
+        color_offset, color_size = self._file.tell(), 0
+        if color is not None:
+            ok, jpeg = cv2.imencode('.jpg', color, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if ok:
+                self._file.write(jpeg.tobytes())
+                color_size = len(jpeg)
+
+        self._index.append((timestamp, stream, height, width,
+                            depth_offset, len(depth_block), color_offset, color_size))
+        self.frames += 1
+
+    def close(self):
+        """Grava os frames pendentes, o índice e o rodapé"""
+        self._queue.put(None)
+        self.join()
+        index = np.array(self._index, dtype=INDEX_DTYPE)
+        # Os streams chegam à fila em threads diferentes: a ordem da fila não é a da captura
+        index = index[np.argsort(index['timestamp'], kind='stable')]
+        index_offset = self._file.tell()
+        self._file.write(index.tobytes())
+        self._file.write(FOOTER.pack(index_offset, len(index), MAGIC))
+        self._file.close()
+
+
+class SensorBagReader:
+    """Acesso aleatório aos frames de um bag (arquivo mapeado em memória)"""
+
+    def __init__(self, path):
+        self.path = path
+        size = os.path.getsize(path)
+        if size < HEADER.size + FOOTER.size:
+            raise ValueError(f"{path} não é um bag válido (ou a gravação não foi finalizada)")
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+
+        magic, meta_size = HEADER.unpack_from(self._data)
+        index_offset, count, end_magic = FOOTER.unpack_from(self._data, len(self._data) - FOOTER.size)
+        if magic != MAGIC or end_magic != MAGIC:
+            raise ValueError(f"{path} não é um bag válido (ou a gravação não foi finalizada)")
+
+        self.metadata = json.loads(bytes(self._data[HEADER.size:HEADER.size + meta_size]))
+        if count:
+            self.index = np.memmap(path, dtype=INDEX_DTYPE, mode='r', offset=index_offset, shape=(count,))
+        else:
+            self.index = np.empty(0, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def duration(self):
+        """Duração da gravação em segundos"""
+        if len(self.index) == 0:
+            return 0.0
+        return float(self.index['timestamp'][-1] - self.index['timestamp'][0])
+
+    def frames(self, stream):
+        """Posições no índice dos frames de um stream"""
+        return np.flatnonzero(self.index['stream'] == stream)
+
+    def read(self, i):
+        """Decodifica o frame i: profundidade (LiDAR) ou (cor, profundidade) (câmera)"""
+        record = self.index[i]
+        start, size = int(record['depth_offset']), int(record['depth_size'])
+        filtered = np.frombuffer(zlib.decompress(self._data[start:start + size]), dtype='<u2')
+        filtered = filtered.reshape(int(record['height']), int(record['width']))
+        depth = np.cumsum(filtered, axis=1, dtype=np.uint16)
+        if record['stream'] == LIDAR:
+            return depth
+
+        start, size = int(record['color_offset']), int(record['color_size'])
+        color = cv2.imdecode(self._data[start:start + size], cv2.IMREAD_COLOR) if size else None
+        return color, depth
@@ -0,0 +1,343 @@
+"""
+Protocolo serial binário Python ↔ Arduino (espelha arduino_robot_control.ino)
+- Frame de 11 bytes: 0xAA 0x55, tipo (u8), sequência (u8), velocidades
+  m1, m2, m3 (int16 little-endian) e CRC-8 (polinômio 0x07) do tipo até m3
+- Python → Arduino: comando de motores ou heartbeat; o Arduino responde a
+  cada um com um ACK (mesma sequência e as velocidades aplicadas) e para os
+  motores se ficar sem frames por mais de 500 ms
+- Python → Arduino: troca da taxa da serial (BAUD, m1 = taxa / 100); o
+  Arduino confirma com BAUD_ACK na taxa antiga e só então troca
+- O Arduino continua aceitando o formato texto "m1,m2,m3\\n" (bytes ASCII
+  nunca começam um frame binário), sem ACK nem watchdog
+- SerialCommandWriter escreve e lê em threads próprias: comandos repetidos
+  não são reenviados, rajadas são reduzidas ao valor mais recente e comandos
+  sem ACK são retransmitidos
+"""
+
+import struct
+import time
+from threading import Thread, Condition
+
+SYNC = b'\xaa\x55'
+
+# Tipos de frame
+MOTOR = 0x01  # Python → Arduino
+HEARTBEAT = 0x02  # Python → Arduino (mantém o watchdog do firmware satisfeito)
+BAUD = 0x03  # Python → Arduino (m1 = nova taxa / 100)
+ACK = 0x81  # Arduino → Python
+BAUD_ACK = 0x83  # Arduino → Python (m1 = taxa que passa a valer / 100)
+
+FRAME_KINDS = {MOTOR: 'binary', HEARTBEAT: 'heartbeat', BAUD: 'baud', ACK: 'ack', BAUD_ACK: 'baud_ack'}
+
+BOOT_BAUDRATE = 9600  # Taxa do firmware ao iniciar
+BAUD_RATES = (115200, 230400, 250000, 500000, 1000000)  # Taxas aceitas pelo firmware
+
+# Tipo, sequência e as três velocidades (cobertos pelo CRC)
+MOTOR_PAYLOAD = struct.Struct('<BBhhh')
+FRAME_SIZE = len(SYNC) + MOTOR_PAYLOAD.size + 1
+
+
+def _crc8_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+
+_CRC8_TABLE = _crc8_table()
+
+
+def crc8(data):
+    """CRC-8 (polinômio 0x07, valor inicial 0), o mesmo calculado pelo Arduino"""
+    crc = 0
+    for byte in data:
+        crc = _CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def encode_frame(kind, sequence, m1=0, m2=0, m3=0):
+    """Monta um frame binário de 11 bytes"""
+    payload = MOTOR_PAYLOAD.pack(kind, sequence & 0xFF, m1, m2, m3)
+    return SYNC + payload + bytes([crc8(payload)])
+
+
+def encode_motor_command(sequence, m1, m2, m3):
+    """Monta o frame binário de um comando de motores"""
+    return encode_frame(MOTOR, sequence, m1, m2, m3)
+
+
+def encode_baud_request(sequence, baudrate):
+    """Monta o frame que pede ao Arduino para trocar a taxa da serial"""
+    return encode_frame(BAUD, sequence, baudrate // 100)
+
+
+def encode_ascii_command(m1, m2, m3):
+    """Formato texto original ("m1,m2,m3\\n")"""
+    return f"{m1},{m2},{m3}\n".encode()
+
+
+def _constrain(speed):
+    return max(-255, min(255, speed))
+
+
+class FrameParser:
+    """Decodificador byte a byte, com a mesma máquina de estados do Arduino
+
+    feed() retorna os frames completos recebidos como (tipo, seq, m1, m2, m3):
+    tipo 'binary' (motores), 'heartbeat', 'baud', 'ack' ou 'baud_ack' para
+    frames válidos e 'ascii' (seq None) para linhas de texto.
+    """
+
+    def __init__(self):
+        self.errors = 0  # Frames com CRC inválido
+        self._state = 'sync1'
+        self._payload = bytearray()
+        self._line = bytearray()
+
+    def feed(self, data):
+        commands = []
+        for byte in data:
+            if self._state == 'sync1':
+                if byte == SYNC[0]:
+                    self._state = 'sync2'
+                else:
+                    command = self._feed_ascii(byte)
+                    if command:
+                        commands.append(command)
+            elif self._state == 'sync2':
+                if byte == SYNC[1]:
+                    self._state = 'payload'
+                    self._payload.clear()
+                elif byte != SYNC[0]:
+                    self._state = 'sync1'
+            elif self._state == 'payload':
+                self._payload.append(byte)
+                if len(self._payload) == MOTOR_PAYLOAD.size:
+                    self._state = 'crc'
+            else:
+                if byte == crc8(self._payload):
+                    kind, sequence, *speeds = MOTOR_PAYLOAD.unpack(self._payload)
+                    if kind in (BAUD, BAUD_ACK):
+                        commands.append((FRAME_KINDS[kind], sequence) + tuple(speeds))
+                    elif kind in FRAME_KINDS:
+                        commands.append((FRAME_KINDS[kind], sequence) + tuple(_constrain(v) for v in speeds))
+                else:
+                    self.errors += 1
+                self._state = 'sync1'
+        return commands
+
+    def _feed_ascii(self, byte):
+        if byte != ord('\n'):
+            self._line.append(byte)
+            return None
+        line, self._line = self._line.decode(errors='replace').strip(), bytearray()
+        parts = line.split(',')
+        if len(parts) != 3:
+            return None
+        try:
+            return ('ascii', None) + tuple(_constrain(int(p)) for p in parts)
+        except ValueError:
+            return None
+
+
+class SerialCommandWriter(Thread):
+    """Envia comandos de motores à serial em uma thread dedicada
+
+    - submit() nunca bloqueia: guarda o comando mais recente e acorda a thread;
+      comandos que chegam antes do anterior ser escrito o substituem
+    - Um comando igual ao último enviado não é reenviado
+    - Com `max_rate`, comandos novos são escritos no máximo max_rate vezes por
+      segundo (o pendente continua sendo substituído); parar nunca espera
+    - Protocolo binário: uma segunda thread lê os ACKs do Arduino e mede o
+      tempo de ida e volta; sem ACK em `ack_timeout`, o comando mais recente
+      é retransmitido. Sem comandos novos, um heartbeat é enviado a cada
+      `heartbeat_interval` (o firmware para os motores se eles cessarem)
+    - Protocolo texto (firmware antigo, sem ACK): o último comando é reenviado
+      a cada `refresh_interval` segundos
+    """
+
+    PROTOCOLS = ('binary', 'ascii')
+    MAX_MISSED_ACKS = 3  # ACKs perdidos seguidos para considerar o link com falha
+
+    def __init__(self, port, protocol='binary', heartbeat_interval=0.2, ack_timeout=0.1,
+                 refresh_interval=0.5, max_rate=None, metrics=None):
+        if protocol not in self.PROTOCOLS:
+            raise ValueError(f"Protocolo serial inválido: {protocol}")
+        super().__init__(name="serial-writer", daemon=True)
+        self.port = port  # Objeto serial.Serial (ou compatível: read/write/in_waiting)
+        self.protocol = protocol
+        self.heartbeat_interval = heartbeat_interval
+        self.ack_timeout = ack_timeout
+        self.refresh_interval = refresh_interval
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.metrics = metrics  # LatencyMetrics opcional
+        self.sent = 0
+        self.suppressed = 0  # Comandos iguais ao último enviado
+        self.coalesced = 0  # Comandos substituídos antes de serem escritos
+        self.acked = 0
+        self.retries = 0  # Retransmissões por falta de ACK
+        self.rtt = None  # Último tempo de ida e volta (ms)
+        self.motors = None  # Velocidades aplicadas, segundo o último ACK
+        self.link_ok = None  # None até o primeiro ACK (ou no protocolo texto)
+        self.failed = False
+        self.running = True
+        self._condition = Condition()
+        self._pending = None  # (m1, m2, m3, instante do submit)
+        self._last = None  # Último comando escrito
+        self._last_write = time.monotonic()
+        self._next_command_at = 0.0  # Limite de taxa: próximo comando novo
+        self._in_flight = None  # (sequência, instante da escrita) aguardando ACK
+        self._missed = 0
+        self._sequence = 0
+        self.start()
+
+        self._reader = None
+        if protocol == 'binary':
+            self._reader = Thread(target=self._read_acks, name="serial-reader", daemon=True)
+            self._reader.start()
+
+    def submit(self, m1, m2, m3):
+        """Agenda um comando; retorna False se a serial falhou"""
+        if self.failed:
+            return False
+        # Mesmo limite do firmware (o ACK traz os valores aplicados)
+        command = (_constrain(int(m1)), _constrain(int(m2)), _constrain(int(m3)))
+        with self._condition:
+            if self._pending is None and command == self._last:
+                self.suppressed += 1
+                return True
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = command + (time.perf_counter(),)
+            self._condition.notify()
+        return True
+
+    def status(self):
+        """Estado do link: contadores, último RTT e velocidades confirmadas"""
+        return {'protocol': self.protocol, 'sent': self.sent, 'acked': self.acked,
+                'retries': self.retries, 'suppressed': self.suppressed,
+                'coalesced': self.coalesced, 'rtt_ms': self.rtt,
+                'motors': self.motors, 'link_ok': self.link_ok}
+
+    def _next_timer(self):
+        """Instante da próxima retransmissão (sem ACK) ou heartbeat"""
+        if self._in_flight is not None:
+            return self._in_flight[1] + self.ack_timeout
+        if self.protocol == 'ascii':
+            return self._last_write + self.refresh_interval
+        return self._last_write + self.heartbeat_interval
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self.running and not self._pending_ready():
+                    now = time.monotonic()
+                    wake = self._next_timer()
+                    if wake <= now:
+                        break  # Timer vencido: escreve o pendente, se houver
+                    if self._pending is not None:
+                        wake = min(wake, self._next_command_at)
+                    self._condition.wait(wake - now)
+                pending, self._pending = self._pending, None
+                if pending is None:
+                    if not self.running:
+                        return
+                    pending = self._on_timer()
+                    if pending is None:
+                        continue
+            self._write(*pending)
+
+    def _pending_ready(self):
+        if self._pending is None:
+            return False
+        return self._pending[:3] == (0, 0, 0) or time.monotonic() >= self._next_command_at
+
+    def _on_timer(self):
+        """Retransmissão, heartbeat ou reenvio periódico; retorna o que escrever"""
+        if self._in_flight is not None:
+            self.retries += 1
+            self._missed += 1
+            if self._missed == self.MAX_MISSED_ACKS:
+                self.link_ok = False
+                print("✗ Arduino não confirma os comandos (verifique o cabo e o firmware)")
+        if self._last is None and self.protocol == 'ascii':
+            self._last_write = time.monotonic()
+            return None
+        if self._last is None or (self._in_flight is None and self.protocol == 'binary'):
+            return (None, None, None, time.perf_counter())  # Heartbeat
+        return self._last + (time.perf_counter(),)
+
+    def _write(self, m1, m2, m3, submitted):
+        heartbeat = m1 is None
+        if self.protocol == 'binary':
+            self._sequence = (self._sequence + 1) & 0xFF
+            if heartbeat:
+                data = encode_frame(HEARTBEAT, self._sequence)
+            else:
+                data = encode_motor_command(self._sequence, m1, m2, m3)
+        else:
+            data = encode_ascii_command(m1, m2, m3)
+        start = time.perf_counter()
+        if self.protocol == 'binary':
+            with self._condition:
+                # Antes da escrita: o ACK pode chegar antes de write() retornar
+                self._in_flight = (self._sequence, time.monotonic(), start)
+        try:
+            self.port.write(data)
+            if self.metrics and not heartbeat:
+                self.metrics.record_since('serial_write', start)
+                self.metrics.record_since('serial_queue', submitted)
+        except Exception as e:
+            print(f"✗ Erro ao enviar comando: {e}")
+            self.failed = True
+            self.running = False
+            return
+        with self._condition:
+            self._last_write = time.monotonic()
+            if not heartbeat:
+                self.sent += 1
+                self._last = (m1, m2, m3)
+                self._next_command_at = self._last_write + self.min_interval
+
+    def _read_acks(self):
+        parser = FrameParser()
+        while self.running:
+            try:
+                data = self.port.read(self.port.in_waiting or 1)
+            except Exception:
+                return
+            for kind, sequence, m1, m2, m3 in parser.feed(data):
+                if kind == 'ack':
+                    self._on_ack(sequence, (m1, m2, m3))
+
+    def _on_ack(self, sequence, motors):
+        with self._condition:
+            self.motors = motors
+            if self._in_flight is None or self._in_flight[0] != sequence:
+                return  # ACK atrasado de um frame já retransmitido
+            self.rtt = round((time.perf_counter() - self._in_flight[2]) * 1000, 3)
+            self._in_flight = None
+            self._missed = 0
+            self.acked += 1
+            if not self.link_ok:
+                if self.link_ok is False:
+                    print("✓ Arduino voltou a confirmar os comandos")
+                self.link_ok = True
+            if self._last is not None and motors != self._last and self._pending is None:
+                # Arduino reiniciou ou o watchdog parou os motores: reenvia o comando
+                self._pending = self._last + (time.perf_counter(),)
+                self._condition.notify()
+        if self.metrics:
+            self.metrics.record('serial_rtt', self.rtt)
+
+    def close(self):
+        """Escreve o comando pendente (ex.: parar) e encerra as threads"""
+        with self._condition:
+            self.running = False
+            self._condition.notify()
+        self.join(timeout=2)
+        if self._reader:
+            self._reader.join(timeout=2)
@@ -5,31 +5,32 @@ import { Input } from '@/components/ui/input';
 import { ArrowUp, ArrowDown, ArrowLeft, ArrowRight, Square } from 'lucide-react';
 
 interface DirectionalControlProps {
-  onSendCommand: (m1: number, m2: number, m3: number) => void;
+  // Velocidade das rodas calculada no servidor (motor_control.py), igual às outras interfaces
+  onMove: (direction: string, speed: number) => void;
 }
 
-const DirectionalControl = ({ onSendCommand }: DirectionalControlProps) => {
+const DirectionalControl = ({ onMove }: DirectionalControlProps) => {
   const [speed, setSpeed] = useState(180);
   const [activeDirection, setActiveDirection] = useState<string | null>(null);
 
   const moveForward = () => {
-    onSendCommand(0, -speed, speed);
+    onMove('forward', speed);
     setActiveDirection('forward');
   };
   const moveBackward = () => {
-    onSendCommand(0, speed, -speed);
+    onMove('backward', speed);
     setActiveDirection('backward');
   };
   const moveRight = () => {
-    onSendCommand(-speed, -speed, speed);
+    onMove('right', speed);
     setActiveDirection('right');
   };
   const moveLeft = () => {
-    onSendCommand(speed, -speed, speed);
+    onMove('left', speed);
     setActiveDirection('left');
   };
   const stop = () => {
-    onSendCommand(0, 0, 0);
+    onMove('stop', 0);
     setActiveDirection(null);
   };
 
@@ -149,11 +150,11 @@ const DirectionalControl = ({ onSendCommand }: DirectionalControlProps) => {
       </div>
 
       <div className="text-xs text-muted-foreground text-center space-y-1">
-        <p><strong>Comandos:</strong></p>
-        <p>Frente: M1=0, M2=-{speed}, M3={speed}</p>
-        <p>Trás: M1=0, M2={speed}, M3=-{speed}</p>
-        <p>Direita: M1=-{speed}, M2=-{speed}, M3={speed}</p>
-        <p>Esquerda: M1={speed}, M2=-{speed}, M3={speed}</p>
+        <p><strong>Comandos (roda mais rápida em {speed}):</strong></p>
+        <p>Frente: M1=0, M2={speed}, M3=-{speed}</p>
+        <p>Trás: M1=0, M2=-{speed}, M3={speed}</p>
+        <p>Direita: M1=-{speed}, M2={Math.round(speed / 2)}, M3={Math.round(speed / 2)}</p>
+        <p>Esquerda: M1={speed}, M2=-{Math.round(speed / 2)}, M3=-{Math.round(speed / 2)}</p>
       </div>
     </div>
   );
@@ -1,13 +1,9 @@
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { useEffect, useRef } from "react";
-
-interface Point3D {
-  points: number[][];
-  colors: number[][];
-}
+import type { PointCloudData } from "@/lib/streamProtocol";
 
 interface Map3DVisualizationProps {
-  pointCloud?: Point3D;
+  pointCloud?: PointCloudData;
 }
 
 const Map3DVisualization = ({ pointCloud }: Map3DVisualizationProps) => {
@@ -49,25 +45,24 @@ const Map3DVisualization = ({ pointCloud }: Map3DVisualizationProps) => {
       }
 
       // Desenha pontos 3D
-      if (pointCloud && pointCloud.points) {
+      if (pointCloud && pointCloud.count > 0) {
         const centerX = width / 2;
         const centerY = height / 2;
+        const { positions, colors, count } = pointCloud;
 
         // Ordena pontos por profundidade (z) para melhor visualização
-        const sortedPoints = pointCloud.points.map((point, i) => ({
-          point,
-          color: pointCloud.colors[i],
-          z: point[2]
-        })).sort((a, b) => b.z - a.z);
+        const order = Array.from({ length: count }, (_, i) => i)
+          .sort((a, b) => positions[b * 3 + 2] - positions[a * 3 + 2]);
 
-        sortedPoints.forEach(({ point, color }) => {
-          const [x, y, z] = point;
+        const cosX = Math.cos(rotationRef.current.x);
+        const sinX = Math.sin(rotationRef.current.x);
+        const cosY = Math.cos(rotationRef.current.y);
+        const sinY = Math.sin(rotationRef.current.y);
 
-          // Rotação simples
-          const cosX = Math.cos(rotationRef.current.x);
-          const sinX = Math.sin(rotationRef.current.x);
-          const cosY = Math.cos(rotationRef.current.y);
-          const sinY = Math.sin(rotationRef.current.y);
+        order.forEach((i) => {
+          const x = positions[i * 3];
+          const y = positions[i * 3 + 1];
+          const z = positions[i * 3 + 2];
 
           // Aplica rotação
           const y1 = y * cosX - z * sinX;
@@ -82,7 +77,7 @@ const Map3DVisualization = ({ pointCloud }: Map3DVisualizationProps) => {
 
           // Desenha ponto
           const size = Math.max(1, 3 * perspective);
-          ctx.fillStyle = `rgb(${color[0] * 255}, ${color[1] * 255}, ${color[2] * 255})`;
+          ctx.fillStyle = `rgb(${colors[i * 3]}, ${colors[i * 3 + 1]}, ${colors[i * 3 + 2]})`;
           ctx.beginPath();
           ctx.arc(screenX, screenY, size, 0, Math.PI * 2);
           ctx.fill();
@@ -56,7 +56,7 @@ export const SensorVisualization = ({ cameraImage, groundObstacles, heightObstac
         <div className="aspect-video bg-secondary rounded-lg overflow-hidden">
           {cameraImage ? (
             <img 
-              src={`data:image/jpeg;base64,${cameraImage}`} 
+              src={cameraImage} 
               alt="Camera feed"
               className="w-full h-full object-cover"
             />
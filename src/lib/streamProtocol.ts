@@ -0,0 +1,67 @@
+// Formatos binários das mensagens WebSocket (espelha stream_protocol.py)
+// Todo frame binário começa com um byte de tipo; valores em little-endian
+
+// 1 era a nuvem de pontos (substituída pelo mapa 3D): reservado
+export const VIDEO = 2;
+export const MAP_UPDATE = 3;
+
+const VIDEO_HEADER_SIZE = 12;
+const MAP_UPDATE_HEADER_SIZE = 24;
+const MAP_KEYFRAME = 0x01;
+
+export interface PointCloudData {
+  frameId: number;
+  count: number;
+  positions: Float32Array; // x, y, z em metros
+  colors: Uint8Array; // r, g, b (0-255)
+}
+
+export const binaryMessageType = (buffer: ArrayBuffer): number =>
+  new DataView(buffer).getUint8(0);
+
+const dequantize = (buffer: ArrayBuffer, offset: number, count: number, scale: number) => {
+  const quantized = new Int16Array(buffer, offset, count * 3);
+  const positions = new Float32Array(count * 3);
+  for (let i = 0; i < quantized.length; i++) {
+    positions[i] = quantized[i] * scale;
+  }
+  return positions;
+};
+
+// Vídeo: cabeçalho de 12 bytes seguido do JPEG (sem base64)
+export const decodeVideoFrame = (buffer: ArrayBuffer): Blob =>
+  new Blob([new Uint8Array(buffer, VIDEO_HEADER_SIZE)], { type: 'image/jpeg' });
+
+// Mapa 3D: keyframe (mapa completo) ou delta a partir de baseVersion
+export interface MapUpdate {
+  version: number;
+  baseVersion: number;
+  keyframe: boolean;
+  added: PointCloudData; // voxels novos ou alterados
+  removed: Float32Array; // centros dos voxels removidos (x, y, z)
+}
+
+export const decodeMapUpdate = (buffer: ArrayBuffer): MapUpdate => {
+  const view = new DataView(buffer);
+  const keyframe = (view.getUint8(1) & MAP_KEYFRAME) !== 0;
+  const version = view.getUint32(4, true);
+  const baseVersion = view.getUint32(8, true);
+  const scale = view.getFloat32(12, true);
+  const addedCount = view.getUint32(16, true);
+  const removedCount = view.getUint32(20, true);
+
+  let offset = MAP_UPDATE_HEADER_SIZE;
+  const positions = dequantize(buffer, offset, addedCount, scale);
+  offset += addedCount * 6;
+  const removed = dequantize(buffer, offset, removedCount, scale);
+  offset += removedCount * 6;
+  const colors = new Uint8Array(buffer, offset, addedCount * 3);
+
+  return {
+    version,
+    baseVersion,
+    keyframe,
+    added: { frameId: version, count: addedCount, positions, colors },
+    removed,
+  };
+};
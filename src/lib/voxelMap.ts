@@ -0,0 +1,53 @@
+import type { MapUpdate, PointCloudData } from "@/lib/streamProtocol";
+
+const voxelKey = (positions: Float32Array, i: number) =>
+  // Centros de voxel chegam sempre com a mesma quantização (mm)
+  `${Math.round(positions[i * 3] * 1000)},${Math.round(positions[i * 3 + 1] * 1000)},${Math.round(positions[i * 3 + 2] * 1000)}`;
+
+// Réplica local do mapa 3D do servidor: keyframes substituem o mapa e
+// deltas adicionam/removem voxels a partir da versão que o cliente já tem
+export class VoxelMapStore {
+  private voxels = new Map<string, number[]>();
+  private version = -1;
+
+  // Retorna false se o delta não se aplica à versão local (pedir ressincronização)
+  apply(update: MapUpdate): boolean {
+    if (update.keyframe) {
+      this.voxels.clear();
+    } else if (update.baseVersion !== this.version) {
+      return false;
+    }
+
+    // Remoções antes das adições: um voxel pode ter sido removido e visto de novo
+    for (let i = 0; i < update.removed.length / 3; i++) {
+      this.voxels.delete(voxelKey(update.removed, i));
+    }
+    const { positions, colors, count } = update.added;
+    for (let i = 0; i < count; i++) {
+      this.voxels.set(voxelKey(positions, i), [
+        positions[i * 3], positions[i * 3 + 1], positions[i * 3 + 2],
+        colors[i * 3], colors[i * 3 + 1], colors[i * 3 + 2],
+      ]);
+    }
+    this.version = update.version;
+    return true;
+  }
+
+  clear() {
+    this.voxels.clear();
+    this.version = -1;
+  }
+
+  toPointCloud(): PointCloudData {
+    const count = this.voxels.size;
+    const positions = new Float32Array(count * 3);
+    const colors = new Uint8Array(count * 3);
+    let i = 0;
+    this.voxels.forEach((voxel) => {
+      positions.set(voxel.slice(0, 3), i * 3);
+      colors.set(voxel.slice(3), i * 3);
+      i++;
+    });
+    return { frameId: this.version, count, positions, colors };
+  }
+}
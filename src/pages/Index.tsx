@@ -6,6 +6,15 @@ import { AutonomousControl } from "@/components/AutonomousControl";
 import Map3DVisualization from "@/components/Map3DVisualization";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { useToast } from "@/hooks/use-toast";
+import {
+  MAP_UPDATE,
+  VIDEO,
+  binaryMessageType,
+  decodeMapUpdate,
+  decodeVideoFrame,
+  type PointCloudData,
+} from "@/lib/streamProtocol";
+import { VoxelMapStore } from "@/lib/voxelMap";
 
 const Index = () => {
   const [lastCommand, setLastCommand] = useState<string>("");
@@ -14,18 +23,26 @@ const Index = () => {
   const [cameraImage, setCameraImage] = useState<string>();
   const [groundObstacles, setGroundObstacles] = useState<any>();
   const [heightObstacles, setHeightObstacles] = useState<any>();
-  const [pointCloud, setPointCloud] = useState<any>();
+  const [pointCloud, setPointCloud] = useState<PointCloudData>();
   const wsRef = useRef<WebSocket | null>(null);
+  const voxelMapRef = useRef(new VoxelMapStore());
+  const mapResyncPendingRef = useRef(false);
   const { toast } = useToast();
 
   // WebSocket connection
   useEffect(() => {
     const connectWebSocket = () => {
       const ws = new WebSocket('ws://localhost:8765');
+      ws.binaryType = 'arraybuffer';
       
       ws.onopen = () => {
         console.log('✓ Conectado ao servidor Python');
         setIsConnected(true);
+        // O servidor envia o mapa 3D completo (keyframe) para cada nova conexão
+        voxelMapRef.current.clear();
+        mapResyncPendingRef.current = false;
+        // O vídeo só é comprimido e enviado para clientes inscritos
+        ws.send(JSON.stringify({ type: 'subscribe', stream: 'video', enabled: true }));
         toast({
           title: "Conectado",
           description: "Conexão estabelecida com o sistema de sensores",
@@ -33,21 +50,38 @@ const Index = () => {
       };
       
       ws.onmessage = (event) => {
+        // Dados volumosos chegam em frames binários (ver stream_protocol.py)
+        if (event.data instanceof ArrayBuffer) {
+          const messageType = binaryMessageType(event.data);
+          if (messageType === MAP_UPDATE) {
+            const update = decodeMapUpdate(event.data);
+            if (voxelMapRef.current.apply(update)) {
+              if (update.keyframe) mapResyncPendingRef.current = false;
+              setPointCloud(voxelMapRef.current.toPointCloud());
+            } else if (!mapResyncPendingRef.current) {
+              // Delta fora de sequência: pede o mapa completo uma única vez
+              mapResyncPendingRef.current = true;
+              ws.send(JSON.stringify({ type: 'map_resync' }));
+            }
+          } else if (messageType === VIDEO) {
+            const url = URL.createObjectURL(decodeVideoFrame(event.data));
+            setCameraImage((previous) => {
+              if (previous) URL.revokeObjectURL(previous);
+              return url;
+            });
+          }
+          return;
+        }
+
         const data = JSON.parse(event.data);
         
         if (data.type === 'sensor_data') {
-          if (data.camera) {
-            setCameraImage(data.camera);
-          }
           if (data.ground_obstacles) {
             setGroundObstacles(data.ground_obstacles);
           }
           if (data.height_obstacles) {
             setHeightObstacles(data.height_obstacles);
           }
-          if (data.point_cloud) {
-            setPointCloud(data.point_cloud);
-          }
         }
       };
       
@@ -92,6 +126,13 @@ const Index = () => {
     }
   };
 
+  const handleMove = (direction: string, speed: number) => {
+    setLastCommand(`${direction} (${speed})`);
+    if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: 'move', direction, speed }));
+    }
+  };
+
   const handleToggleAutonomous = (enabled: boolean) => {
     setAutonomousMode(enabled);
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
@@ -167,7 +208,7 @@ const Index = () => {
         </TabsList>
         
         <TabsContent value="directional">
-          <DirectionalControl onSendCommand={handleSendCommand} />
+          <DirectionalControl onMove={handleMove} />
         </TabsContent>
         
         <TabsContent value="motor">
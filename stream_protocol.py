@@ -0,0 +1,81 @@
+"""
+Formatos binários das mensagens WebSocket (Python → Interface)
+- Todo frame binário começa com um byte de tipo
+- Inteiros e floats em little-endian
+- A telemetria continua em JSON; os dados volumosos vão em frames binários
+"""
+
+import struct
+import numpy as np
+
+# Tipos de frame binário (primeiro byte). O 1 era a nuvem de pontos, hoje
+# substituída pelas atualizações do mapa 3D: fica reservado para que uma
+# interface antiga não confunda outro formato com ela
+VIDEO = 2
+MAP_UPDATE = 3
+
+
+def _quantize(points, scale):
+    return np.clip(np.rint(points / scale), -32768, 32767).astype('<i2')
+
+
+def _rgb(colors):
+    if colors.dtype == np.uint8:
+        return np.ascontiguousarray(colors)
+    return np.clip(np.rint(colors * 255), 0, 255).astype(np.uint8)
+
+
+# Vídeo: tipo (u8), 3 bytes de preenchimento, id do frame (u32), largura e
+# altura (u16). Seguem os bytes do JPEG, sem base64.
+VIDEO_HEADER = struct.Struct('<BxxxIHH')
+
+
+def encode_video_frame(jpeg, frame_id, width, height):
+    """Monta um frame de vídeo a partir de um JPEG já comprimido"""
+    return VIDEO_HEADER.pack(VIDEO, frame_id & 0xFFFFFFFF, width, height) + bytes(jpeg)
+
+
+def decode_video_frame(data):
+    """Decodifica um frame de vídeo; retorna (frame_id, width, height, jpeg)"""
+    kind, frame_id, width, height = VIDEO_HEADER.unpack_from(data)
+    if kind != VIDEO:
+        raise ValueError(f"Frame binário não é de vídeo: tipo {kind}")
+    return frame_id, width, height, bytes(data[VIDEO_HEADER.size:])
+
+
+# Atualização do mapa 3D: tipo (u8), flags (u8, bit 0 = keyframe), 2 bytes de
+# preenchimento, versão do mapa (u32), versão base (u32), escala (f32), nº de
+# voxels adicionados/alterados (u32) e removidos (u32). O cabeçalho tem 24
+# bytes; seguem A x (x, y, z) int16 adicionados, R x (x, y, z) int16
+# removidos e A x (r, g, b) uint8.
+# Um keyframe substitui o mapa inteiro; um delta só vale para um cliente que
+# está exatamente na versão base (senão ele pede uma ressincronização).
+MAP_UPDATE_HEADER = struct.Struct('<BBxxIIfII')
+MAP_KEYFRAME = 0x01
+
+
+def encode_map_update(version, base_version, added, colors, removed, keyframe=False, scale=0.001):
+    """Codifica um keyframe ou delta do mapa 3D (centros dos voxels em metros)"""
+    flags = MAP_KEYFRAME if keyframe else 0
+    header = MAP_UPDATE_HEADER.pack(MAP_UPDATE, flags, version & 0xFFFFFFFF,
+                                    base_version & 0xFFFFFFFF, scale, len(added), len(removed))
+    return header + _quantize(added, scale).tobytes() + _quantize(removed, scale).tobytes() \
+        + _rgb(colors).tobytes()
+
+
+def decode_map_update(data):
+    """Decodifica uma atualização do mapa 3D
+    
+    Retorna (version, base_version, keyframe, added, colors, removed).
+    """
+    kind, flags, version, base_version, scale, n_added, n_removed = MAP_UPDATE_HEADER.unpack_from(data)
+    if kind != MAP_UPDATE:
+        raise ValueError(f"Frame binário não é uma atualização do mapa: tipo {kind}")
+    offset = MAP_UPDATE_HEADER.size
+    added = np.frombuffer(data, dtype='<i2', count=n_added * 3, offset=offset)
+    offset += n_added * 6
+    removed = np.frombuffer(data, dtype='<i2', count=n_removed * 3, offset=offset)
+    offset += n_removed * 6
+    rgb = np.frombuffer(data, dtype=np.uint8, count=n_added * 3, offset=offset)
+    return (version, base_version, bool(flags & MAP_KEYFRAME),
+            added.reshape(-1, 3) * scale, rgb.reshape(-1, 3).copy(), removed.reshape(-1, 3) * scale)
@@ -0,0 +1,68 @@
+"""Abertura da porta do Arduino: espera do firmware, negociação da taxa e conexões por porta"""
+
+import time
+from threading import Thread
+
+import pytest
+
+import arduino_connection
+from arduino_connection import open_arduino, negotiate_baudrate
+from fake_arduino import FakeArduino
+from serial_protocol import BOOT_BAUDRATE
+
+
+@pytest.fixture
+def arduino():
+    fake = FakeArduino(boot_time=0.05)
+    yield fake
+    fake.close()
+
+
+def test_open_negotiates_baud_rate(arduino):
+    port = open_arduino(arduino.port, 115200)
+    try:
+        assert port.baudrate == 115200 and arduino.baudrate == 115200
+        # Segundo pedido na mesma taxa: nada a negociar
+        assert negotiate_baudrate(port, 115200) == 115200
+        with pytest.raises(ValueError):
+            negotiate_baudrate(port, 12345)
+    finally:
+        port.close()
+
+
+def test_boot_baudrate_skips_negotiation(arduino):
+    port = open_arduino(arduino.port, BOOT_BAUDRATE)
+    try:
+        assert port.baudrate == BOOT_BAUDRATE and arduino.baudrate == BOOT_BAUDRATE
+    finally:
+        port.close()
+
+
+def test_slow_port_does_not_block_other_ports():
+    slow, fast = FakeArduino(boot_time=1.0), None
+    opened = []
+    try:
+        # Dois usuários da porta lenta: esperam a mesma abertura e dividem a conexão
+        threads = [Thread(target=lambda: opened.append(arduino_connection.connect(slow.port))) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+
+        fast = FakeArduino(boot_time=0.05)  # Abrir a porta descarta o que chegou antes
+        started = time.monotonic()
+        opened.append(arduino_connection.connect(fast.port))
+        assert time.monotonic() - started < 0.5
+        assert opened[0].baudrate == arduino_connection.DEFAULT_BAUDRATE
+
+        for thread in threads:
+            thread.join(timeout=5)
+        slow_connections = [c for c in opened if c.port == slow.port]
+        assert len(slow_connections) == 2 and slow_connections[0] is slow_connections[1]
+        assert slow_connections[0].users == 2
+    finally:
+        for connection in opened:
+            arduino_connection.release(connection)
+        slow.close()
+        if fast:
+            fast.close()
+    assert arduino_connection._connections == {}
@@ -0,0 +1,71 @@
+"""Fila de envio por cliente do servidor WebSocket: mensagens adiadas e fim do escritor"""
+
+import asyncio
+
+import pytest
+from websockets.exceptions import ConnectionClosed
+
+rac = pytest.importorskip('robot_autonomous_control', exc_type=ImportError)
+
+
+class FakeWebSocket:
+    def __init__(self, fail_after=None):
+        self.sent = []
+        self.fail_after = fail_after  # Envios até a conexão cair
+        self.closed = False
+
+    async def send(self, payload):
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise ConnectionClosed(None, None)
+        self.sent.append(payload)
+
+    async def close(self):
+        self.closed = True
+
+
+async def drain():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_failing_deferred_payload_is_skipped():
+    async def scenario():
+        ws, closed = FakeWebSocket(), []
+        channel = rac.ClientChannel(ws, on_close=closed.append)
+        channel.push(lambda: 1 / 0, stream='map')
+        channel.push('depois')
+        await drain()
+        channel.close()
+        return ws, closed
+
+    ws, closed = asyncio.run(scenario())
+    assert ws.sent == ['depois']
+    assert closed == []  # close() explícito não avisa o servidor
+
+
+def test_writer_exit_reports_channel():
+    async def scenario():
+        ws, closed = FakeWebSocket(fail_after=1), []
+        channel = rac.ClientChannel(ws, on_close=closed.append)
+        channel.push('a')
+        channel.push('b')
+        await drain()
+        return ws, closed, channel
+
+    ws, closed, channel = asyncio.run(scenario())
+    assert ws.sent == ['a']
+    assert closed == [channel]
+
+
+def test_stream_keeps_only_latest():
+    async def scenario():
+        ws = FakeWebSocket()
+        channel = rac.ClientChannel(ws)
+        for i in range(3):
+            channel.push(str(i), stream='sensor_data')
+        await drain()
+        channel.close()
+        return ws, channel
+
+    ws, channel = asyncio.run(scenario())
+    assert ws.sent == ['2'] and channel.coalesced == 2
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from costmap import Costmap, LETHAL, INSCRIBED
+
+
+def random_updates(count, size=6.0, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        source = ('lidar', 'camera')[rng.integers(2)]
+        center = rng.uniform(-size / 2, size / 2, 2)
+        yield source, center + rng.normal(0.0, 0.3, (int(rng.integers(0, 200)), 2))
+
+
+def test_incremental_inflation_matches_full_grid():
+    incremental = Costmap(full_fraction=np.inf)
+    reference = Costmap(full_fraction=0)
+    for source, points in random_updates(50):
+        incremental.update(source, points)
+        reference.update(source, points)
+        assert np.array_equal(incremental.occupied, reference.occupied)
+        np.testing.assert_allclose(incremental.distance, reference.distance, rtol=0, atol=1e-6)
+
+
+def test_mark_matches_cells_of_and_drops_points_outside():
+    costmap = Costmap()
+    points = np.random.default_rng(1).uniform(-4.0, 4.0, (2000, 2))
+    expected = np.zeros_like(costmap.occupied)
+    expected[costmap.cells_of(points)] = True
+    costmap.update('lidar', points)
+    assert np.array_equal(costmap.occupied, expected)
+
+
+def test_cost_levels():
+    costmap = Costmap()
+    costmap.update('lidar', np.array([[1.0, 0.0]]))
+    cost = costmap.cost
+    row, col = costmap.center + 20, costmap.center
+    assert cost[row, col] == LETHAL
+    assert cost[row - 2, col] == INSCRIBED
+    assert cost[costmap.center, costmap.center] == 0
+
+
+def test_stale_layer_expires_as_unknown():
+    costmap = Costmap(max_age=0.1)
+    costmap.update('lidar', np.array([[1.0, 0.0]]), stamp=10.0)
+    costmap.update('camera', np.array([[0.0, 1.0]]), stamp=10.0)
+    assert costmap.expire(10.05) == []
+
+    costmap.update('lidar', np.array([[1.0, 0.0]]), stamp=10.2)
+    assert costmap.expire(10.2) == ['camera']
+    assert costmap.unknown == {'camera'}
+    assert costmap.occupied.sum() == 1  # Obstáculo da câmera saiu do mapa
+    assert costmap.expire(10.25) == []  # Avisa uma vez só
+
+    costmap.update('camera', np.array([[0.0, 1.0]]), stamp=10.3)
+    assert not costmap.unknown
+
+
+@pytest.mark.parametrize('planner', [False, True])
+def test_navigator_stops_with_unknown_layer(planner):
+    pytest.importorskip('pyrealsense2', exc_type=ImportError)
+    from robot_autonomous_control import ObstacleDetector, AutonomousNavigator
+    from local_planner import DynamicWindowPlanner
+
+    costmap = Costmap()
+    navigator = AutonomousNavigator(ObstacleDetector(), costmap=costmap,
+                                    planner=DynamicWindowPlanner(costmap) if planner else None)
+    costmap.update('camera', np.empty((0, 2)), stamp=0.0)
+    assert navigator.decide_velocity(None, None)[0] > 0
+    costmap.expire(1.0)
+    assert navigator.decide_velocity(None, None) == (0.0, 0.0, 0.0)
+    assert navigator.current_state == 'blocked'
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from depth_filters import decimate, fill_holes
+
+
+@pytest.mark.parametrize('factor', [2, 3, 4])
+@pytest.mark.parametrize('shape', [(768, 1024), (241, 425)])
+def test_decimate_is_block_minimum_of_valid_pixels(shape, factor):
+    rng = np.random.default_rng(factor)
+    depth = rng.integers(1, 65535, shape, dtype=np.uint16)
+    depth[rng.random(shape) < 0.5] = 0
+    depth[:factor, :factor] = 0  # Bloco sem pixels válidos
+
+    height, width = shape[0] // factor * factor, shape[1] // factor * factor
+    blocks = depth[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    expected = np.where(blocks > 0, blocks, 65536).min(axis=(1, 3))
+    expected[expected == 65536] = 0
+
+    result = decimate(depth, factor)
+    assert result.dtype == np.uint16
+    assert np.array_equal(result, expected)
+    assert result[0, 0] == 0
+
+
+def test_decimate_keeps_thin_obstacle():
+    depth = np.full((8, 8), 3000, dtype=np.uint16)
+    depth[:, 3] = 500  # Poste de um pixel de largura
+    assert (decimate(depth, 2)[:, 1] == 500).all()
+
+
+def test_fill_holes_never_farther_than_neighbours():
+    depth = np.array([[1000, 0, 2000]], dtype=np.uint16)
+    assert fill_holes(depth).tolist() == [[1000, 1000, 2000]]
@@ -0,0 +1,124 @@
+"""Reconexão dos sensores com o backend simulado (FakeRealSense), sem hardware"""
+
+import time
+from threading import Thread
+
+import pytest
+
+from device_manager import DeviceManager
+from fake_realsense import FakeRealSense
+
+LIDAR = 'f0000515'
+CAMERA = '00000435'
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class FakeGrabber(Thread):
+    """Mesmo contrato do FrameGrabber com o DeviceManager: attach/detach, failures e on_error"""
+
+    def __init__(self, name, timeout_ms=50):
+        super().__init__(name=f"grabber-{name}", daemon=True)
+        self.sensor_name = name
+        self.timeout_ms = timeout_ms
+        self.pipeline = None
+        self.failures = 0
+        self.frames = 0
+        self.on_error = None
+        self.running = True
+        self.start()
+
+    def attach(self, pipeline):
+        self.failures = 0
+        self.pipeline = pipeline
+
+    def detach(self):
+        self.pipeline = None
+
+    def run(self):
+        while self.running:
+            pipeline = self.pipeline
+            if pipeline is None:
+                time.sleep(0.005)
+                continue
+            try:
+                pipeline.wait_for_frames(timeout_ms=self.timeout_ms)
+            except RuntimeError as e:
+                if self.running and pipeline is self.pipeline:
+                    self.failures += 1
+                    if self.on_error:
+                        self.on_error(e)
+                continue
+            self.failures = 0
+            self.frames += 1
+
+
+@pytest.fixture
+def rig():
+    backend = FakeRealSense(start_time=0.01)
+    manager = DeviceManager(backend, backoff=0.05, max_backoff=2.0, failures=3)
+    grabbers = {'lidar': FakeGrabber('LiDAR'), 'camera': FakeGrabber('câmera')}
+    manager.add('lidar', LIDAR, grabbers['lidar'])
+    manager.add('camera', CAMERA, grabbers['camera'])
+    assert manager.start()
+    yield backend, manager, grabbers
+    manager.stop()
+    for grabber in grabbers.values():
+        grabber.running = False
+
+
+def test_unplug_and_replug(rig):
+    backend, manager, grabbers = rig
+    camera = manager.slots['camera']
+    assert wait_until(lambda: grabbers['camera'].frames > 0)
+
+    backend.unplug(CAMERA)
+    assert wait_until(lambda: not camera.connected)
+    assert camera.disconnects == 1 and grabbers['camera'].pipeline is None
+    # O outro sensor não é afetado
+    lidar_frames = grabbers['lidar'].frames
+    assert wait_until(lambda: grabbers['lidar'].frames > lidar_frames + 3)
+    assert manager.slots['lidar'].connected
+
+    backend.plug(CAMERA)
+    assert wait_until(lambda: camera.connected)
+    frames = grabbers['camera'].frames
+    assert wait_until(lambda: grabbers['camera'].frames > frames)
+    assert camera.reconnects == 1 and camera.status() == 'ok'
+    assert backend.queries == 0  # Reabre pelo serial, sem reenumerar
+
+
+def test_hang_detected_after_configured_failures(rig):
+    backend, manager, grabbers = rig
+    lidar = manager.slots['lidar']
+    starts = backend.starts
+    backend.hang(LIDAR)  # Continua listado, sem frames (nenhum evento)
+    assert wait_until(lambda: grabbers['lidar'].failures == 2)
+    assert lidar.disconnects == 0  # Ainda abaixo do limite de 3 falhas
+    # Na terceira falha o sensor é dado como perdido; reiniciar o pipeline o destrava
+    assert wait_until(lambda: lidar.reconnects == 1)
+    assert lidar.disconnects == 1 and backend.starts == starts + 1
+    frames = grabbers['lidar'].frames
+    assert wait_until(lambda: grabbers['lidar'].frames > frames)
+
+
+def test_device_added_event_skips_backoff(rig):
+    backend, manager, grabbers = rig
+    camera = manager.slots['camera']
+    backend.unplug(CAMERA)
+    # Tentativas em 0,05 + 0,1 + 0,2 s: a espera seguinte já é de 0,4 s
+    assert wait_until(lambda: camera.attempts >= 3)
+    attempts = camera.attempts
+    time.sleep(0.01)
+    plugged = time.monotonic()
+    backend.plug(CAMERA)
+    assert wait_until(lambda: camera.connected and camera.attempts == 0)
+    assert time.monotonic() - plugged < 0.15
+    assert attempts >= 3 and camera.reconnects == 1
@@ -0,0 +1,56 @@
+"""Pareamento dos frames do LiDAR e da câmera pelo instante de captura"""
+
+from frame_sync import Frame, FramePairer
+
+
+def frames(times, start=1):
+    return [Frame(start + i, t, None, t, start + i) for i, t in enumerate(times)]
+
+
+def test_pairs_nearest_frame_of_the_other_sensor():
+    pairer = FramePairer(tolerance=0.02)
+    lidar = frames([0.000, 0.033, 0.066])
+    camera = frames([0.010, 0.045])
+    bundle = pairer.pair(lidar, camera)
+    # Câmera é a atrasada: o LiDAR mais próximo do seu frame mais novo
+    assert bundle.lidar.sync_time == 0.033 and bundle.camera.sync_time == 0.045
+    assert abs(bundle.skew - 0.012) < 1e-9 and bundle.paired
+
+
+def test_nothing_new_returns_none():
+    pairer = FramePairer()
+    lidar, camera = frames([0.0, 0.033]), frames([0.030])
+    assert pairer.pair(lidar, camera) is not None
+    assert pairer.pair(lidar, camera) is None
+
+
+def test_stalled_sensor_does_not_hold_back_the_other():
+    pairer = FramePairer(tolerance=0.02)
+    camera = frames([0.030])  # Câmera parou depois deste frame
+    lidar = frames([0.0, 0.033])
+    pairer.pair(lidar, camera)
+    for i in range(2, 6):
+        lidar = lidar[-7:] + frames([0.033 * i], start=len(lidar) + 1)
+        bundle = pairer.pair(lidar, camera)
+        # O par mais próximo (já usado) ainda está no histórico: o LiDAR segue sozinho
+        assert bundle.lidar is lidar[-1] and bundle.camera is None
+
+
+def test_out_of_tolerance_keeps_only_newest_sensor():
+    pairer = FramePairer(tolerance=0.02)
+    bundle = pairer.pair(frames([1.0]), frames([0.5]))
+    assert bundle.lidar is not None and bundle.camera is None and not bundle.paired
+    assert pairer.unpaired == 1
+
+
+def test_missing_sensor_still_yields_bundles():
+    pairer = FramePairer()
+    bundle = pairer.pair([], frames([0.1]))
+    assert bundle.camera.sync_time == 0.1 and bundle.lidar is None
+
+
+def test_skipped_frames_are_counted():
+    pairer = FramePairer()
+    pairer.pair(frames([0.0]), frames([0.0]))
+    pairer.pair(frames([0.033, 0.066, 0.1], start=2), frames([0.1], start=4))
+    assert pairer.skipped == {'lidar': 2, 'camera': 2}
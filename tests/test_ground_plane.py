@@ -0,0 +1,95 @@
+"""Plano do chão da câmera: o ajuste segue o chão e não aceita paredes, caixas ou degraus"""
+
+import numpy as np
+import pytest
+
+from ground_plane import GroundPlaneEstimator, camera_floor_plane
+
+
+class Intrinsics:
+    """Pinhole mínimo com a interface usada pelo estimador (ray_table, depth_scale)"""
+
+    depth_scale = 0.001
+
+    def __init__(self, width=160, height=120, focal=100.0):
+        self.width, self.height, self.focal = width, height, focal
+
+    def ray_table(self, stride=1):
+        u = np.arange(0, self.width, stride, dtype=np.float64)
+        v = np.arange(0, self.height, stride, dtype=np.float64)
+        shape = (len(v), len(u))
+        return (np.broadcast_to((u - self.width / 2) / self.focal, shape).copy(),
+                np.broadcast_to(((v - self.height / 2) / self.focal)[:, None], shape).copy())
+
+
+INTRINSICS = Intrinsics()
+
+
+def scene(camera_height=0.3, camera_pitch=10.0, floor=True, box=None, wall=None, seed=0):
+    """Profundidade (uint16) de chão, caixa (distância, altura) no terço central e/ou parede"""
+    normal, d = camera_floor_plane(camera_height, np.radians(camera_pitch))
+    forward = np.array((0.0, 0.0, 1.0)) - normal[2] * normal
+    forward /= np.linalg.norm(forward)
+    x_ray, y_ray = INTRINSICS.ray_table(1)
+    up = normal[0] * x_ray + normal[1] * y_ray + normal[2]
+    ahead = forward[0] * x_ray + forward[1] * y_ray + forward[2]
+    third = INTRINSICS.width // 3
+    surfaces = ([(wall, np.inf, slice(None))] if wall else []) + ([(*box, slice(third, 2 * third))] if box else [])
+    with np.errstate(divide='ignore'):
+        z = np.where(up < 0, -d / up, np.inf) if floor else np.full(up.shape, np.inf)
+        for distance, top, columns in surfaces:
+            hit = np.where(ahead > 0, distance / ahead, np.inf)
+            height = hit * up + d
+            inside = (height <= top) & (hit < z) & ((height >= 0) if floor else True)
+            inside[:, :columns.start or 0] = False
+            inside[:, columns.stop or INTRINSICS.width:] = False
+            z = np.where(inside, hit, z)
+    z = z + np.random.default_rng(seed).normal(0, 0.003, z.shape)
+    return np.where(np.isfinite(z) & (z < 8), np.rint(z / INTRINSICS.depth_scale), 0).astype(np.uint16)
+
+
+def estimator(**options):
+    # Montagem aproximada: a câmera real está 2° mais inclinada
+    return GroundPlaneEstimator(camera_height=0.3, camera_pitch=8.0, stride=4, **options)
+
+
+def test_floor_only_frame_fits_the_floor():
+    ground = estimator()
+    ground.update(scene(), INTRINSICS)
+    assert ground.fits == 1
+    assert ground.camera_height == pytest.approx(0.3, abs=0.005)
+    assert ground.camera_pitch == pytest.approx(10.0, abs=0.5)
+
+
+def test_box_on_the_floor_does_not_move_the_plane():
+    ground = estimator()
+    ground.update(scene(box=(0.6, 0.2)), INTRINSICS)
+    assert ground.fits == 1
+    assert ground.camera_height == pytest.approx(0.3, abs=0.005)
+    assert ground.camera_pitch == pytest.approx(10.0, abs=0.5)
+
+
+def test_wall_only_frame_keeps_the_last_floor():
+    ground = estimator()
+    ground.update(scene(), INTRINSICS)
+    plane = ground.plane
+    ground.update(scene(floor=False, wall=0.6), INTRINSICS)
+    assert ground.fits == 1 and ground.rejected == 1
+    assert np.array_equal(ground.plane[0], plane[0]) and ground.plane[1] == plane[1]
+
+
+def test_surface_far_from_mounting_height_is_rejected():
+    # Degrau de 15 cm ocupando a vista: inclinação certa, mas na altura errada
+    ground = estimator()
+    ground.update(scene(camera_height=0.15), INTRINSICS)
+    assert ground.fits == 0 and ground.rejected == 1
+    assert ground.camera_height == pytest.approx(0.3)
+
+
+def test_fit_with_few_inliers_among_candidates_is_rejected():
+    # Com a caixa, ~13% dos candidatos ficam fora do chão
+    ground = estimator(min_inlier_fraction=0.95)
+    ground.update(scene(box=(0.6, 0.2)), INTRINSICS)
+    assert ground.fits == 0 and ground.rejected == 1
+    ground.update(scene(), INTRINSICS)
+    assert ground.fits == 1
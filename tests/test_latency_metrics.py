@@ -0,0 +1,42 @@
+"""Métricas de latência: percentis por estágio e registro vindo de várias threads"""
+
+from threading import Thread
+
+from latency_metrics import LatencyMetrics, LatencyHistogram, STAGES
+
+
+def test_histogram_keeps_last_samples():
+    histogram = LatencyHistogram(size=4)
+    for ms in (100, 100, 1, 2, 3, 4):
+        histogram.record(ms)
+    summary = histogram.summary()
+    assert summary['count'] == 6 and summary['max'] == 4
+
+
+def test_summary_follows_pipeline_order():
+    metrics = LatencyMetrics()
+    for stage in ('custom', 'broadcast', 'acquire'):
+        metrics.record(stage, 1.0)
+    assert list(metrics.summary()) == ['acquire', 'broadcast', 'custom']
+    assert metrics.log_line().startswith("⏱ Latência")
+
+
+def test_new_stages_from_other_threads_while_summarizing():
+    metrics = LatencyMetrics(size=16)
+    stages = list(STAGES) + [f'extra_{i}' for i in range(200)]
+
+    def writer():
+        for stage in stages:
+            metrics.record(stage, 1.0)
+
+    threads = [Thread(target=writer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    # Sem o lock, inserir um estágio durante a iteração levanta RuntimeError
+    while any(thread.is_alive() for thread in threads):
+        metrics.log_line()
+    for thread in threads:
+        thread.join()
+    summary = metrics.summary()
+    assert len(summary) == len(stages)
+    assert all(s['count'] == 4 for s in summary.values())
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from costmap import Costmap, INSCRIBED
+from local_planner import DynamicWindowPlanner
+
+
+def wall(x, y_from, y_to):
+    ys = np.arange(y_from, y_to + 1e-9, 0.02)
+    return np.column_stack([np.full_like(ys, x), ys])
+
+
+def clutter(seed, count=40):
+    # Obstáculos espalhados, deixando livre o disco do robô
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(-2.5, 2.5, (count * 3, 2))
+    return points[np.hypot(*points.T) > 0.4][:count]
+
+
+@pytest.mark.parametrize('side', [1.0, -1.0])
+def test_blocked_front_turns_in_place_to_free_side(side):
+    costmap = Costmap()
+    # Parede a 25 cm: qualquer avanço colide; o lado `side` fica um pouco mais livre
+    costmap.update('lidar', wall(0.25, -1.5, 0.0) * [1.0, side])
+    planner = DynamicWindowPlanner(costmap)
+    velocity = (0.0, 0.0, 0.0)
+    for _ in range(3):
+        velocity = planner.plan(velocity)
+        vx, vy, omega = velocity
+        assert vx == 0.0 and vy == 0.0
+        assert omega * side > 0 and planner.best_score is not None
+
+
+def test_wall_across_the_whole_view_still_turns():
+    costmap = Costmap()
+    costmap.update('lidar', wall(0.25, -1.5, 1.5))
+    planner = DynamicWindowPlanner(costmap)
+    vx, vy, omega = planner.plan((0.0, 0.0, 0.0))
+    assert (vx, vy) == (0.0, 0.0) and omega != 0.0
+
+
+@pytest.mark.parametrize('velocity', [(0.0, 0.0, 0.0), (0.3, 0.0, 0.0), (0.15, 0.1, -0.8), (0.05, -0.15, 1.2)])
+@pytest.mark.parametrize('seed', range(5))
+def test_chosen_velocity_stays_in_acceleration_window(velocity, seed):
+    costmap = Costmap()
+    costmap.update('lidar', clutter(seed))
+    planner = DynamicWindowPlanner(costmap)
+    chosen = np.array(planner.plan(velocity))
+    if not chosen.any():
+        return  # Parar é sempre permitido
+    limits = np.array([planner.max_accel, planner.max_accel, planner.max_angular_accel]) * planner.window
+    assert np.all(np.abs(chosen - velocity) <= limits + 1e-9)
+    assert 0.0 <= chosen[0] <= planner.max_speed and abs(chosen[2]) <= planner.max_turn
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_never_selects_trajectory_through_inflated_cell(seed):
+    costmap = Costmap()
+    # Obstáculo logo à frente: seguir reto a 0,3 m/s atravessa a inflação
+    costmap.update('lidar', np.vstack((clutter(seed), [[0.6, 0.0]])))
+    planner = DynamicWindowPlanner(costmap)
+    cost = costmap.cost
+    velocity = (0.3, 0.0, 0.0)
+    for _ in range(5):
+        velocity = planner.plan(velocity)
+        x, y, _ = planner.rollout(np.array([velocity]))
+        cells = costmap.cells_of(np.column_stack((x[0], y[0])))
+        assert np.all(cost[cells] < INSCRIBED)
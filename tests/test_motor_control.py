@@ -0,0 +1,145 @@
+"""Núcleo de controle dos motores: cinemática da base omni e conexão compartilhada por porta"""
+
+import time
+
+import numpy as np
+import pytest
+
+import arduino_connection
+from fake_arduino import FakeArduino
+from latency_metrics import LatencyMetrics
+from motor_control import (MotorControl, VelocityRamp, DIRECTIONS, WHEEL_DIRECTIONS, BASE_RADIUS, wheel_speeds,
+                           motion_command, direction_command, velocity_command)
+
+
+def forward_kinematics(wheels):
+    """(vx, vy, ω) a partir das velocidades das rodas (inversa de wheel_speeds)"""
+    matrix = np.column_stack((WHEEL_DIRECTIONS, np.full(3, BASE_RADIUS)))
+    return np.linalg.solve(matrix, wheels)
+
+
+@pytest.mark.parametrize('velocity', [(0.3, 0.0, 0.0), (0.0, -0.2, 0.0), (0.1, 0.1, 0.5), (0.0, 0.0, -1.0)])
+def test_wheel_speeds_invert(velocity):
+    np.testing.assert_allclose(forward_kinematics(wheel_speeds(*velocity)), velocity, atol=1e-12)
+
+
+def test_pure_rotation_drives_all_wheels_equally():
+    wheels = wheel_speeds(0.0, 0.0, 2.0)
+    np.testing.assert_allclose(wheels, 2.0 * BASE_RADIUS)
+
+
+@pytest.mark.parametrize('direction', [d for d in DIRECTIONS if d != 'stop'])
+def test_direction_command_peaks_at_speed(direction):
+    command = direction_command(direction, 200)
+    assert max(abs(m) for m in command) == 200
+    # A direção do movimento é a pedida
+    moved = forward_kinematics(np.array(command, dtype=float))
+    expected = np.array(DIRECTIONS[direction])
+    assert np.dot(moved, expected) > 0
+    np.testing.assert_allclose(np.cross(moved, expected), 0, atol=1e-2 * np.linalg.norm(moved))
+
+
+def test_motion_command_sums_directions():
+    """Teclas combinadas: frente + esquerda anda na diagonal"""
+    vx, vy, omega = (sum(DIRECTIONS[d][i] for d in ('forward', 'left')) for i in range(3))
+    moved = forward_kinematics(np.array(motion_command(vx, vy, omega, 255), dtype=float))
+    assert moved[0] == pytest.approx(moved[1], rel=0.02)
+    assert abs(moved[2]) < 1e-2 * moved[0]
+
+
+def test_stop_and_opposites():
+    assert direction_command('stop', 255) == (0, 0, 0)
+    assert motion_command(1.0, 0.0, 0.0, 0) == (0, 0, 0)
+    assert direction_command('left', 100) == tuple(-m for m in direction_command('right', 100))
+
+
+def test_velocity_command_saturates_proportionally():
+    slow = velocity_command(0.1, 0.0, 0.0)
+    fast = velocity_command(10.0, 0.0, 0.0)
+    assert max(abs(m) for m in fast) == 255
+    # Mesma direção: as rodas mantêm a proporção
+    np.testing.assert_allclose(np.array(fast) / 255, np.array(slow) / max(abs(m) for m in slow), atol=0.01)
+
+
+@pytest.fixture
+def arduino():
+    fake = FakeArduino(boot_time=0.05)
+    yield fake
+    fake.close()
+
+
+def test_pooled_port_shares_one_writer(arduino):
+    first, second = MotorControl(), MotorControl()
+    first.connect(arduino.port)
+    second.connect(arduino.port)
+    try:
+        assert first.connection is second.connection
+        assert first.writer is second.writer
+        for i in range(20):
+            (first if i % 2 else second).drive(i * 10, 0, -i * 10)
+            time.sleep(0.01)
+        time.sleep(0.2)
+        status = first.status()
+        # Uma única leitora de ACKs: nenhum ACK roubado, nenhuma retransmissão
+        assert status['retries'] == 0 and status['link_ok'] is True
+        assert arduino.motors == (190, 0, -190)
+
+        # Quem sai não fecha a porta do outro
+        first.close()
+        assert second.is_connected and second.drive(0, 0, 0)
+        time.sleep(0.1)
+        assert arduino.motors == (0, 0, 0)
+    finally:
+        first.close()
+        second.close()
+    assert arduino_connection._connections == {}
+
+
+def test_capture_to_command_measured_at_first_ramp_step(arduino):
+    metrics = LatencyMetrics()
+    motors = MotorControl(metrics=metrics)
+    motors.connect(arduino.port)
+    try:
+        captured = time.perf_counter() - 0.05  # Frame capturado há 50 ms
+        assert motors.set_velocity(0.2, 0.0, 0.0, captured)
+        time.sleep(0.1)
+        stage = metrics.summary()['capture_to_command']
+        assert stage['count'] == 1 and stage['p50'] >= 50
+        # Mesmo alvo (decisão repetida): nenhum comando novo, nenhuma amostra
+        motors.set_velocity(0.2, 0.0, 0.0, time.perf_counter())
+        time.sleep(0.05)
+        assert metrics.summary()['capture_to_command']['count'] == 1
+    finally:
+        motors.close()
+
+
+def test_ramp_limits_acceleration_and_settles_exactly():
+    ramp = VelocityRamp(max_accel=0.6, max_decel=1.5, max_angular_accel=3.0)
+    ramp.set_target(0.3, 0.0, 0.0)
+    speeds = [ramp.step(0.02)[0] for _ in range(30)]
+    np.testing.assert_allclose(np.diff([0.0] + speeds[:20]), 0.012, atol=1e-12)  # 0,6 m/s² x 20 ms
+    assert speeds[-1] == 0.3 and ramp.settled
+
+
+def test_ramp_brakes_faster_than_it_accelerates():
+    ramp = VelocityRamp(max_accel=0.6, max_decel=1.5)
+    ramp.velocity = np.array((0.3, 0.0, 0.0))
+    ramp.set_target(0.0, 0.0, 0.0)
+    assert ramp.step(0.02)[0] == pytest.approx(0.3 - 0.03)
+
+
+def test_ramp_keeps_direction_of_diagonal_change():
+    ramp = VelocityRamp(max_accel=0.6)
+    ramp.set_target(0.3, 0.4, 0.0)
+    vx, vy, _ = ramp.step(0.1)
+    assert np.hypot(vx, vy) == pytest.approx(0.06)
+    assert vy / vx == pytest.approx(0.4 / 0.3)
+
+
+def test_ramp_limits_rotation_separately():
+    ramp = VelocityRamp(max_accel=0.6, max_angular_accel=3.0)
+    ramp.set_target(0.0, 0.0, -1.0)
+    assert ramp.step(0.1) == pytest.approx((0.0, 0.0, -0.3))
+    for _ in range(3):
+        ramp.step(0.1)
+    assert ramp.settled
@@ -0,0 +1,132 @@
+"""Protocolo serial binário: CRC-8, frames, decodificador e escritor de comandos"""
+
+import time
+
+import pytest
+import serial
+
+from fake_arduino import FakeArduino
+from serial_protocol import (SerialCommandWriter, FrameParser, crc8, encode_frame, encode_motor_command,
+                             encode_baud_request, encode_ascii_command, FRAME_SIZE, SYNC, MOTOR, ACK)
+
+
+def wait_until(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_crc8_check_value():
+    # CRC-8 (polinômio 0x07, inicial 0): valor de verificação padrão
+    assert crc8(b'123456789') == 0xF4
+    assert crc8(b'') == 0
+
+
+@pytest.mark.parametrize('speeds', [(0, 0, 0), (255, -255, 17), (-1, 128, -128)])
+def test_motor_frame_round_trip(speeds):
+    frame = encode_motor_command(300, *speeds)
+    assert len(frame) == FRAME_SIZE and frame.startswith(SYNC)
+    assert crc8(frame[2:-1]) == frame[-1]
+    assert FrameParser().feed(frame) == [('binary', 300 & 0xFF) + speeds]
+
+
+def test_parser_byte_by_byte_with_noise_and_text():
+    parser = FrameParser()
+    stream = (b'\xaa' + encode_motor_command(1, 10, 20, 30) + b'100,-50,300\n'
+              + encode_frame(ACK, 2, 1, 2, 3))
+    frames = [frame for byte in stream for frame in parser.feed(bytes([byte]))]
+    assert frames == [('binary', 1, 10, 20, 30), ('ascii', None, 100, -50, 255), ('ack', 2, 1, 2, 3)]
+    assert parser.errors == 0
+
+
+def test_parser_drops_corrupted_frame_and_resyncs():
+    parser = FrameParser()
+    corrupted = bytearray(encode_motor_command(5, 100, 100, 100))
+    corrupted[5] ^= 0x01
+    assert parser.feed(bytes(corrupted) + encode_motor_command(6, 1, 2, 3)) == [('binary', 6, 1, 2, 3)]
+    assert parser.errors == 1
+
+
+def test_parser_clamps_motor_speeds_but_not_baud():
+    parser = FrameParser()
+    assert parser.feed(encode_frame(MOTOR, 1, 1000, -1000, 0)) == [('binary', 1, 255, -255, 0)]
+    assert parser.feed(encode_baud_request(2, 230400)) == [('baud', 2, 2304, 0, 0)]
+
+
+def test_ascii_command_format():
+    assert encode_ascii_command(-10, 0, 255) == b'-10,0,255\n'
+    assert FrameParser().feed(b'1,2\n') == []  # Linha incompleta é ignorada
+
+
+@pytest.fixture
+def arduino():
+    fake = FakeArduino(baudrate=0, banner=False)
+    port = serial.Serial(fake.port, timeout=0.05)
+    yield fake, port
+    port.close()
+    fake.close()
+
+
+def test_writer_coalesces_and_suppresses_repeats(arduino):
+    fake, port = arduino
+    writer = SerialCommandWriter(port, max_rate=20)
+    try:
+        for speed in range(0, 100, 10):
+            writer.submit(speed, 0, -speed)  # Rajada: só o primeiro e o último saem
+        assert wait_until(lambda: fake.motors == (90, 0, -90))
+        writer.submit(90, 0, -90)
+        assert writer.suppressed == 1
+        assert writer.coalesced >= 8
+        assert [command[3:] for command in fake.received()][-1] == (90, 0, -90)
+        assert len(fake.received()) <= 3
+    finally:
+        writer.close()
+
+
+def test_writer_acks_and_heartbeats(arduino):
+    fake, port = arduino
+    writer = SerialCommandWriter(port, heartbeat_interval=0.05)
+    try:
+        writer.submit(50, -50, 0)
+        assert wait_until(lambda: writer.acked >= 1)
+        assert writer.link_ok is True and writer.motors == (50, -50, 0) and writer.rtt is not None
+        # Parado no mesmo comando: heartbeats mantêm o watchdog do firmware satisfeito
+        time.sleep(0.6)
+        assert fake.heartbeats >= 5 and fake.watchdog_stops == 0
+        assert fake.motors == (50, -50, 0) and writer.retries == 0
+    finally:
+        writer.close()
+
+
+def test_writer_retransmits_without_ack_and_recovers(arduino):
+    fake, port = arduino
+    fake.responsive = False
+    writer = SerialCommandWriter(port, ack_timeout=0.02)
+    try:
+        writer.submit(80, 0, 0)
+        assert wait_until(lambda: writer.link_ok is False)
+        assert writer.retries >= SerialCommandWriter.MAX_MISSED_ACKS and writer.acked == 0
+
+        fake.responsive = True
+        assert wait_until(lambda: writer.link_ok is True)
+        assert fake.motors == (80, 0, 0)  # A retransmissão entregou o comando
+    finally:
+        writer.close()
+
+
+def test_writer_resends_after_firmware_watchdog(arduino):
+    fake, port = arduino
+    writer = SerialCommandWriter(port, heartbeat_interval=0.05)
+    try:
+        writer.submit(0, 120, 0)
+        assert wait_until(lambda: fake.motors == (0, 120, 0))
+        # Arduino reiniciou (motores parados): o ACK do heartbeat mostra a diferença
+        with fake._lock:
+            fake.motors = (0, 0, 0)
+        assert wait_until(lambda: fake.motors == (0, 120, 0))
+        assert len([c for c in fake.received() if c[3:] == (0, 120, 0)]) == 2
+    finally:
+        writer.close()
@@ -0,0 +1,103 @@
+"""Teleoperação por WebSocket: validação das mensagens e parada do homem-morto"""
+
+import json
+
+import pytest
+from websockets.exceptions import ConnectionClosed
+
+import robot_control_web
+
+
+class FakeRobot:
+    def __init__(self):
+        self.speed = 80
+        self.calls = []
+
+    def hold(self, directions):
+        self.calls.append(('hold', list(directions)))
+        return True, "ok"
+
+    def stop(self):
+        self.calls.append(('stop',))
+        return True, "ok"
+
+
+class FakeWebSocket:
+    """Entrega as mensagens roteirizadas; exceções da lista são levantadas no recv"""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.sent = []
+        self.timeouts = []
+
+    def recv(self, timeout=None):
+        self.timeouts.append(timeout)
+        item = self.script.pop(0) if self.script else ConnectionClosed(None, None)
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+@pytest.fixture
+def robot(monkeypatch):
+    fake = FakeRobot()
+    monkeypatch.setattr(robot_control_web, 'robot', fake)
+    return fake
+
+
+def keys(*directions, speed=50):
+    return json.dumps({'keys': list(directions), 'speed': speed})
+
+
+def test_silence_while_moving_stops(robot):
+    ws = FakeWebSocket([keys('forward'), TimeoutError()])
+    robot_control_web.teleop_handler(ws)
+    assert robot.calls == [('hold', ['forward']), ('stop',)]
+    # Espera limitada só com o robô andando
+    assert ws.timeouts[:2] == [None, robot_control_web.TELEOP_DEADMAN]
+
+
+def test_connection_closed_while_moving_stops(robot):
+    robot_control_web.teleop_handler(FakeWebSocket([keys('forward', 'left')]))
+    assert robot.calls == [('hold', ['forward', 'left']), ('stop',)]
+
+
+def test_closed_while_idle_does_not_send_stop(robot):
+    robot_control_web.teleop_handler(FakeWebSocket([keys()]))
+    assert robot.calls == [('hold', [])]
+
+
+@pytest.mark.parametrize('message', [
+    'não é json',
+    json.dumps([1, 2]),
+    json.dumps({'keys': 'forward'}),
+    json.dumps({'keys': ['forward'], 'speed': 'rápido'}),
+    json.dumps({'keys': ['forward'], 'speed': [80]}),
+])
+def test_invalid_message_answers_and_stops(robot, message):
+    ws = FakeWebSocket([keys('forward'), message])
+    robot_control_web.teleop_handler(ws)
+    assert robot.calls == [('hold', ['forward']), ('stop',)]
+    assert len(ws.sent) == 1 and ws.sent[0]['success'] is False
+
+
+def test_unexpected_error_still_stops(robot):
+    ws = FakeWebSocket([keys('forward'), RuntimeError("falha inesperada")])
+    with pytest.raises(RuntimeError):
+        robot_control_web.teleop_handler(ws)
+    assert robot.calls[-1] == ('stop',)
+
+
+def test_speed_is_clamped(robot):
+    robot_control_web.teleop_handler(FakeWebSocket([keys('forward', speed=1000)]))
+    assert robot.speed == 100
+    robot_control_web.teleop_handler(FakeWebSocket([keys('forward', speed=-5)]))
+    assert robot.speed == 0
+
+
+def test_unknown_keys_are_ignored(robot):
+    robot_control_web.teleop_handler(FakeWebSocket([json.dumps({'keys': ['forward', 'jump', 3, 'stop']})]))
+    assert robot.calls[0] == ('hold', ['forward'])
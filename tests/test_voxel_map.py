@@ -0,0 +1,85 @@
+"""Mapa 3D em voxels: chaves empacotadas, deltas com marcas de remoção e o frame binário"""
+
+import numpy as np
+import pytest
+
+import stream_protocol
+from voxel_map import VoxelMap, pack_keys, unpack_keys
+
+
+def test_keys_round_trip_at_the_limits():
+    limit = 1 << 20
+    indices = np.array([[0, 0, 0], [-1, 2, -3], [-limit, limit - 1, 0], [limit - 1, -limit, limit - 1]])
+    keys = pack_keys(indices)
+    assert len(np.unique(keys)) == len(indices)
+    assert np.array_equal(unpack_keys(keys), indices)
+
+
+def voxel_set(voxel_map, centers):
+    return set(map(tuple, np.floor(centers / voxel_map.voxel_size).astype(np.int64).tolist()))
+
+
+def random_cloud(rng, count=100):
+    # Nuvem em torno de um ponto sorteado: o mapa cresce e descarta voxels antigos
+    center = rng.uniform(-2.0, 2.0, 3)
+    return center + rng.normal(0.0, 0.2, (count, 3)), rng.random((count, 3))
+
+
+def test_client_following_deltas_matches_snapshot():
+    rng = np.random.default_rng(0)
+    voxel_map = VoxelMap(voxel_size=0.1, max_voxels=600)
+    client, client_version = set(), 0
+    deltas_with_removals = keyframes = 0
+    for step in range(60):
+        voxel_map.integrate(*random_cloud(rng))
+        if step % 2:
+            continue  # Cliente atrasado: recebe dois passos em um delta
+        delta = voxel_map.delta_since(client_version)
+        if delta is None:
+            # Remoções já esquecidas: o servidor manda um keyframe
+            centers, _, client_version = voxel_map.snapshot()
+            client = voxel_set(voxel_map, centers)
+            keyframes += 1
+            continue
+        added, colors, removed, client_version = delta
+        assert len(colors) == len(added)
+        deltas_with_removals += len(removed) > 0
+        # Remoções antes das adições (um voxel pode ter saído e voltado)
+        client -= voxel_set(voxel_map, removed)
+        client |= voxel_set(voxel_map, added)
+        assert client == voxel_set(voxel_map, voxel_map.snapshot()[0])
+    assert deltas_with_removals > 5 and keyframes < 5
+
+
+def test_forgotten_removals_require_keyframe():
+    rng = np.random.default_rng(1)
+    voxel_map = VoxelMap(voxel_size=0.1, max_voxels=200)
+    while voxel_map.removed_floor == 0:
+        voxel_map.integrate(*random_cloud(rng))
+    assert voxel_map.delta_since(voxel_map.removed_floor - 1) is None
+    assert voxel_map.delta_since(voxel_map.removed_floor) is not None
+
+
+def test_unchanged_voxels_are_not_resent():
+    voxel_map = VoxelMap(voxel_size=0.1)
+    points = np.array([[0.05, 0.05, 0.05], [1.0, 1.0, 1.0]])
+    colors = np.full((2, 3), 0.5)
+    voxel_map.integrate(points, colors)
+    version = voxel_map.version
+    voxel_map.integrate(points, colors)
+    added, _, removed, _ = voxel_map.delta_since(version)
+    assert len(added) == 0 and len(removed) == 0
+
+
+@pytest.mark.parametrize('keyframe', [False, True])
+def test_map_update_frame_round_trip(keyframe):
+    added = np.array([[0.05, -1.25, 2.0], [3.0, 0.0, -0.5]])
+    colors = np.array([[255, 0, 10], [1, 2, 3]], dtype=np.uint8)
+    removed = np.array([[-0.25, 0.75, 0.05]])
+    frame = stream_protocol.encode_map_update(7, 5, added, colors, removed, keyframe=keyframe)
+    version, base, is_keyframe, decoded_added, decoded_colors, decoded_removed = \
+        stream_protocol.decode_map_update(frame)
+    assert (version, base, is_keyframe) == (7, 5, keyframe)
+    np.testing.assert_allclose(decoded_added, added, atol=1e-6)
+    np.testing.assert_allclose(decoded_removed, removed, atol=1e-6)
+    assert np.array_equal(decoded_colors, colors)
@@ -0,0 +1,191 @@
+"""
+Mapa 3D persistente em voxels (reconstrução do ambiente)
+- Cada nuvem de pontos é fundida incrementalmente: pontos no mesmo voxel
+  viram um único voxel, então o mapa cresce com o espaço explorado e não
+  com o tempo
+- Memória limitada: acima de max_voxels, os voxels vistos há mais tempo
+  (e, entre eles, os mais distantes) são descartados
+- Cada voxel guarda a versão do mapa em que mudou, para enviar aos clientes
+  apenas o que mudou desde a última atualização
+- Voxels descartados deixam uma marca de remoção (com a versão), para que os
+  clientes também removam; as marcas mais antigas são esquecidas e clientes
+  mais atrasados que isso precisam de um mapa completo (keyframe)
+"""
+
+import numpy as np
+from threading import Lock
+
+# Índices inteiros de voxel empacotados em uma chave int64 (21 bits por eixo)
+_KEY_BITS = 21
+_KEY_OFFSET = 1 << (_KEY_BITS - 1)
+_KEY_MASK = (1 << _KEY_BITS) - 1
+
+
+def pack_keys(indices):
+    """Empacota índices de voxel (Nx3 int64) em chaves int64"""
+    shifted = indices + _KEY_OFFSET
+    return (shifted[:, 0] << (2 * _KEY_BITS)) | (shifted[:, 1] << _KEY_BITS) | shifted[:, 2]
+
+
+def unpack_keys(keys):
+    """Desempacota chaves int64 em índices de voxel (Nx3 int64)"""
+    indices = np.empty((len(keys), 3), dtype=np.int64)
+    indices[:, 0] = (keys >> (2 * _KEY_BITS)) & _KEY_MASK
+    indices[:, 1] = (keys >> _KEY_BITS) & _KEY_MASK
+    indices[:, 2] = keys & _KEY_MASK
+    return indices - _KEY_OFFSET
+
+
+class VoxelMap:
+    """Mapa de ocupação em voxels com fusão incremental e memória limitada"""
+
+    def __init__(self, voxel_size=0.05, max_voxels=200000, color_change=16):
+        self.voxel_size = voxel_size  # metros
+        self.max_voxels = max_voxels
+        self.color_change = color_change  # variação de cor (0-255) que conta como mudança
+        self.version = 0  # Incrementada a cada fusão
+        self.evicted = 0
+
+        # Arrays paralelos, ordenados pela chave do voxel
+        self._keys = np.empty(0, dtype=np.int64)
+        self._colors = np.empty((0, 3), dtype=np.uint8)
+        self._hits = np.empty(0, dtype=np.uint32)
+        self._last_seen = np.empty(0, dtype=np.int64)  # Versão em que foi visto por último
+        self._changed = np.empty(0, dtype=np.int64)  # Versão da última alteração
+        # Marcas de remoção: chave e versão em que o voxel foi descartado
+        self._removed_keys = np.empty(0, dtype=np.int64)
+        self._removed_versions = np.empty(0, dtype=np.int64)
+        self.removed_floor = 0  # Remoções até esta versão já foram esquecidas
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def centers(self, keys):
+        """Centro (metros) de cada voxel"""
+        return (unpack_keys(keys) + 0.5) * self.voxel_size
+
+    def integrate(self, points, colors, pose=None, origin=None):
+        """Funde uma nuvem de pontos (Nx3 metros, cores 0-1) no mapa
+
+        pose: transformação 4x4 do sensor para o referencial do mapa (opcional).
+        origin: posição atual do robô no mapa, usada na remoção dos voxels
+        distantes (padrão: origem do mapa).
+        Retorna o número de voxels novos, alterados ou removidos.
+        """
+        if points is None or len(points) == 0:
+            return 0
+        if pose is not None:
+            points = points @ pose[:3, :3].T + pose[:3, 3]
+
+        # Deduplica os pontos por voxel, com a cor média de cada um
+        keys = pack_keys(np.floor(points / self.voxel_size).astype(np.int64))
+        unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        color_sums = np.stack([np.bincount(inverse, weights=colors[:, c], minlength=len(unique_keys))
+                               for c in range(3)], axis=1)
+        mean_colors = np.clip(color_sums / counts[:, None] * 255, 0, 255)
+
+        with self._lock:
+            self.version += 1
+
+            # Separa voxels já conhecidos dos novos (busca binária nas chaves ordenadas)
+            position = np.searchsorted(self._keys, unique_keys)
+            known = position < len(self._keys)
+            known[known] = self._keys[position[known]] == unique_keys[known]
+            slots = position[known]
+
+            # Voxels conhecidos: atualiza contagem e cor (média com peso limitado)
+            hits = self._hits[slots].astype(np.float64)
+            weight = np.minimum(hits, 255)[:, None]
+            old_colors = self._colors[slots].astype(np.float64)
+            new_colors = (old_colors * weight + mean_colors[known] * counts[known, None]) \
+                / (weight + counts[known, None])
+            recolored = np.abs(new_colors - old_colors).max(axis=1) >= self.color_change
+            self._colors[slots] = new_colors.astype(np.uint8)
+            self._hits[slots] = np.minimum(hits + counts[known], np.iinfo(np.uint32).max)
+            self._last_seen[slots] = self.version
+            self._changed[slots[recolored]] = self.version
+
+            # Voxels novos: insere e reordena pelas chaves
+            fresh = ~known
+            changes = int(np.count_nonzero(fresh)) + int(np.count_nonzero(recolored))
+            if np.any(fresh):
+                count = int(np.count_nonzero(fresh))
+                keys = np.concatenate([self._keys, unique_keys[fresh]])
+                order = np.argsort(keys, kind='stable')
+                self._keys = keys[order]
+                self._colors = np.concatenate([self._colors, mean_colors[fresh].astype(np.uint8)])[order]
+                self._hits = np.concatenate([self._hits, counts[fresh].astype(np.uint32)])[order]
+                self._last_seen = np.concatenate([self._last_seen, np.full(count, self.version)])[order]
+                self._changed = np.concatenate([self._changed, np.full(count, self.version)])[order]
+
+            if len(self._keys) > self.max_voxels:
+                changes += self._evict(origin)
+
+        return changes
+
+    def _evict(self, origin):
+        """Remove os voxels menos recentes (e mais distantes) até 90% da capacidade
+        
+        Retorna o número de voxels removidos.
+        """
+        excess = len(self._keys) - int(self.max_voxels * 0.9)
+        centers = self.centers(self._keys)
+        if origin is not None:
+            centers -= np.asarray(origin)
+        distance = np.einsum('ij,ij->i', centers, centers)
+        # Ordena por última observação (mais antigos primeiro), depois mais distantes
+        victims = np.lexsort((-distance, self._last_seen))[:excess]
+
+        keep = np.ones(len(self._keys), dtype=bool)
+        keep[victims] = False
+        self._remember_removed(self._keys[victims])
+        self._keys = self._keys[keep]
+        self._colors = self._colors[keep]
+        self._hits = self._hits[keep]
+        self._last_seen = self._last_seen[keep]
+        self._changed = self._changed[keep]
+        self.evicted += excess
+        return excess
+
+    def _remember_removed(self, keys):
+        """Guarda marcas de remoção, limitadas a max_voxels entradas"""
+        self._removed_keys = np.concatenate([self._removed_keys, keys])
+        self._removed_versions = np.concatenate(
+            [self._removed_versions, np.full(len(keys), self.version)])
+        excess = len(self._removed_keys) - self.max_voxels
+        if excess > 0:
+            # As marcas estão em ordem de versão: esquece as mais antigas
+            self.removed_floor = int(self._removed_versions[excess - 1])
+            self._removed_keys = self._removed_keys[excess:]
+            self._removed_versions = self._removed_versions[excess:]
+
+    def changes_since(self, version):
+        """Voxels novos ou alterados depois de `version`
+
+        Retorna (centros Nx3 em metros, cores Nx3 uint8, versão atual).
+        """
+        with self._lock:
+            changed = self._changed > version
+            return self.centers(self._keys[changed]), self._colors[changed].copy(), self.version
+
+    def delta_since(self, version):
+        """Diferença entre a versão `version` e a atual
+        
+        Retorna (centros adicionados/alterados, cores uint8, centros removidos,
+        versão atual), ou None se as remoções daquela versão já foram
+        esquecidas (o cliente precisa do mapa completo).
+        """
+        with self._lock:
+            if version < self.removed_floor:
+                return None
+            changed = self._changed > version
+            removed = self._removed_keys[self._removed_versions > version]
+            # Um voxel descartado e depois visto de novo aparece nas duas listas;
+            # o cliente aplica as remoções antes das adições
+            return (self.centers(self._keys[changed]), self._colors[changed].copy(),
+                    self.centers(removed), self.version)
+
+    def snapshot(self):
+        """Mapa completo: (centros Nx3 em metros, cores Nx3 uint8, versão atual)"""
+        return self.changes_since(-1)